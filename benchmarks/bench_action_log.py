@@ -0,0 +1,117 @@
+# Накладные расходы log_action на вызов: без логирования, прежняя схема
+# (строки START/OK пишутся в RotatingFileHandler в вызывающем потоке) и
+# очередь QueueHandler/QueueListener с JSON-записями. Логи пишутся во
+# временный каталог, ротация - как в проекте (512 КБ).
+#
+#     PYTHONPATH=src python benchmarks/bench_action_log.py [--calls N]
+#         [--gap-us MICROSECONDS] [--policy block|drop] [--queue-size Q]
+
+from __future__ import annotations
+
+import argparse
+import logging
+import tempfile
+import time
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from time import perf_counter_ns
+from unittest.mock import patch
+
+from valutatrade_hub.infra.decorators import log_action
+from valutatrade_hub.infra.logging_config import (
+    setup_actions_logging,
+    shutdown_actions_logging,
+)
+
+
+def trade(currency_code: str, amount: float) -> float:
+    return amount * 2
+
+
+def sync_log_action(logger: logging.Logger):
+    # Декоратор до перехода на очередь
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            logger.info("START %s", "buy")
+            try:
+                result = func(*args, **kwargs)
+                logger.info("OK %s", "buy")
+                return result
+            except Exception as e:
+                logger.exception("ERROR %s: %s", "buy", e)
+                raise
+
+        return wrapper
+
+    return decorator
+
+
+def sync_logger(path: Path) -> logging.Logger:
+    logger = logging.getLogger("bench.sync_actions")
+    handler = RotatingFileHandler(
+        str(path), maxBytes=512_000, backupCount=3, encoding="utf-8"
+    )
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def measure(func, calls: int, gap: float) -> list[int]:
+    # gap - пауза между вызовами (как время сделки на чтение/запись данных):
+    # при gap=0 фоновый поток не успевает за вызовами и очередь переполняется
+    times = []
+    for i in range(calls):
+        t0 = perf_counter_ns()
+        func("BTC", i)
+        times.append(perf_counter_ns() - t0)
+        if gap:
+            time.sleep(gap)
+    return times
+
+
+def report(name: str, times: list[int]) -> None:
+    ordered = sorted(times)
+    mean = sum(times) / len(times) / 1000
+    p50 = ordered[len(ordered) // 2] / 1000
+    p99 = ordered[int(len(ordered) * 0.99)] / 1000
+    worst = ordered[-1] / 1000
+    print(
+        f"{name:22} mean={mean:7.2f}us p50={p50:7.2f}us "
+        f"p99={p99:7.2f}us max={worst:9.1f}us"
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=20000)
+    ap.add_argument("--gap-us", type=int, default=500, help="пауза между вызовами, мкс")
+    ap.add_argument("--policy", choices=["block", "drop"], default="block")
+    ap.add_argument("--queue-size", type=int, default=10000)
+    args = ap.parse_args()
+
+    gap = args.gap_us / 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        report("без логирования", measure(trade, args.calls, gap))
+
+        before = sync_log_action(sync_logger(Path(tmp) / "sync.log"))(trade)
+        report("синхронный файл", measure(before, args.calls, gap))
+
+        logger = setup_actions_logging(
+            Path(tmp) / "queue.log", queue_size=args.queue_size, policy=args.policy
+        )
+        after = log_action("buy")(trade)
+        with patch(
+            "valutatrade_hub.infra.decorators.get_actions_logger", return_value=logger
+        ):
+            times = measure(after, args.calls, gap)
+        dropped = shutdown_actions_logging()
+        report(f"очередь ({args.policy})", times)
+        print(f"отброшено записей: {dropped}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# Нагрузочный тест project serve: демон запускается отдельным процессом,
+# C клиентов (потоков) гонят операции с конвейером глубины D. Печатает ops/sec
+# и p50/p99 задержки запроса. Файлы data/, которые меняет тест (пользователи,
+# портфели, журнал сделок), восстанавливаются.
+#
+#     PYTHONPATH=src python benchmarks/bench_daemon.py [--clients C] [--ops N]
+#         [--depth D] [--mix get_rate|trade] [--tcp] [--baseline]
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from time import perf_counter
+
+from valutatrade_hub.core.utils import data_file
+from valutatrade_hub.daemon.client import DaemonClient
+
+ENTRY = "import sys; from valutatrade_hub.main import main; sys.exit(main())"
+TOUCHED = (
+    "users.json",
+    "portfolios.json",
+    "session.json",
+    "rates.json",
+    "ledger.ndjson",
+    "ledger_checkpoint.json",
+)
+RATE = ("get_rate", {"from_currency": "BTC", "to_currency": "USD"})
+MIXES = {
+    "get_rate": [RATE],
+    "trade": [
+        RATE,
+        ("buy", {"currency_code": "EUR", "amount": 1}),
+        ("sell", {"currency_code": "EUR", "amount": 1}),
+        ("show_portfolio", {}),
+    ],
+}
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def _env() -> dict[str, str]:
+    src = str(Path(__file__).resolve().parents[1] / "src")
+    env = {**os.environ, "PYTHONPATH": src}
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def start_daemon(address: str) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-c", ENTRY, "serve", "--listen", address],
+        env=_env(),
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            with DaemonClient(address, timeout=1) as c:
+                c.ping()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise SystemExit("serve не запустился")
+
+
+def run_client(
+    address: str, n: int, ops: int, depth: int, mix: list, out: list, errors: list
+) -> None:
+    latencies = []
+    failed = 0
+    with DaemonClient(address) as c:
+        name = f"bench{os.getpid()}_{n}"
+        c.register(name, "1234")
+        c.login(name, "1234")
+        c.buy("EUR", 10)
+        sent_at: dict[int, float] = {}
+        sent = received = 0
+        while received < ops:
+            while sent < ops and sent - received < depth:
+                op, args = mix[sent % len(mix)]
+                sent_at[c.send(op, **args)] = perf_counter()
+                sent += 1
+            resp = c.receive()
+            latencies.append((perf_counter() - sent_at.pop(resp["id"])) * 1000)
+            failed += not resp["ok"]
+            received += 1
+    out.extend(latencies)
+    errors.append(failed)
+
+
+def baseline(runs: int = 10) -> float:
+    # Для сравнения: один процесс project на операцию
+    t0 = perf_counter()
+    for _ in range(runs):
+        subprocess.run(
+            [sys.executable, "-c", ENTRY, "get-rate", "BTC", "USD"],
+            env=_env(),
+            stdout=subprocess.DEVNULL,
+        )
+    return runs / (perf_counter() - t0)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=4)
+    ap.add_argument("--ops", type=int, default=5000, help="операций на клиента")
+    ap.add_argument("--depth", type=int, default=16, help="глубина конвейера")
+    ap.add_argument("--mix", choices=sorted(MIXES), default="trade")
+    ap.add_argument("--tcp", action="store_true", help="localhost-порт вместо сокета")
+    ap.add_argument("--baseline", action="store_true")
+    args = ap.parse_args()
+
+    saved = {name: data_file(name) for name in TOUCHED}
+    backup = {name: p.read_bytes() for name, p in saved.items() if p.exists()}
+    with tempfile.TemporaryDirectory() as tmp:
+        address = "127.0.0.1:8977" if args.tcp else str(Path(tmp) / "vt.sock")
+        proc = start_daemon(address)
+        try:
+            latencies: list[float] = []
+            errors: list[int] = []
+            threads = [
+                threading.Thread(
+                    target=run_client,
+                    args=(
+                        address,
+                        i,
+                        args.ops,
+                        args.depth,
+                        MIXES[args.mix],
+                        latencies,
+                        errors,
+                    ),
+                )
+                for i in range(args.clients)
+            ]
+            t0 = perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            total = perf_counter() - t0
+        finally:
+            proc.terminate()
+            proc.wait()
+            for name, p in saved.items():
+                if name in backup:
+                    p.write_bytes(backup[name])
+                elif p.exists():
+                    p.unlink()
+
+    ops = len(latencies)
+    print(
+        f"clients={args.clients} depth={args.depth} mix={args.mix} "
+        f"ops={ops} errors={sum(errors)}"
+    )
+    print(
+        f"ops/sec={ops / total:.0f} p50={percentile(latencies, 0.5):.2f}ms "
+        f"p99={percentile(latencies, 0.99):.2f}ms"
+    )
+    if args.baseline:
+        print(f"процесс на операцию: {baseline():.1f} ops/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Бенчмарк хеджирования запросов: fetch_rates против имитации API, у которой
+# часть ответов "зависает". Сравниваются p50/p95/p99 без хеджирования и с ним.
+# Доля зависаний должна быть меньше 1 - percentile: иначе перцентиль окна сам
+# попадает на зависшие запросы и второй запрос уходит слишком поздно.
+#
+#     PYTHONPATH=src python benchmarks/bench_hedging.py [--requests N]
+#         [--stall-rate P] [--stall S] [--percentile P] [--budget B]
+
+from __future__ import annotations
+
+import argparse
+import logging
+import tempfile
+from dataclasses import replace
+from pathlib import Path
+from time import perf_counter
+
+from valutatrade_hub.parser_service.api_clients import CoinGeckoClient
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.fake_upstream import FakeUpstream, UpstreamBehavior
+from valutatrade_hub.parser_service.http import build_session
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def run(args: argparse.Namespace, hedge_percentile: float) -> None:
+    behavior = UpstreamBehavior(
+        latency=args.latency,
+        jitter=args.jitter,
+        stall_rate=args.stall_rate,
+        stall=args.stall,
+        seed=42,
+    )
+    with tempfile.TemporaryDirectory() as tmp, FakeUpstream(behavior) as upstream:
+        data = Path(tmp)
+        cfg = replace(
+            ParserConfig.from_env(),
+            coingecko_url=f"{upstream.coingecko_api_url}/simple/price",
+            crypto_top=0,
+            fetch_cache_file=data / "fetch_cache.json",
+            rate_limit_file=data / "rate_limits.json",
+            conditional_fetch=False,
+            rate_quotas={},
+            http_fixtures=None,
+            hedge_percentile=hedge_percentile,
+            hedge_budget=args.budget,
+        )
+        session = build_session(pool_size=cfg.http_pool_size, retries=0)
+        client = CoinGeckoClient(cfg, session=session)
+
+        durations = []
+        for _ in range(args.requests):
+            t0 = perf_counter()
+            client.fetch_rates()
+            durations.append((perf_counter() - t0) * 1000)
+        hedges = client.hedge_policy.stats() if client.hedge_policy else {}
+
+    label = f"hedge p{hedge_percentile * 100:g}" if hedge_percentile else "no hedge"
+    extra = sum(s["hedges"] for s in hedges.values())
+    print(
+        f"{label:>12}: p50={percentile(durations, 0.5):.0f}ms "
+        f"p95={percentile(durations, 0.95):.0f}ms "
+        f"p99={percentile(durations, 0.99):.0f}ms "
+        f"max={max(durations):.0f}ms "
+        f"extra_requests={extra}/{args.requests} upstream={upstream.stats['requests']}"
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--latency", type=float, default=0.03)
+    ap.add_argument("--jitter", type=float, default=0.02)
+    ap.add_argument("--stall-rate", type=float, default=0.02)
+    ap.add_argument("--stall", type=float, default=1.0)
+    ap.add_argument("--percentile", type=float, default=0.95)
+    ap.add_argument("--budget", type=float, default=0.1)
+    args = ap.parse_args()
+
+    logging.getLogger("parser_service").setLevel(logging.CRITICAL)
+    run(args, 0.0)
+    run(args, args.percentile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Стоимость наблюдения метрики (infra/metrics.py) на горячем пути: inc
+# счётчика, observe гистограммы, labels() с поиском дочерней метрики и
+# обёртка timed. Из времени вычитается пустой цикл; цель - меньше 1 мкс.
+#
+#     PYTHONPATH=src python benchmarks/bench_metrics.py [--n N]
+
+from __future__ import annotations
+
+import argparse
+from time import perf_counter
+
+from valutatrade_hub.infra.metrics import Registry, timed
+
+
+def per_call_ns(func, n: int) -> float:
+    t0 = perf_counter()
+    for _ in range(n):
+        func()
+    return (perf_counter() - t0) / n * 1e9
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    reg = Registry()
+    hits = reg.counter("hits_total", "h", ("result",))
+    hit = hits.labels(result="hit")
+    seconds = reg.histogram("op_seconds", "t", ("op",))
+    errors = reg.counter("op_errors_total", "e", ("op",))
+    hist = seconds.labels(op="buy")
+
+    def noop() -> None:
+        pass
+
+    wrapped = timed(seconds, errors, op="noop")(noop)
+    base = per_call_ns(noop, args.n)
+    cases = {
+        "counter.inc": hit.inc,
+        "histogram.observe": lambda: hist.observe(0.0021),
+        "labels().inc": lambda: hits.labels(result="hit").inc(),
+        "timed(func)": wrapped,
+    }
+    print(f"пустой вызов: {base:.0f} нс")
+    for name, func in cases.items():
+        cost = per_call_ns(func, args.n) - base
+        mark = "ok" if cost < 1000 else "> 1 мкс"
+        print(f"{name:20} {cost:7.0f} нс  {mark}")
+
+
+if __name__ == "__main__":
+    main()
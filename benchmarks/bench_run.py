@@ -0,0 +1,97 @@
+# Сравнение project run (все команды в одном процессе, одна запись данных в
+# конце) с запуском отдельного процесса project на каждую команду. Файлы data/,
+# которые меняет тест, восстанавливаются.
+#
+#     PYTHONPATH=src python benchmarks/bench_run.py [--commands N] [--processes M]
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from valutatrade_hub.core.utils import data_file
+
+ENTRY = "import sys; from valutatrade_hub.main import main; sys.exit(main())"
+TOUCHED = (
+    "users.json",
+    "portfolios.json",
+    "session.json",
+    "rates.json",
+    "ledger.ndjson",
+    "ledger_checkpoint.json",
+)
+MIX = ("get-rate BTC USD", "buy EUR 1", "sell EUR 1", "show-portfolio")
+
+
+def _env() -> dict[str, str]:
+    src = str(Path(__file__).resolve().parents[1] / "src")
+    env = {**os.environ, "PYTHONPATH": src}
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def script(n: int) -> list[str]:
+    name = f"bench{os.getpid()}"
+    head = [f"register {name} 1234", f"login {name} 1234", "buy EUR 10"]
+    return head + [MIX[i % len(MIX)] for i in range(n)]
+
+
+def run_batch(lines: list[str]) -> float:
+    t0 = perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", ENTRY, "run", "-"],
+        input="\n".join(lines),
+        text=True,
+        env=_env(),
+        stdout=subprocess.DEVNULL,
+    )
+    if proc.returncode:
+        raise SystemExit("project run завершился с ошибкой")
+    return perf_counter() - t0
+
+
+def run_processes(lines: list[str]) -> float:
+    t0 = perf_counter()
+    for line in lines:
+        subprocess.run(
+            [sys.executable, "-c", ENTRY, *line.split()],
+            env=_env(),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    return perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--commands", type=int, default=10000)
+    ap.add_argument(
+        "--processes", type=int, default=40, help="команд для процесса на команду"
+    )
+    args = ap.parse_args()
+
+    saved = {name: data_file(name) for name in TOUCHED}
+    backup = {name: p.read_bytes() for name, p in saved.items() if p.exists()}
+    try:
+        batch = run_batch(script(args.commands))
+        single = run_processes(script(args.processes))
+    finally:
+        for name, p in saved.items():
+            if name in backup:
+                p.write_bytes(backup[name])
+            elif p.exists():
+                p.unlink()
+
+    batch_rate = (args.commands + 3) / batch
+    single_rate = (args.processes + 3) / single
+    print(f"run:                 {batch_rate:8.0f} команд/сек ({batch:.2f} с)")
+    print(f"процесс на команду:  {single_rate:8.1f} команд/сек")
+    print(f"ускорение: x{batch_rate / single_rate:.0f}")
+
+
+if __name__ == "__main__":
+    main()
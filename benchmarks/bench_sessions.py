@@ -0,0 +1,90 @@
+# Стоимость проверки сессии (core/sessions.py): чтение session.json при
+# каждом вызове (как раньше), поиск токена в SQLite без кэша и с кэшем в
+# памяти (shell, run, serve). Плюс вход из нескольких процессов в одну базу.
+#
+#     PYTHONPATH=src python benchmarks/bench_sessions.py [--n N] [--procs P]
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from valutatrade_hub.core.sessions import SessionStore
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+LOGIN_SCRIPT = (
+    "import sys\n"
+    "from pathlib import Path\n"
+    "from valutatrade_hub.core.sessions import SessionStore\n"
+    "store = SessionStore(Path(sys.argv[1]))\n"
+    "for _ in range(int(sys.argv[2])):\n"
+    "    store.get(store.create(int(sys.argv[3]), 'bench'))\n"
+)
+
+
+def per_call_us(func, n: int) -> float:
+    t0 = perf_counter()
+    for _ in range(n):
+        func()
+    return (perf_counter() - t0) / n * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20_000)
+    ap.add_argument("--procs", type=int, default=4)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        legacy = root / "session.json"
+        legacy.write_text(json.dumps({"user_id": 1, "username": "alice"}), "utf-8")
+        db = root / "sessions.db"
+        cached = SessionStore(db, cache_ttl=3600)
+        uncached = SessionStore(db, cache_ttl=0)
+        token = cached.create(1, "alice")
+
+        cases = {
+            "session.json": lambda: json.loads(legacy.read_text("utf-8")),
+            "sqlite, без кэша": lambda: uncached.get(token),
+            "sqlite, кэш": lambda: cached.get(token),
+        }
+        for name, func in cases.items():
+            print(f"{name:18} {per_call_us(func, args.n):8.2f} мкс/проверка")
+
+        # вход из нескольких процессов одновременно: ни одна сессия не теряется
+        per_proc = 200
+        env = {**os.environ, "PYTHONPATH": str(SRC)}
+        t0 = perf_counter()
+        procs = [
+            subprocess.Popen(
+                [sys.executable, "-c", LOGIN_SCRIPT, str(db), str(per_proc), str(i)],
+                env=env,
+            )
+            for i in range(args.procs)
+        ]
+        failed = sum(p.wait() != 0 for p in procs)
+        elapsed = perf_counter() - t0
+        cached.close()
+        uncached.close()
+
+        import sqlite3
+
+        with sqlite3.connect(db) as conn:
+            (rows,) = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        expected = args.procs * per_proc + 1
+        print(
+            f"{args.procs} процесса x {per_proc} входов: {elapsed:.2f} с, "
+            f"сессий {rows}/{expected}, ошибок {failed}"
+        )
+
+
+if __name__ == "__main__":
+    main()
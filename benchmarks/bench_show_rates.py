@@ -0,0 +1,77 @@
+# Вывод show-rates для N пар: таблица PrettyTable (все строки в памяти) против
+# потоковых форматов; --top через heapq.nlargest против полной сортировки.
+# Печатает время и пик памяти (tracemalloc) без учёта самих данных rates.json.
+#
+#     PYTHONPATH=src python benchmarks/bench_show_rates.py [--pairs N] [--top K]
+
+from __future__ import annotations
+
+import argparse
+import io
+import tracemalloc
+from time import perf_counter
+
+from valutatrade_hub.cli.output import (
+    RATE_FIELDS,
+    _rate_key,
+    iter_rate_rows,
+    top_rows,
+    write_rows,
+)
+
+
+class _Null(io.TextIOBase):
+    # stdout, который ничего не хранит
+    def write(self, s: str) -> int:
+        return len(s)
+
+
+def make_data(n: int) -> dict:
+    pairs = {
+        f"C{i:06d}_USD": {"rate": (i * 7919) % 100003 / 7.0, "source": "bench"}
+        for i in range(n)
+    }
+    return {"pairs": pairs, "last_refresh": "2025-10-10T12:00:00Z"}
+
+
+def measure(run) -> tuple[float, int]:
+    tracemalloc.start()
+    t0 = perf_counter()
+    run()
+    elapsed = perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pairs", type=int, default=20000)
+    ap.add_argument("--top", type=int, default=10)
+    args = ap.parse_args()
+    data = make_data(args.pairs)
+    out = _Null()
+
+    def sorted_top() -> None:
+        rows = sorted(iter_rate_rows(data), key=_rate_key, reverse=True)
+        write_rows(rows[: args.top], "ndjson", RATE_FIELDS, out)
+
+    cases = {
+        "table": lambda: write_rows(iter_rate_rows(data), "table", RATE_FIELDS, out),
+        **{
+            fmt: lambda fmt=fmt: write_rows(iter_rate_rows(data), fmt, RATE_FIELDS, out)
+            for fmt in ("json", "ndjson", "csv")
+        },
+        f"top {args.top}, sorted": sorted_top,
+        f"top {args.top}, nlargest": lambda: write_rows(
+            top_rows(iter_rate_rows(data), args.top), "ndjson", RATE_FIELDS, out
+        ),
+    }
+    print(f"pairs={args.pairs}")
+    for name, run in cases.items():
+        elapsed, peak = measure(run)
+        print(f"{name:22} {elapsed * 1000:8.1f} ms  пик памяти {peak / 1024:9.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
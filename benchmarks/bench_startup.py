@@ -0,0 +1,122 @@
+# Бенчмарк запуска CLI: время процесса `project <команда>` от старта
+# интерпретатора до выхода и разбивка импортов по -X importtime.
+# Цель (--target) - для logout и get-rate, сверх запуска `python -c pass`:
+# время интерпретатора и site от проекта не зависит.
+# Файлы data/, которые трогают команды (сессия, кэш курсов), восстанавливаются.
+# Если команда с целью её превысила, скрипт завершается с кодом 1.
+#
+#     PYTHONPATH=src python benchmarks/bench_startup.py [--runs N] [--top K]
+#         [--target MS]
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from valutatrade_hub.core.utils import data_file
+
+COMMANDS = [
+    ["--help"],
+    ["logout"],
+    ["get-rate", "BTC", "USD"],
+    ["show-rates", "--top", "5"],
+]
+# Команды, для которых задана цель по времени запуска
+TARGETED = {"logout", "get-rate"}
+TOUCHED = ("session.json", "rates.json")
+# Как консольный скрипт project из pyproject.toml (без runpy, как у -m)
+ENTRY = "import sys; from valutatrade_hub.main import main; sys.exit(main())"
+
+
+def _env() -> dict[str, str]:
+    # .pyc пишутся, как при обычной установке: иначе каждый запуск
+    # перекомпилирует исходники и замер показывает время компиляции
+    src = str(Path(__file__).resolve().parents[1] / "src")
+    env = {**os.environ, "PYTHONPATH": src}
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def wall_ms(argv: list[str], runs: int) -> list[float]:
+    env = _env()
+    out = []
+    for _ in range(runs):
+        t0 = perf_counter()
+        subprocess.run(
+            [sys.executable, *argv],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        out.append((perf_counter() - t0) * 1000)
+    return out
+
+
+def import_breakdown(cmd: list[str]) -> list[tuple[str, float]]:
+    # Импорты верхнего уровня (без вложенных) с накопленным временем, мс
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", ENTRY, *cmd],
+        env=_env(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not name.startswith("  "):
+            rows.append((name.strip(), int(cumulative) / 1000))
+    return rows
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=20)
+    ap.add_argument("--top", type=int, default=5)
+    ap.add_argument("--target", type=float, default=50.0)
+    args = ap.parse_args()
+
+    over: list[str] = []
+    saved = {name: data_file(name) for name in TOUCHED}
+    backup = {name: p.read_bytes() for name, p in saved.items() if p.exists()}
+    try:
+        base = statistics.median(wall_ms(["-c", "pass"], args.runs))
+        print(f"python -c pass: {base:.0f}ms (запуск интерпретатора и site)")
+        for cmd in COMMANDS:
+            wall_ms(["-c", ENTRY, *cmd], 1)  # прогрев .pyc
+            times = wall_ms(["-c", ENTRY, *cmd], args.runs)
+            med = statistics.median(times)
+            mark = ""
+            if cmd[0] in TARGETED:
+                ok = med - base < args.target
+                mark = " OK" if ok else f" - больше цели {args.target:.0f}ms"
+                if not ok:
+                    over.append(" ".join(cmd))
+            print(
+                f"\n{' '.join(cmd)}: median={med:.0f}ms min={min(times):.0f}ms "
+                f"(+{med - base:.0f}ms к python -c pass){mark}"
+            )
+            rows = import_breakdown(cmd)
+            total = sum(ms for _, ms in rows)
+            print(f"  импорты: {total:.1f}ms")
+            for name, ms in sorted(rows, key=lambda r: -r[1])[: args.top]:
+                print(f"  {ms:7.1f}ms  {name}")
+    finally:
+        for name, p in saved.items():
+            if name in backup:
+                p.write_bytes(backup[name])
+            elif p.exists():
+                p.unlink()
+    if over:
+        sys.exit(f"\nЦель {args.target:.0f}ms превышена: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    main()
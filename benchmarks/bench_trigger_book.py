@@ -0,0 +1,127 @@
+# Бенчмарк обновления курса с условными ордерами: реальный путь
+# process_rate_update (блокировка orders.json, долгоживущая книга триггеров)
+# против прежнего - чтение orders.json и построение книги на каждое
+# обновление. Отдельно - обновление, на котором ордера срабатывают (дозапись
+# журнала ордеров). Данные пишутся во временный каталог (VALUTATRADE_DATA_DIR),
+# data/ проекта не затрагивается.
+#
+#     PYTHONPATH=src python benchmarks/bench_trigger_book.py [--orders N]
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+from time import perf_counter
+
+PAIRS = {"BTC_USD": 60000.0, "ETH_USD": 3000.0, "SOL_USD": 150.0}
+# ордера несуществующего пользователя: при срабатывании они не исполняются и
+# остаются в orders.json со статусом failed, портфели не меняются
+BENCH_USER = -1
+
+
+def make_orders(n: int, hot: int, rng: random.Random) -> list[dict]:
+    pairs = list(PAIRS)
+    out = []
+    for i in range(n + hot):
+        pair = pairs[i % len(pairs)]
+        mid = PAIRS[pair]
+        if i >= n:
+            # "горячие" ордера BTC: сработают при падении цены на 1%
+            pair, direction, price = "BTC_USD", "le", PAIRS["BTC_USD"] * 0.995
+        # остальные далеко от текущей цены: "le" ниже на 5-30%, "ge" - выше
+        elif rng.random() < 0.5:
+            direction, price = "le", mid * rng.uniform(0.7, 0.95)
+        else:
+            direction, price = "ge", mid * rng.uniform(1.05, 1.3)
+        side = "buy" if direction == "le" else "sell"
+        out.append(
+            {
+                "id": i + 1,
+                "user_id": BENCH_USER,
+                "side": side,
+                "kind": "limit",
+                "currency_code": pair.split("_")[0],
+                "amount": 0.01,
+                "pair": pair,
+                "price": price,
+                "direction": direction,
+                "status": "open",
+            }
+        )
+    return out
+
+
+def walk(prices: dict[str, float], rng: random.Random) -> dict[str, float]:
+    # случайное блуждание цен: небольшие шаги, как при обычных обновлениях
+    for pair in prices:
+        prices[pair] *= 1 + rng.uniform(-0.0005, 0.0005)
+    return dict(prices)
+
+
+def run(args: argparse.Namespace) -> None:
+    # импорт после установки VALUTATRADE_DATA_DIR: пути data/ вычисляются
+    # при импорте модулей
+    from valutatrade_hub.core.orders import OrderStore, book_from_orders
+    from valutatrade_hub.core.usecases import process_rate_update
+    from valutatrade_hub.core.utils import ORDERS_JSON, ORDERS_LOG, write_json_file
+
+    def rebuild_update(pairs: dict[str, float]) -> int:
+        # прежний путь: orders.json читается и книга строится заново
+        orders = OrderStore(ORDERS_JSON, ORDERS_LOG).state()["orders"]
+        book = book_from_orders(orders)
+        return sum(len(book.pop_crossed(p, r)) for p, r in pairs.items())
+
+    rng = random.Random(42)
+    write_json_file(
+        ORDERS_JSON,
+        {
+            "next_id": args.orders + args.hot + 1,
+            "orders": make_orders(args.orders, args.hot, rng),
+        },
+    )
+    prices = dict(PAIRS)
+
+    t0 = perf_counter()
+    process_rate_update(walk(prices, rng))
+    first_s = perf_counter() - t0
+    print(f"orders={args.orders} first update (build)={first_s:.2f}s")
+
+    fired = 0
+    t0 = perf_counter()
+    for _ in range(args.updates):
+        fired += len(process_rate_update(walk(prices, rng)))
+    index_s = perf_counter() - t0
+    print(
+        f"index: updates={args.updates} fired={fired} "
+        f"per_update={index_s / args.updates * 1e6:.1f}us"
+    )
+
+    n_rebuild = 3
+    t0 = perf_counter()
+    for _ in range(n_rebuild):
+        rebuild_update(dict(prices))
+    rebuild_ms = (perf_counter() - t0) / n_rebuild * 1000
+    print(f"rebuild every update: per_update={rebuild_ms:.1f}ms")
+
+    t0 = perf_counter()
+    fills = process_rate_update({"BTC_USD": PAIRS["BTC_USD"] * 0.99})
+    fire_ms = (perf_counter() - t0) * 1000
+    print(f"fire update: fired={len(fills)} time={fire_ms:.1f}ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--orders", type=int, default=1_000_000)
+    ap.add_argument("--updates", type=int, default=1000)
+    ap.add_argument("--hot", type=int, default=10)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_trigger_book_") as tmp:
+        os.environ["VALUTATRADE_DATA_DIR"] = tmp
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Бенчмарк RatesUpdater против локальной имитации API (fake_upstream):
+# пропускная способность и хвостовые задержки run_update без сети и квот.
+# Задержки и ошибки имитации задаются с фиксированным seed - прогоны
+# воспроизводимы.
+#
+#     PYTHONPATH=src python benchmarks/bench_updater.py [--updates N]
+#         [--latency S] [--jitter S] [--error-rate P] [--crypto-top N]
+
+from __future__ import annotations
+
+import argparse
+import logging
+import tempfile
+from dataclasses import replace
+from pathlib import Path
+from time import perf_counter
+
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.fake_upstream import FakeUpstream, UpstreamBehavior
+from valutatrade_hub.parser_service.http import build_session
+from valutatrade_hub.parser_service.registry import SourceRegistry
+from valutatrade_hub.parser_service.updater import RatesUpdater
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--updates", type=int, default=20)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--jitter", type=float, default=0.05)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--burst-every", type=int, default=0)
+    ap.add_argument("--burst-len", type=int, default=0)
+    ap.add_argument("--crypto-top", type=int, default=1000)
+    ap.add_argument("--retries", type=int, default=0)
+    args = ap.parse_args()
+
+    # ошибки источников ожидаемы (--error-rate), в вывод их не пускаем
+    logging.getLogger("parser_service").setLevel(logging.CRITICAL)
+
+    behavior = UpstreamBehavior(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        burst_every=args.burst_every,
+        burst_len=args.burst_len,
+        seed=42,
+    )
+    with tempfile.TemporaryDirectory() as tmp, FakeUpstream(behavior) as upstream:
+        data = Path(tmp)
+        cfg = replace(
+            ParserConfig.from_env(),
+            coingecko_url=f"{upstream.coingecko_api_url}/simple/price",
+            coingecko_markets_url=f"{upstream.coingecko_api_url}/coins/markets",
+            exchangerate_url=upstream.exchangerate_url,
+            exchangerate_api_key="bench",
+            crypto_top=args.crypto_top,
+            rates_file=data / "rates.json",
+            history_file=data / "history.ndjson",
+            fetch_cache_file=data / "fetch_cache.json",
+            rate_limit_file=data / "rate_limits.json",
+            source_health_file=data / "source_health.json",
+            conditional_fetch=False,
+            rate_quotas={},
+            breaker_threshold=10**9,
+            http_fixtures=None,
+        )
+        session = build_session(
+            pool_size=cfg.http_pool_size, retries=args.retries, backoff=0.05
+        )
+        clients = SourceRegistry.from_config(cfg).build(cfg, session=session)
+        updater = RatesUpdater(cfg, clients)
+        updater.run_update()  # прогрев: соединения в пуле, снимок кэша
+
+        durations: list[float] = []
+        errors = 0
+        pairs = 0
+        t_start = perf_counter()
+        for _ in range(args.updates):
+            t0 = perf_counter()
+            res = updater.run_update()
+            durations.append((perf_counter() - t0) * 1000)
+            errors += len(res["errors"])
+            pairs = res["updated_pairs"]
+        total = perf_counter() - t_start
+        history_mb = cfg.history_file.stat().st_size / 2**20
+
+    print(
+        f"updates={args.updates} pairs={pairs} total={total:.2f}s "
+        f"rate={args.updates / total:.1f}/s errors={errors}"
+    )
+    print(
+        f"run_update ms: p50={percentile(durations, 0.5):.0f} "
+        f"p95={percentile(durations, 0.95):.0f} "
+        f"p99={percentile(durations, 0.99):.0f} max={max(durations):.0f}"
+    )
+    print(f"upstream: {upstream.stats} history={history_mb:.1f}MiB")
+
+
+if __name__ == "__main__":
+    main()
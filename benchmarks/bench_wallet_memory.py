@@ -0,0 +1,69 @@
+# Бенчмарк памяти: объектная модель (User + Portfolio + Wallet) против
+# WalletStore (структура массивов) для N пользователей по 3 кошелька.
+#
+#     PYTHONPATH=src python benchmarks/bench_wallet_memory.py [--users N]
+
+from __future__ import annotations
+
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime
+from time import perf_counter
+
+from valutatrade_hub.core.models import Portfolio, User, Wallet
+from valutatrade_hub.core.wallet_store import WalletStore
+
+CODES = ("USD", "EUR", "BTC")
+
+
+def _measure(build):
+    gc.collect()
+    tracemalloc.start()
+    t0 = perf_counter()
+    obj = build()
+    elapsed = perf_counter() - t0
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current, elapsed
+
+
+def build_objects(n: int) -> list[Portfolio]:
+    reg = datetime(2025, 1, 1)
+    out = []
+    for uid in range(1, n + 1):
+        user = User(uid, f"user{uid}", "0" * 64, "0" * 16, reg)
+        wallets = {c: Wallet(c, float(uid % 100)) for c in CODES}
+        out.append(Portfolio(user, wallets))
+    return out
+
+
+def build_store(n: int) -> WalletStore:
+    return WalletStore.from_rows(
+        (uid, c, float(uid % 100)) for uid in range(1, n + 1) for c in CODES
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=1_000_000)
+    args = ap.parse_args()
+    n = args.users
+
+    objs, obj_bytes, obj_s = _measure(lambda: build_objects(n))
+    del objs
+    store, store_bytes, store_s = _measure(lambda: build_store(n))
+
+    print(f"users={n} wallets={n * len(CODES)}")
+    print(f"objects:     {obj_bytes / 2**20:8.1f} MiB  build={obj_s:.2f}s")
+    print(f"WalletStore: {store_bytes / 2**20:8.1f} MiB  build={store_s:.2f}s")
+    print(f"ratio: {obj_bytes / max(store_bytes, 1):.1f}x")
+
+    t0 = perf_counter()
+    for uid in range(1, 100_001):
+        store.portfolio(uid).get_balance("EUR")
+    print(f"view lookup: {(perf_counter() - t0) / 100_000 * 1e6:.2f}us")
+
+
+if __name__ == "__main__":
+    main()
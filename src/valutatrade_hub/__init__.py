@@ -1,15 +1,20 @@
 from __future__ import annotations
 
-from valutatrade_hub.parser_service.api_clients import (
-    CoinGeckoClient,
-    ExchangeRateApiClient,
-)
-from valutatrade_hub.parser_service.config import ParserConfig
-from valutatrade_hub.parser_service.updater import RatesUpdater
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from valutatrade_hub.parser_service.updater import RatesUpdater
+
+
+def build_updater(source: str | None = None) -> RatesUpdater:
+    # собирает конфиг и клиентов выбранных источников (все включённые по
+    # умолчанию), возвращает готовый RatesUpdater. Импорты внутри: пакет
+    # импортируется при любом запуске CLI, а parser_service тянет requests
+    from valutatrade_hub.core.usecases import process_rate_update
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.registry import SourceRegistry
+    from valutatrade_hub.parser_service.updater import RatesUpdater
 
-def build_updater() -> RatesUpdater:
-    # собирает конфиг и клиентов, возвращает готовый RatesUpdater
     config = ParserConfig.from_env()
-    clients = [CoinGeckoClient(config), ExchangeRateApiClient(config)]
-    return RatesUpdater(config=config, clients=clients)
+    clients = SourceRegistry.from_config(config).build(config, source)
+    return RatesUpdater(config=config, clients=clients, on_update=[process_rate_update])
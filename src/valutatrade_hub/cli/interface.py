@@ -3,31 +3,19 @@
 from __future__ import annotations
 
 import argparse
-import logging
-
-from prettytable import PrettyTable
-
-from valutatrade_hub.core.usecases import (
-    buy_currency,
-    get_current_user,
-    get_rate,
-    login,
-    logout,
-    register,
-    sell_currency,
-    show_portfolio,
-)
-from valutatrade_hub.infra.logging_config import setup_parser_service_logger
-from valutatrade_hub.infra.settings import SettingsLoader
-from valutatrade_hub.parser_service.api_clients import (
-    CoinGeckoClient,
-    ExchangeRateApiClient,
-)
-from valutatrade_hub.parser_service.config import ParserConfig
-from valutatrade_hub.parser_service.updater import RatesUpdater
+import contextlib
+from typing import TYPE_CHECKING, Any, Callable, ContextManager
+
+if TYPE_CHECKING:
+    import logging
+
+# Зависимости команд (prettytable, requests, parser_service) импортируются
+# внутри обработчиков: запуск logout или get-rate не платит за update-rates.
 
 
 def _print_portfolio(result: dict) -> None:
+    from prettytable import PrettyTable
+
     table = PrettyTable()
     table.field_names = ["Валюта", "Баланс"]
     for row in result["wallets"]:
@@ -37,8 +25,70 @@ def _print_portfolio(result: dict) -> None:
     print(f"Итого в {result['base_currency']}: {result['total_value']}")
 
 
+def _print_trade_results(results: list[dict]) -> None:
+    from prettytable import PrettyTable
+
+    table = PrettyTable()
+    table.field_names = ["#", "Действие", "Валюта", "Сумма", "Результат"]
+    ok = 0
+    for r in results:
+        if r["ok"]:
+            ok += 1
+            status = f"баланс={r['balance']}"
+        else:
+            status = f"ошибка: {r['error']}"
+        table.add_row(
+            [r["index"] + 1, r["action"], r["currency_code"], r["amount"], status]
+        )
+
+    print(table)
+    print(f"Ордеров: {len(results)}, успешно: {ok}, с ошибкой: {len(results) - ok}")
+
+
+def _print_orders(orders: list[dict]) -> None:
+    from prettytable import PrettyTable
+
+    table = PrettyTable()
+    table.field_names = [
+        "#",
+        "Тип",
+        "Действие",
+        "Валюта",
+        "Кол-во",
+        "Условие",
+        "Статус",
+    ]
+    for o in orders:
+        sign = "<=" if o["direction"] == "le" else ">="
+        table.add_row(
+            [
+                o["id"],
+                o["kind"],
+                o["side"],
+                o["currency_code"],
+                o["amount"],
+                f"{o['pair']} {sign} {o['price']}",
+                o.get("status", "open"),
+            ]
+        )
+    print(table)
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(prog="valutatrade-hub")
+    parser.add_argument(
+        "--profile",
+        metavar="MODE",
+        default=None,
+        help="Профилировать команду: spans, cpu, mem или через запятую "
+        "(отчёт в logs/profile/). Также VALUTATRADE_PROFILE",
+    )
+    parser.add_argument(
+        "--token",
+        default=None,
+        help="Токен сессии, выданный login (по умолчанию - VALUTATRADE_TOKEN, "
+        "затем сессия последнего login без токена)",
+    )
     sub = parser.add_subparsers(dest="command", required=True)
 
     # register
@@ -50,6 +100,11 @@ def build_parser() -> argparse.ArgumentParser:
     sp = sub.add_parser("login", help="Вход пользователя")
     sp.add_argument("username", help="Имя пользователя")
     sp.add_argument("password", help="Пароль")
+    sp.add_argument(
+        "--new-session",
+        action="store_true",
+        help="Только выдать токен, не меняя сессию по умолчанию",
+    )
 
     # logout
     sub.add_parser("logout", help="Выход (сброс сессии)")
@@ -68,18 +123,88 @@ def build_parser() -> argparse.ArgumentParser:
     sp = sub.add_parser("sell", help="Продать валюту")
     sp.add_argument("currency_code", help="Код валюты (например, EUR)")
     sp.add_argument("amount", type=float, help="Сумма (> 0)")
+    sp.add_argument(
+        "--policy",
+        choices=["fifo", "lifo", "average"],
+        default=None,
+        help="Учёт себестоимости (по умолчанию из настроек, fifo)",
+    )
+
+    # trade-batch
+    sp = sub.add_parser("trade-batch", help="Исполнить ордера из файла (CSV/NDJSON)")
+    sp.add_argument("file", help="Файл с ордерами")
+    sp.add_argument(
+        "--format",
+        choices=["csv", "ndjson"],
+        default=None,
+        help="Формат файла (по умолчанию - по расширению)",
+    )
+
+    # place-order
+    sp = sub.add_parser(
+        "place-order",
+        help="Условный ордер: исполнится, когда курс {CODE}_USD пересечёт цену",
+    )
+    sp.add_argument("side", choices=["buy", "sell"], help="buy/sell")
+    sp.add_argument("currency_code", help="Код валюты (например, BTC)")
+    sp.add_argument("amount", type=float, help="Количество (> 0)")
+    sp.add_argument("price", type=float, help="Цена в USD")
+    sp.add_argument(
+        "--type",
+        dest="kind",
+        choices=["limit", "stop"],
+        default="limit",
+        help="limit: buy при цене <= price, sell при >= price; stop - наоборот",
+    )
+
+    # list-orders
+    sub.add_parser("list-orders", help="Открытые условные ордера")
+
+    # cancel-order
+    sp = sub.add_parser("cancel-order", help="Отменить условный ордер")
+    sp.add_argument("order_id", type=int, help="Номер ордера")
+
+    # replay
+    sp = sub.add_parser("replay", help="Пересобрать портфели из журнала сделок")
+    sp.add_argument(
+        "--full",
+        action="store_true",
+        help="Воспроизвести журнал с начала, а не от последнего снимка",
+    )
+    sp.add_argument(
+        "--check",
+        action="store_true",
+        help="Только сравнить с портфелями, ничего не записывая",
+    )
+    sp.add_argument("--workers", type=int, default=None, help="Число процессов")
 
     # show-portfolio
     sp = sub.add_parser("show-portfolio", help="Показать портфель пользователя")
     sp.add_argument("--base", default="USD", help="Базовая валюта (USD по умолчанию)")
+    sp.add_argument(
+        "--format",
+        choices=["table", "json", "ndjson", "csv"],
+        default="table",
+        help="Формат вывода (json - портфель целиком, ndjson/csv - кошельки)",
+    )
 
     # update-rates (parser_service)
     sp = sub.add_parser("update-rates", help="Обновить курсы (parser_service)")
     sp.add_argument(
         "--source",
-        choices=["all", "coingecko", "exchangerate"],
         default="all",
-        help="Источник курсов: all/coingecko/exchangerate",
+        help="Источник курсов: all, имя из реестра или список через запятую "
+        "(coingecko,exchangerate)",
+    )
+    sp.add_argument(
+        "--pairs",
+        help="Нужные пары через запятую (BTC_USD,EUR_USD): источники, "
+        "которые их не дают, не опрашиваются",
+    )
+    sp.add_argument(
+        "--watch",
+        action="store_true",
+        help="Работать непрерывно, опрашивая источники по их интервалам",
     )
 
     sp = sub.add_parser(
@@ -100,135 +225,464 @@ def build_parser() -> argparse.ArgumentParser:
         default="USD",
         help="Базовая валюта для вывода (USD по умолчанию)",
     )
+    sp.add_argument(
+        "--format",
+        choices=["table", "json", "ndjson", "csv"],
+        default="table",
+        help="Формат вывода: json, ndjson и csv пишутся построчно",
+    )
+
+    # rates-health
+    sp = sub.add_parser(
+        "rates-health",
+        help="Здоровье источников курсов: задержки, доля успеха, ошибки (без сети)",
+    )
+    sp.add_argument(
+        "--format", choices=["table", "json"], default="table", help="Формат вывода"
+    )
+    sp.add_argument(
+        "--check",
+        action="store_true",
+        help="Код выхода 1, если хотя бы один источник не в статусе ok",
+    )
+
+    # shell
+    sp = sub.add_parser(
+        "shell", help="Интерактивный режим: команды в одном процессе, данные в памяти"
+    )
+    sp.add_argument(
+        "--flush-interval",
+        type=float,
+        default=1.0,
+        help="Как часто записывать изменения на диск, с (0 - при каждом изменении)",
+    )
+
+    # run
+    sp = sub.add_parser(
+        "run", help="Выполнить команды из файла (по одной на строку), вывод - NDJSON"
+    )
+    sp.add_argument("file", help="Файл с командами или - для stdin")
+    sp.add_argument(
+        "--stop-on-error",
+        action="store_true",
+        help="Остановиться на первой ошибке (по умолчанию - продолжать)",
+    )
+
+    # serve
+    sp = sub.add_parser(
+        "serve", help="Демон с JSON API на Unix-сокете или localhost-порту"
+    )
+    sp.add_argument(
+        "--listen",
+        default=None,
+        help="Путь к Unix-сокету (по умолчанию data/valutatrade.sock) "
+        "или host:port для TCP",
+    )
+    sp.add_argument(
+        "--flush-interval",
+        type=float,
+        default=1.0,
+        help="Как часто записывать изменения на диск, с (0 - при каждом изменении)",
+    )
 
     return parser
 
 
-def run_cli(argv: list[str] | None = None) -> None:
-    parser = build_parser()
-    args = parser.parse_args(argv)
+def _require_login() -> None:
+    from valutatrade_hub.core.usecases import get_current_user
 
-    if args.command == "show-rates":
-        from prettytable import PrettyTable
-
-        from valutatrade_hub.core.utils import read_json
-
-        settings = SettingsLoader().load()
-        data = read_json(settings.rates_json, default={})
-        pairs = data.get("pairs_usd_per_unit") or data.get("pairs") or {}
-        last_refresh = data.get("last_refresh")
-        source = data.get("source")
-
-        rows = []
-        for k, v in pairs.items():
-            if isinstance(v, dict) and "rate" in v:
-                rate = v.get("rate")
-                updated = v.get("updated_at") or v.get("timestamp") or last_refresh
-                src = v.get("source") or source
-            else:
-                rate = v
-                updated = last_refresh
-                src = source
-
-            if isinstance(k, str) and "_" in k:
-                frm, to = k.split("_", 1)
-            else:
-                frm, to = str(k), args.base
-
-            rows.append((frm, to, rate, updated, src))
-
-        if args.currency:
-            cur = args.currency.upper()
-            rows = [r for r in rows if r[0].upper() == cur]
-
-        def to_float(x):
-            try:
-                return float(x)
-            except Exception:
-                return None
-
-        if args.top:
-            rows = sorted(
-                rows,
-                key=lambda r: (to_float(r[2]) is None, to_float(r[2]) or 0.0),
-                reverse=True,
-            )[: args.top]
-
-        t = PrettyTable()
-        t.field_names = ["from", "to", "rate", "updated_at", "source"]
-        for frm, to, rate, updated, src in rows:
-            t.add_row([frm, to, rate, updated, src])
-        print(t)
-        return
+    if get_current_user() is None:
+        raise ValueError("Сначала выполните login.")
+
+
+def _setup_parser_logger() -> logging.Logger:
+    # Лог parser_service нужен update-rates и при внутренней ошибке:
+    # остальные команды файл лога не открывают
+    import logging
+
+    from valutatrade_hub.infra.logging_config import setup_parser_service_logger
+    from valutatrade_hub.infra.settings import SettingsLoader
 
     settings = SettingsLoader().load()
     setup_parser_service_logger(settings.logs_dir / "parser_service.log")
+    return logging.getLogger("parser_service")
 
-    try:
-        if args.command == "register":
-            info = register(args.username, args.password)
-            msg = (
-                f"Пользователь зарегистрирован: {info['username']} "
-                f"(id={info['user_id']})"
-            )
-            print(msg)
-            return
 
-        if args.command == "login":
-            info = login(args.username, args.password)
-            print(f"Успешный вход: {info['username']}")
-            return
+def _cmd_show_rates(args: argparse.Namespace) -> None:
+    from valutatrade_hub.cli.output import (
+        RATE_FIELDS,
+        iter_rate_rows,
+        top_rows,
+        write_rows,
+    )
+    from valutatrade_hub.core.utils import read_json
+    from valutatrade_hub.infra.settings import SettingsLoader
 
-        if args.command == "logout":
-            logout()
-            print("Вы вышли из аккаунта.")
-            return
+    settings = SettingsLoader().load()
+    data = read_json(settings.rates_json, default={})
+    rows = iter_rate_rows(data, base=args.base, currency=args.currency)
+    if args.top:
+        rows = top_rows(rows, args.top)
+    write_rows(rows, args.format, RATE_FIELDS)
 
-        if args.command == "get-rate":
-            r = get_rate(args.from_currency, args.to_currency)
-            msg = (
-                f"Курс {r['from']} -> {r['to']}: {r['rate']} "
-                f"(источник: {r['source']}, обновлено: {r['last_refresh']})"
-            )
-            print(msg)
-            return
 
-        if args.command == "buy":
-            if get_current_user() is None:
-                raise ValueError("Сначала выполните login.")
-            res = buy_currency(args.currency_code, args.amount)
-            print(f"Покупка выполнена: {res['currency_code']} баланс={res['balance']}")
-            return
+def _cmd_register(args: argparse.Namespace) -> None:
+    from valutatrade_hub.core.usecases import register
 
-        if args.command == "sell":
-            if get_current_user() is None:
-                raise ValueError("Сначала выполните login.")
-            res = sell_currency(args.currency_code, args.amount)
-            print(f"Продажа выполнена: {res['currency_code']} баланс={res['balance']}")
-            return
+    info = register(args.username, args.password)
+    msg = f"Пользователь зарегистрирован: {info['username']} (id={info['user_id']})"
+    print(msg)
 
-        if args.command == "show-portfolio":
-            if get_current_user() is None:
-                raise ValueError("Сначала выполните login.")
-            result = show_portfolio(base_currency=args.base)
-            _print_portfolio(result)
-            return
 
-        if args.command == "update-rates":
-            cfg = ParserConfig.from_env()
-            clients = [CoinGeckoClient(cfg), ExchangeRateApiClient(cfg)]
-            updater = RatesUpdater(cfg, clients)
-            res = updater.run_update()
-            updated = res.get("updated_pairs", 0)
-            errors = res.get("errors", [])
-            print(f"Курсы обновлены. Пар: {updated}. Ошибок: {len(errors)}")
-            return
+def _cmd_login(args: argparse.Namespace) -> None:
+    from valutatrade_hub.core.usecases import login
+
+    info = login(args.username, args.password, set_default=not args.new_session)
+    print(f"Успешный вход: {info['username']}")
+    if info.get("token"):
+        print(f"Токен сессии: {info['token']}")
+
+
+def _cmd_logout(args: argparse.Namespace) -> None:
+    from valutatrade_hub.core.usecases import logout
+
+    logout()
+    print("Вы вышли из аккаунта.")
+
+
+def _cmd_get_rate(args: argparse.Namespace) -> None:
+    from valutatrade_hub.core.usecases import get_rate
+
+    r = get_rate(args.from_currency, args.to_currency)
+    msg = (
+        f"Курс {r['from']} -> {r['to']}: {r['rate']} "
+        f"(источник: {r['source']}, обновлено: {r['last_refresh']})"
+    )
+    print(msg)
+
+
+def _warn_stale_price(res: dict) -> None:
+    if res.get("price_stale"):
+        print(
+            f"Внимание: цена {res['price']} USD взята из устаревшего снимка "
+            "курсов. Выполните update-rates."
+        )
+
+
+def _cmd_buy(args: argparse.Namespace) -> None:
+    from valutatrade_hub.core.usecases import buy_currency
+
+    _require_login()
+    res = buy_currency(args.currency_code, args.amount)
+    print(f"Покупка выполнена: {res['currency_code']} баланс={res['balance']}")
+    _warn_stale_price(res)
+
+
+def _cmd_sell(args: argparse.Namespace) -> None:
+    from valutatrade_hub.core.usecases import sell_currency
+
+    _require_login()
+    res = sell_currency(args.currency_code, args.amount, policy=args.policy)
+    print(f"Продажа выполнена: {res['currency_code']} баланс={res['balance']}")
+    _warn_stale_price(res)
+    if res["realized_pnl"] is not None:
+        print(f"Реализованный PnL: {res['realized_pnl']:.2f} USD")
+
+
+def _cmd_trade_batch(args: argparse.Namespace) -> None:
+    from pathlib import Path
+
+    from valutatrade_hub.core.usecases import execute_trades
+    from valutatrade_hub.core.utils import read_trade_orders
+
+    orders = read_trade_orders(Path(args.file), args.format)
+    results = execute_trades(orders)
+    _print_trade_results(results)
+
+
+def _cmd_place_order(args: argparse.Namespace) -> None:
+    from valutatrade_hub.core.usecases import place_order
+
+    o = place_order(args.side, args.currency_code, args.amount, args.price, args.kind)
+    sign = "<=" if o["direction"] == "le" else ">="
+    print(
+        f"Ордер #{o['id']} размещён: {o['side']} {o['amount']} "
+        f"{o['currency_code']} при {o['pair']} {sign} {o['price']}"
+    )
+
+
+def _cmd_list_orders(args: argparse.Namespace) -> None:
+    from valutatrade_hub.core.usecases import list_orders
+
+    _print_orders(list_orders())
+
+
+def _cmd_cancel_order(args: argparse.Namespace) -> None:
+    from valutatrade_hub.core.usecases import cancel_order
+
+    o = cancel_order(args.order_id)
+    print(f"Ордер #{o['id']} отменён.")
+
+
+def _cmd_replay(args: argparse.Namespace) -> None:
+    from valutatrade_hub.core.usecases import replay_ledger
+
+    res = replay_ledger(workers=args.workers, full=args.full, check=args.check)
+    for m in res["mismatches"]:
+        print(
+            f"user_id={m['user_id']} {m['currency_code']}: "
+            f"портфель={m['portfolio']} журнал={m['ledger']}"
+        )
+    action = "Записано" if res["written"] else "Проверено"
+    print(f"{action} портфелей: {res['users']}. Расхождений: {len(res['mismatches'])}")
+
+
+def _cmd_show_portfolio(args: argparse.Namespace) -> None:
+    import json
+
+    from valutatrade_hub.cli.output import write_rows
+    from valutatrade_hub.core.usecases import show_portfolio
+
+    _require_login()
+    result = show_portfolio(base_currency=args.base)
+    if args.format == "table":
+        _print_portfolio(result)
+    elif args.format == "json":
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        write_rows(result["wallets"], args.format, ("currency_code", "balance"))
+
+
+def _cmd_update_rates(args: argparse.Namespace) -> None:
+    from valutatrade_hub.core.usecases import process_rate_update
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.registry import SourceRegistry
+    from valutatrade_hub.parser_service.updater import RatesUpdater
+
+    _setup_parser_logger()
+    cfg = ParserConfig.from_env()
+    pairs = (
+        [p.strip().upper() for p in args.pairs.split(",") if p.strip()]
+        if args.pairs
+        else None
+    )
+    clients = SourceRegistry.from_config(cfg).build(cfg, args.source, pairs)
+    updater = RatesUpdater(cfg, clients, on_update=[process_rate_update])
+    if args.watch:
+        from valutatrade_hub.parser_service.http import close_shared_session
+        from valutatrade_hub.parser_service.scheduler import WatchLoop
+
+        loop = WatchLoop(updater)
+        loop.install_signal_handlers()
+        try:
+            ticks = loop.run()
+        finally:
+            close_shared_session()
+        print(f"Режим --watch остановлен. Тиков: {ticks}")
+        return
+    res = updater.run_update(pairs=pairs)
+    updated = res.get("updated_pairs", 0)
+    errors = res.get("errors", [])
+    print(f"Курсы обновлены. Пар: {updated}. Ошибок: {len(errors)}")
+    fills = [r for hook in res.get("on_update", []) for r in hook or []]
+    if fills:
+        ok = sum(1 for r in fills if r["ok"])
+        print(f"Сработало ордеров: {len(fills)} (исполнено: {ok})")
+
+
+def _print_health(rows: list[dict]) -> None:
+    from datetime import datetime
+
+    from prettytable import PrettyTable
+
+    def ms(value: float | None) -> str:
+        return "-" if value is None else f"{value:.0f}"
+
+    def at(ts: float | None) -> str:
+        return "-" if not ts else datetime.fromtimestamp(ts).strftime("%m-%d %H:%M")
+
+    table = PrettyTable()
+    table.field_names = [
+        "Источник",
+        "Статус",
+        "Цепь",
+        "p50/p90/p99, мс",
+        "Успех",
+        "Пар",
+        "Последний успех",
+        "Последняя ошибка",
+    ]
+    table.align["Последняя ошибка"] = "l"
+    for r in rows:
+        rate = r["success_rate"]
+        success = "-" if rate is None else f"{rate:.0%} из {r['requests']}"
+        if r.get("cached"):
+            success += f", кэш {r['cached']}"
+        error = r["last_error"] or "-"
+        if r["last_error"]:
+            error = f"{at(r['last_error_at'])} {error[:60]}"
+        table.add_row(
+            [
+                r["source"],
+                r["status"],
+                r["breaker"],
+                f"{ms(r['p50_ms'])}/{ms(r['p90_ms'])}/{ms(r['p99_ms'])}",
+                success,
+                "-" if r["pairs"] is None else r["pairs"],
+                at(r["last_success_at"]),
+                error,
+            ]
+        )
+    print(table)
+
+
+def _cmd_rates_health(args: argparse.Namespace) -> None:
+    import json
+
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.health import SourceHealth, health_report
+
+    cfg = ParserConfig.from_env()
+    stats = SourceHealth(cfg.source_health_file).stats()
+    rows = health_report(stats, cfg.poll_intervals, cfg.health_slow_ms)
+    if args.format == "json":
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    elif rows:
+        _print_health(rows)
+    else:
+        print("Нет данных: update-rates ещё не запускался.")
+    if args.check and any(r["status"] != "ok" for r in rows):
+        raise SystemExit(1)
+
+
+def _cmd_shell(args: argparse.Namespace) -> None:
+    from valutatrade_hub.cli.shell import run_shell
+
+    run_shell(flush_interval=args.flush_interval)
+
+
+def _cmd_run(args: argparse.Namespace) -> None:
+    import sys
+    from pathlib import Path
+
+    from valutatrade_hub.cli.script import run_script
+
+    if args.file == "-":
+        counts = run_script(sys.stdin, stop_on_error=args.stop_on_error)
+    else:
+        path = Path(args.file)
+        if not path.is_file():
+            raise ValueError(f"Файл не найден: {path}")
+        with path.open(encoding="utf-8") as f:
+            counts = run_script(f, stop_on_error=args.stop_on_error)
+    print(
+        f"Команд выполнено: {counts['ok']}, с ошибкой: {counts['failed']}",
+        file=sys.stderr,
+    )
+    if counts["failed"] or counts.get("conflicts"):
+        raise SystemExit(1)
+
+
+def _cmd_serve(args: argparse.Namespace) -> None:
+    from valutatrade_hub.daemon.server import Daemon
+
+    _setup_parser_logger()
+    daemon = Daemon(args.listen, flush_interval=args.flush_interval).start()
+    daemon.install_signal_handlers()
+    print(f"serve: {daemon.url}")
+    daemon.serve_forever()
+    print(f"serve остановлен. Запросов: {daemon.stats['requests']}")
+
+
+# Команды, которые работают долго и периодически пишут метрики
+LONG_RUNNING = ("shell", "run", "serve")
+
+COMMANDS: dict[str, Callable[[argparse.Namespace], None]] = {
+    "register": _cmd_register,
+    "login": _cmd_login,
+    "logout": _cmd_logout,
+    "get-rate": _cmd_get_rate,
+    "buy": _cmd_buy,
+    "sell": _cmd_sell,
+    "trade-batch": _cmd_trade_batch,
+    "place-order": _cmd_place_order,
+    "list-orders": _cmd_list_orders,
+    "cancel-order": _cmd_cancel_order,
+    "replay": _cmd_replay,
+    "show-portfolio": _cmd_show_portfolio,
+    "update-rates": _cmd_update_rates,
+    "rates-health": _cmd_rates_health,
+    "shell": _cmd_shell,
+    "run": _cmd_run,
+    "serve": _cmd_serve,
+}
+
+
+def execute(args: argparse.Namespace) -> None:
+    # Выполняет разобранную команду; ошибки - SystemExit с текстом для вывода
+    if args.command == "show-rates":
+        _cmd_show_rates(args)
+        return
 
-        raise ValueError("Неизвестная команда.")
+    handler = COMMANDS.get(args.command)
+    try:
+        if handler is None:
+            raise ValueError("Неизвестная команда.")
+        # --token у отдельной команды shell/run - только для неё
+        with _token_scope(getattr(args, "token", None)):
+            handler(args)
 
     except ValueError as e:
         raise SystemExit(f"Ошибка: {e}") from e
     except Exception as e:
-        logging.getLogger("parser_service").exception("CLI: внутренняя ошибка")
+        _setup_parser_logger().exception("CLI: внутренняя ошибка")
         msg = "Ошибка: Внутренняя ошибка. Подробности в logs/parser_service.log"
         raise SystemExit(msg) from e
+
+
+def run_cli(argv: list[str] | None = None) -> None:
+    import os
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    modes = args.profile or os.environ.get("VALUTATRADE_PROFILE")
+    if modes:
+        from valutatrade_hub.infra.profiling import parse_modes
+
+        try:
+            parse_modes(modes)
+        except ValueError as e:
+            parser.error(str(e))
+
+    with _token_scope(args.token or os.environ.get("VALUTATRADE_TOKEN")):
+        # Метрики пишутся в logs/ долгоживущими командами (периодически и при
+        # выходе), остальными - только при VALUTATRADE_METRICS=1
+        long_running = args.command in LONG_RUNNING or getattr(args, "watch", False)
+        if not (long_running or os.environ.get("VALUTATRADE_METRICS") == "1"):
+            _run(args, modes)
+            return
+
+        from valutatrade_hub.infra.metrics import exporting
+
+        with exporting():
+            _run(args, modes)
+
+
+def _token_scope(token: str | None) -> ContextManager[Any]:
+    # Сессия по токену; без токена - сессия по умолчанию (session.json)
+    if not token:
+        return contextlib.nullcontext()
+
+    from valutatrade_hub.core.sessions import token_scope
+
+    return token_scope(token)
+
+
+def _run(args: argparse.Namespace, modes: str | None) -> None:
+    if not modes:
+        execute(args)
+        return
+
+    from valutatrade_hub.infra.profiling import profile_call
+
+    profile_call(lambda: execute(args), args.command, modes)
@@ -0,0 +1,95 @@
+# Машиночитаемый вывод show-rates и show-portfolio (--format json|ndjson|csv).
+# Строки идут генераторами: фильтр применяется до построения строк, --top -
+# heapq.nlargest (в памяти N строк), запись - по мере появления строк. Только
+# table (PrettyTable) собирает все строки в память.
+
+from __future__ import annotations
+
+import csv
+import heapq
+import json
+import sys
+from typing import Any, Iterable, Iterator, TextIO
+
+FORMATS = ("table", "json", "ndjson", "csv")
+RATE_FIELDS = ("from", "to", "rate", "updated_at", "source")
+
+
+def iter_rate_rows(
+    data: dict[str, Any], base: str = "USD", currency: str | None = None
+) -> Iterator[dict[str, Any]]:
+    # Строки курсов из rates.json; currency отбирает пары по валюте "from"
+    pairs = data.get("pairs_usd_per_unit") or data.get("pairs") or {}
+    last_refresh = data.get("last_refresh")
+    source = data.get("source")
+    cur = currency.upper() if currency else None
+
+    for k, v in pairs.items():
+        if isinstance(k, str) and "_" in k:
+            frm, to = k.split("_", 1)
+        else:
+            frm, to = str(k), base
+        if cur is not None and frm.upper() != cur:
+            continue
+
+        if isinstance(v, dict) and "rate" in v:
+            rate = v.get("rate")
+            updated = v.get("updated_at") or v.get("timestamp") or last_refresh
+            src = v.get("source") or source
+        else:
+            rate, updated, src = v, last_refresh, source
+        yield dict(zip(RATE_FIELDS, (frm, to, rate, updated, src)))
+
+
+def _rate_key(row: dict[str, Any]) -> tuple[bool, float]:
+    # Строки без числового курса - в конце
+    try:
+        return True, float(row["rate"])
+    except (TypeError, ValueError):
+        return False, 0.0
+
+
+def top_rows(rows: Iterable[dict[str, Any]], n: int) -> list[dict[str, Any]]:
+    # N самых дорогих по rate без сортировки всех строк
+    return heapq.nlargest(n, rows, key=_rate_key)
+
+
+def write_rows(
+    rows: Iterable[dict[str, Any]],
+    fmt: str,
+    fields: tuple[str, ...],
+    out: TextIO | None = None,
+) -> int:
+    # Пишет строки в формате fmt по одной; возвращает их число
+    out = out or sys.stdout
+    count = 0
+    if fmt == "table":
+        from prettytable import PrettyTable
+
+        t = PrettyTable()
+        t.field_names = list(fields)
+        for row in rows:
+            t.add_row([row.get(f) for f in fields])
+            count += 1
+        print(t, file=out)
+    elif fmt == "ndjson":
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    elif fmt == "json":
+        # JSON-массив: элементы пишутся сразу, без списка в памяти
+        out.write("[")
+        for row in rows:
+            item = json.dumps(row, ensure_ascii=False)
+            out.write(("," if count else "") + "\n  " + item)
+            count += 1
+        out.write("\n]\n" if count else "]\n")
+    elif fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        raise ValueError(f"Неизвестный формат '{fmt}'. Доступно: {', '.join(FORMATS)}")
+    return count
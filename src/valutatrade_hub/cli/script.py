@@ -0,0 +1,77 @@
+# Пакетный режим (project run FILE|-): по одной команде CLI на строку, все
+# строки выполняются в одном процессе с общим кэшем данных, файлы данных
+# записываются один раз в конце. Каждая строка - транзакция кэша: изменения
+# команды, завершившейся ошибкой, не остаются в памяти. Результат каждой
+# строки - строка NDJSON:
+#
+#     {"line": 3, "command": "buy BTC 0.1", "ok": true, "output": "..."}
+#     {"line": 4, "command": "sell BTC 9", "ok": false, "error": "Ошибка: ..."}
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import shlex
+import sys
+from typing import Any, Iterable, TextIO
+
+from valutatrade_hub.cli.interface import build_parser, execute
+from valutatrade_hub.core.datacache import DataCache
+from valutatrade_hub.core.exceptions import DataConflictError
+
+# Команды, которые в пакете не имеют смысла
+NOT_IN_SCRIPT = ("run", "shell", "serve")
+
+
+def _run_line(parser: Any, cache: DataCache, line: str) -> dict[str, Any]:
+    # Выполняет одну строку в транзакции кэша, перехватывая её вывод
+    out, err = io.StringIO(), io.StringIO()
+    try:
+        argv = shlex.split(line)
+        if argv[0] in NOT_IN_SCRIPT:
+            raise SystemExit(f"Ошибка: команда {argv[0]} недоступна в run.")
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            args = parser.parse_args(argv)
+            with cache.transaction():
+                execute(args)
+    except ValueError as e:
+        # shlex: незакрытые кавычки; DataConflictError при записи
+        return {"ok": False, "error": f"Ошибка: {e}"}
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            # argparse печатает ошибку разбора в stderr и выходит с кодом 2
+            lines = err.getvalue().strip().splitlines()
+            message = e.code if isinstance(e.code, str) else (lines or [""])[-1]
+            return {"ok": False, "error": message}
+    return {"ok": True, "output": out.getvalue().rstrip("\n")}
+
+
+def run_script(
+    lines: Iterable[str], stop_on_error: bool = False, out: TextIO | None = None
+) -> dict[str, int]:
+    # Выполняет команды и пишет результаты в out (по умолчанию stdout)
+    out = out or sys.stdout
+    parser = build_parser()
+    counts = {"ok": 0, "failed": 0}
+
+    cache = DataCache(flush_interval=None)
+    try:
+        with cache:
+            for n, raw in enumerate(lines, 1):
+                line = raw.strip()
+                if not line or line.startswith("#"):
+                    continue
+                result = _run_line(parser, cache, line)
+                counts["ok" if result["ok"] else "failed"] += 1
+                record = {"line": n, "command": line, **result}
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                if stop_on_error and not result["ok"]:
+                    break
+    except DataConflictError as e:
+        # запись в конце: файл изменил другой процесс, изменения не записаны
+        print(f"Ошибка: {e}", file=sys.stderr)
+        counts["conflicts"] = len(e.paths)
+    # сколько раз файлы данных записывались на диск (по разу на файл)
+    counts["flushed"] = cache.stats["flushed"]
+    return counts
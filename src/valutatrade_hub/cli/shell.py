@@ -0,0 +1,98 @@
+# Интерактивный режим (project shell): команды CLI выполняются в одном
+# процессе, пользователи, портфели, курсы и сессия держатся в памяти
+# (DataCache) и записываются на диск при изменении или по таймеру. Каждая
+# команда - транзакция кэша: изменения упавшей команды не остаются в памяти.
+
+from __future__ import annotations
+
+import shlex
+import sys
+from typing import Any, Iterable, Iterator
+
+from valutatrade_hub.cli.interface import build_parser, execute
+from valutatrade_hub.core.datacache import DataCache
+from valutatrade_hub.core.exceptions import DataConflictError
+
+PROMPT = "valutatrade> "
+# Команды самого shell (не подкоманды CLI)
+EXIT_COMMANDS = ("exit", "quit")
+HELP_TEXT = (
+    "Команды CLI без префикса project (например: get-rate BTC USD).\n"
+    "flush - записать изменения на диск, exit/quit или Ctrl+D - выход."
+)
+
+
+def _interactive_lines() -> Iterator[str]:
+    # Строки с терминала: с подсказкой и историей (readline, если есть)
+    try:
+        import readline  # noqa: F401
+    except ImportError:
+        pass
+    while True:
+        try:
+            yield input(PROMPT)
+        except EOFError:
+            print()
+            return
+        except KeyboardInterrupt:
+            print()
+
+
+def run_shell(
+    lines: Iterable[str] | None = None, flush_interval: float = 1.0
+) -> DataCache:
+    # Выполняет команды из lines (по умолчанию - stdin). Возвращает кэш,
+    # его stats показывают, сколько раз файлы читались с диска.
+    if lines is None:
+        lines = _interactive_lines() if sys.stdin.isatty() else sys.stdin
+    parser = build_parser()
+
+    cache = DataCache(flush_interval)
+    try:
+        with cache:
+            _loop(cache, parser, lines)
+    except DataConflictError as e:
+        # сброс при выходе: файл изменил другой процесс
+        print(f"Ошибка: {e}", file=sys.stderr)
+    return cache
+
+
+def _loop(cache: DataCache, parser: Any, lines: Iterable[str]) -> None:
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line in EXIT_COMMANDS:
+            break
+        if line == "help":
+            print(HELP_TEXT)
+            continue
+        if line == "flush":
+            try:
+                print(f"Записано файлов: {cache.flush()}")
+            except DataConflictError as e:
+                print(f"Ошибка: {e}", file=sys.stderr)
+            continue
+
+        try:
+            argv = shlex.split(line)
+        except ValueError as e:
+            print(f"Ошибка: {e}", file=sys.stderr)
+            continue
+        if argv[0] == "shell":
+            print("Ошибка: shell уже запущен.", file=sys.stderr)
+            continue
+        try:
+            # argparse сам печатает ошибку разбора и --help
+            args = parser.parse_args(argv)
+        except SystemExit:
+            continue
+
+        try:
+            with cache.transaction():
+                execute(args)
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                print(e.code, file=sys.stderr)
+        except DataConflictError as e:
+            print(f"Ошибка: {e}", file=sys.stderr)
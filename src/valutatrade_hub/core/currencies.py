@@ -96,3 +96,30 @@ def get_currency(code: str) -> Currency:
     if cur is None:
         raise CurrencyNotFoundError(c)
     return cur
+
+
+# Интернирование кодов валют в маленькие целые числа (для компактных хранилищ).
+# Коды из реестра получают индексы первыми; неизвестные коды добавляются по запросу.
+_CODE_INDEX: dict[str, int] = {}
+_CODES: list[str] = []
+
+
+def currency_index(code: str) -> int:
+    c = _validate_code(code)
+    idx = _CODE_INDEX.get(c)
+    if idx is None:
+        idx = len(_CODES)
+        _CODES.append(c)
+        _CODE_INDEX[c] = idx
+    return idx
+
+
+def currency_code(index: int) -> str:
+    try:
+        return _CODES[index]
+    except IndexError:
+        raise CurrencyNotFoundError(f"#{index}") from None
+
+
+for _code in _CURRENCIES:
+    currency_index(_code)
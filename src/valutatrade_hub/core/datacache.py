@@ -0,0 +1,376 @@
+# Кэш JSON-файлов данных в памяти для долгоживущих процессов (shell, serve,
+# run). Файл разбирается один раз; при следующих чтениях проверяется только
+# stat, и изменения, сделанные другим процессом, подхватываются. Записи
+# остаются в памяти и сбрасываются на диск сразу (flush_interval=0),
+# фоновым потоком по таймеру или только в flush()/close() (None).
+#
+# Запись кэша помнит версию файла (stamp), от которой отсчитаны её изменения.
+# Перед записью на диск версия сверяется с файлом под его flock: если файл
+# успел изменить другой процесс, поверх чужих данных ничего не пишется -
+# запись выбрасывается из кэша (следующее чтение возьмёт файл с диска) и
+# поднимается DataConflictError.
+#
+# Команды выполняются в transaction(): read_json отдаёт копию данных,
+# write_json копит изменения в транзакции, и в кэш (при flush_interval=0 -
+# и на диск) они попадают, только если команда завершилась без исключения.
+# Вне транзакции read_json отдаёт общий объект из кэша.
+#
+# Дозапись журнала сделок (append_data) в транзакции - её часть: при
+# фиксации она попадает в кэш вместе с записанными файлами и пишется на
+# диск вместе с ними (при flush_interval=0 - сразу, иначе в flush()), после
+# проверки конфликтов. Если при сбросе хотя бы один файл изменил другой
+# процесс, не пишется ни журнал, ни файлы: журнал и portfolios.json не
+# расходятся ни при конфликте, ни при сбое процесса до сброса.
+
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import pickle
+import threading
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from valutatrade_hub.core.exceptions import DataConflictError
+from valutatrade_hub.core.utils import (
+    file_lock,
+    read_json_file,
+    set_data_cache,
+    write_json_file,
+)
+
+
+def _stamp(path: str) -> tuple[int, int, int] | None:
+    # Признак версии файла: меняется при любой перезаписи
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def _copy(obj: Any) -> Any:
+    # Глубокая копия данных JSON (и deque лотов): круг через pickle почти
+    # вдвое быстрее рекурсивного копирования и copy.deepcopy
+    return pickle.loads(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+
+
+class _Entry:
+    # stamp - версия файла на диске, от которой отсчитан obj;
+    # version - номер версии obj в памяти (меняется при каждой установке)
+    __slots__ = ("obj", "stamp", "dirty", "version")
+
+    def __init__(
+        self, obj: Any, stamp: tuple | None, version: int, dirty: bool = False
+    ) -> None:
+        self.obj = obj
+        self.stamp = stamp
+        self.version = version
+        self.dirty = dirty
+
+
+class _Transaction:
+    __slots__ = ("objs", "base", "written", "appends")
+
+    def __init__(self) -> None:
+        # путь -> объект команды (копия из кэша или записанный)
+        self.objs: dict[str, Any] = {}
+        # путь -> версия записи кэша при первом чтении (None - файла не было)
+        self.base: dict[str, int | None] = {}
+        self.written: set[str] = set()
+        # дозаписи файлов (путь, функция записи) в порядке вызова
+        self.appends: list[tuple[str, Callable[[], Any]]] = []
+
+
+class DataCache:
+    def __init__(self, flush_interval: float | None = 0.0) -> None:
+        if flush_interval is not None and flush_interval < 0:
+            raise ValueError("flush_interval должен быть >= 0.")
+        self.flush_interval = flush_interval
+        self.lock = threading.RLock()
+        self.stats = {"loads": 0, "hits": 0, "writes": 0, "flushed": 0, "conflicts": 0}
+        self._entries: dict[str, _Entry] = {}
+        self._versions = itertools.count(1)
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._previous: Any = None
+        # дозаписи зафиксированных транзакций, ждущие сброса вместе с файлами
+        self._appends: list[tuple[str, Callable[[], Any]]] = []
+
+    # чтение и запись
+
+    def _current(self, key: str, default: Any) -> _Entry | None:
+        # Запись кэша, согласованная с диском (под self.lock); None - файла нет
+        e = self._entries.get(key)
+        if e is not None and e.dirty:
+            self.stats["hits"] += 1
+            return e
+        stamp = _stamp(key)
+        if e is not None and e.stamp == stamp:
+            self.stats["hits"] += 1
+            return e
+        if stamp is None:
+            self._entries.pop(key, None)
+            return None
+        obj = read_json_file(Path(key), default)
+        e = self._entries[key] = _Entry(obj, stamp, next(self._versions))
+        self.stats["loads"] += 1
+        return e
+
+    def read(self, path: Path, default: Any) -> Any:
+        key = os.path.abspath(path)
+        tx = self._transaction()
+        if tx is not None and key in tx.objs:
+            return tx.objs[key]
+        with self.lock:
+            e = self._current(key, default)
+            if tx is None:
+                return default if e is None else e.obj
+            obj = default if e is None else _copy(e.obj)
+            tx.objs[key] = obj
+            tx.base[key] = None if e is None else e.version
+            return obj
+
+    def write(self, path: Path, obj: Any) -> None:
+        key = os.path.abspath(path)
+        tx = self._transaction()
+        if tx is not None:
+            tx.objs[key] = obj
+            tx.written.add(key)
+            return
+        # вне транзакции объект из кэша меняется на месте: изменения
+        # отсчитаны от версии файла, прочитанной в кэш
+        with self.lock:
+            e = self._entries.get(key)
+            base = {} if e is None else {key: e.version}
+        self._commit({key: obj}, base)
+
+    def append(self, path: Path, write: Callable[[], Any]) -> Any:
+        # Дозапись файла path функцией write под file_lock(path). В транзакции
+        # выполняется вместе с записью её файлов (возвращается None), вне
+        # транзакции - сразу
+        key = os.path.abspath(path)
+        tx = self._transaction()
+        if tx is not None:
+            tx.appends.append((key, write))
+            return None
+        with file_lock(Path(key)):
+            return write()
+
+    def dirty(self) -> list[str]:
+        with self.lock:
+            return [key for key, e in self._entries.items() if e.dirty]
+
+    # транзакции
+
+    def _transaction(self) -> _Transaction | None:
+        return getattr(self._local, "tx", None)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        # Команда внутри блока работает с копиями данных; её записи попадают
+        # в кэш при выходе из блока без исключения, иначе отбрасываются.
+        # Вложенный блок - часть внешней транзакции
+        if self._transaction() is not None:
+            yield
+            return
+        tx = self._local.tx = _Transaction()
+        try:
+            yield
+        finally:
+            self._local.tx = None
+        if tx.written or tx.appends:
+            objs = {key: tx.objs[key] for key in tx.written}
+            self._commit(objs, tx.base, tx.appends)
+
+    @contextmanager
+    def immediate(self) -> Iterator[None]:
+        # Отдельная от транзакции команды транзакция, которая пишется на
+        # диск при выходе из блока при любом flush_interval (отложенные
+        # изменения сбрасываются до неё). Для записей, за которыми следуют
+        # файлы вне кэша: сработавшие ордера отмечаются исполненными в
+        # журнале ордеров только после записи сделок
+        outer = self._transaction()
+        tx = self._local.tx = _Transaction()
+        try:
+            yield
+        finally:
+            self._local.tx = outer
+        if tx.written or tx.appends:
+            self.flush()
+            objs = {key: tx.objs[key] for key in tx.written}
+            self._commit(objs, tx.base, tx.appends, write_through=True)
+
+    def _commit(
+        self,
+        objs: dict[str, Any],
+        base: dict[str, int | None],
+        appends: list[tuple[str, Callable[[], Any]]] | None = None,
+        write_through: bool | None = None,
+    ) -> None:
+        # Устанавливает записанные объекты в кэш; base - версии, от которых
+        # отсчитаны изменения (файлы, записанные без чтения, в base нет).
+        # При flush_interval=0 файлы пишутся сразу, под их flock, а дозаписи
+        # выполняются перед ними; иначе дозаписи ждут flush()
+        keys = sorted(objs)
+        appends = appends or []
+        if write_through is None:
+            write_through = self.flush_interval == 0
+        with ExitStack() as stack:
+            if write_through:
+                for key in sorted(set(keys).union(k for k, _ in appends)):
+                    stack.enter_context(file_lock(Path(key)))
+            with self.lock:
+                stamps: dict[str, tuple | None] = {}
+                conflicts = []
+                for key in keys:
+                    e = self._entries.get(key)
+                    if key not in base:
+                        # запись без чтения заменяет файл целиком
+                        if e is not None and e.dirty:
+                            stamps[key] = e.stamp
+                        else:
+                            stamps[key] = _stamp(key)
+                        continue
+                    if base[key] != (None if e is None else e.version):
+                        # кэш изменила другая команда после нашего чтения
+                        conflicts.append(key)
+                        continue
+                    stamps[key] = None if e is None else e.stamp
+                    if write_through and _stamp(key) != stamps[key]:
+                        conflicts.append(key)
+                if conflicts:
+                    self._discard(conflicts)
+                    raise DataConflictError(conflicts)
+
+                if write_through:
+                    for _, write in appends:
+                        write()
+                else:
+                    self._appends.extend(appends)
+                for key in keys:
+                    e = _Entry(objs[key], stamps[key], next(self._versions), True)
+                    self._entries[key] = e
+                    self.stats["writes"] += 1
+                    if write_through:
+                        self._write(key, e)
+
+    def _discard(self, keys: list[str]) -> None:
+        # Конфликт: запись выбрасывается, следующее чтение возьмёт файл с диска
+        for key in keys:
+            self._entries.pop(key, None)
+        self.stats["conflicts"] += len(keys)
+        logging.getLogger(__name__).warning(
+            "DataCache: файлы изменены другим процессом: %s", ", ".join(keys)
+        )
+
+    # сброс на диск
+
+    def flush(self) -> int:
+        # Записывает изменённые файлы, возвращает их число. Файл, который
+        # после чтения изменил другой процесс, не пишется: изменения в памяти
+        # отбрасываются, после записи остальных поднимается DataConflictError.
+        # Если ждут дозаписи (журнал сделок), файлы и дозаписи пишутся вместе
+        # под всеми блокировками, а при конфликте отбрасываются все
+        with self.lock:
+            keys = sorted(key for key, e in self._entries.items() if e.dirty)
+            grouped = bool(self._appends)
+        if grouped:
+            return self._flush_group()
+        written, conflicts = 0, []
+        for key in keys:
+            with file_lock(Path(key)), self.lock:
+                e = self._entries.get(key)
+                if e is None or not e.dirty:
+                    continue
+                if _stamp(key) != e.stamp:
+                    self._discard([key])
+                    conflicts.append(key)
+                    continue
+                self._write(key, e)
+                written += 1
+        if conflicts:
+            raise DataConflictError(conflicts)
+        return written
+
+    def _flush_group(self) -> int:
+        # Блокировки берутся до self.lock (как в _commit); если за это время
+        # другая команда изменила ещё файлы, набор блокировок расширяется
+        locked: set[str] = set()
+        while True:
+            with ExitStack() as stack:
+                for key in sorted(locked):
+                    stack.enter_context(file_lock(Path(key)))
+                with self.lock:
+                    keys = sorted(k for k, e in self._entries.items() if e.dirty)
+                    needed = set(keys).union(k for k, _ in self._appends)
+                    if needed <= locked:
+                        return self._write_group(keys)
+            locked |= needed
+
+    def _write_group(self, keys: list[str]) -> int:
+        # Под блокировками всех файлов группы и self.lock
+        conflicts = [k for k in keys if _stamp(k) != self._entries[k].stamp]
+        appends, self._appends = self._appends, []
+        if conflicts:
+            # остальные файлы группы согласованы с отброшенными дозаписями
+            self._discard(conflicts)
+            for key in keys:
+                self._entries.pop(key, None)
+            raise DataConflictError(conflicts)
+        for _, write in appends:
+            write()
+        for key in keys:
+            self._write(key, self._entries[key])
+        return len(keys)
+
+    def _write(self, key: str, e: _Entry) -> None:
+        write_json_file(Path(key), e.obj)
+        e.stamp = _stamp(key)
+        e.dirty = False
+        self.stats["flushed"] += 1
+
+    # жизненный цикл
+
+    def start(self) -> "DataCache":
+        # Устанавливает кэш для read_json/write_json и запускает таймер сброса
+        self._previous = set_data_cache(self)
+        if self.flush_interval:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._flush_loop, name="data-cache-flush", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        # Останавливает таймер, сбрасывает изменения и снимает кэш
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+        finally:
+            set_data_cache(self._previous)
+
+    def _flush_loop(self) -> None:
+        # Ошибка записи не останавливает таймер: файл останется изменённым
+        # и будет записан на следующем тике или при close(). Конфликт уже
+        # записан в лог в _discard
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except DataConflictError:
+                pass
+            except OSError:
+                logging.getLogger(__name__).exception("DataCache: ошибка сброса")
+
+    def __enter__(self) -> "DataCache":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
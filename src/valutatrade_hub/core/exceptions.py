@@ -24,3 +24,14 @@ class ApiRequestError(RuntimeError):
 
     def __init__(self, reason: str) -> None:
         super().__init__(f"Ошибка при обращении к внешнему API: {reason}")
+
+
+class DataConflictError(ValueError):
+    # Файл данных изменил другой процесс после того, как его прочитали
+
+    def __init__(self, paths: list[str]) -> None:
+        names = ", ".join(paths)
+        super().__init__(
+            f"Файл данных изменён другим процессом: {names}. Повторите команду."
+        )
+        self.paths = paths
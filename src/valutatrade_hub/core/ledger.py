@@ -0,0 +1,244 @@
+# Неизменяемый журнал сделок (ledger) и контрольные точки балансов
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from valutatrade_hub.core.utils import (
+    append_data,
+    data_file,
+    file_lock,
+    read_json,
+    write_json_file,
+)
+from valutatrade_hub.infra.settings import SettingsLoader
+
+LEDGER_FILE = data_file("ledger.ndjson")
+CHECKPOINT_FILE = data_file("ledger_checkpoint.json")
+GENESIS_FILE = data_file("ledger_genesis.json")
+
+# Меньше этого числа записей процессы не запускаем: старт пула дороже расчёта
+PARALLEL_MIN_ENTRIES = 10_000
+
+# Балансы: user_id -> {код валюты -> баланс}
+Balances = dict[int, dict[str, float]]
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _apply_entry(balances: dict[str, float], entry: dict[str, Any]) -> None:
+    code = entry["currency_code"]
+    amount = float(entry["amount"])
+    if entry["action"] == "sell":
+        amount = -amount
+    balances[code] = balances.get(code, 0.0) + amount
+
+
+def _replay_users(
+    chunk: list[tuple[int, dict[str, float], list[dict[str, Any]]]],
+) -> Balances:
+    # Воспроизводит записи группы пользователей (выполняется в отдельном процессе)
+    out: Balances = {}
+    for user_id, start, entries in chunk:
+        balances = dict(start)
+        for entry in entries:
+            _apply_entry(balances, entry)
+        out[user_id] = balances
+    return out
+
+
+class Ledger:
+    # Журнал в формате NDJSON: одна сделка на строку, только дозапись.
+    # Каждые checkpoint_every записей сохраняется снимок балансов и смещение
+    # в файле, поэтому восстановление читает только хвост после снимка.
+    # Начальный снимок (genesis) - балансы портфелей до первой записи:
+    # без него полный пересчёт обнулил бы всё, что было до журнала.
+
+    def __init__(
+        self,
+        path: Path = LEDGER_FILE,
+        checkpoint_path: Path = CHECKPOINT_FILE,
+        checkpoint_every: int | None = None,
+        genesis_path: Path | None = None,
+    ) -> None:
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        # по умолчанию рядом с журналом: ledger.ndjson -> ledger_genesis.json
+        self.genesis_path = genesis_path or path.with_name(f"{path.stem}_genesis.json")
+        if checkpoint_every is None:
+            every = SettingsLoader().get("ledger_checkpoint_every", 1000)
+            checkpoint_every = int(every)
+        if checkpoint_every <= 0:
+            raise ValueError("checkpoint_every должен быть > 0.")
+        self.checkpoint_every = checkpoint_every
+
+    # чтение
+
+    def last_seq(self) -> int:
+        # Номер последней записи (читаем только конец файла)
+        if not self.path.exists():
+            return 0
+        with self.path.open("rb") as f:
+            f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            buf = b""
+            while pos > 0:
+                step = min(4096, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+                lines = buf.rstrip(b"\n").split(b"\n")
+                if len(lines) > 1 or pos == 0:
+                    last = lines[-1].strip()
+                    return int(json.loads(last)["seq"]) if last else 0
+        return 0
+
+    def iter_entries(self, offset: int = 0) -> Iterator[tuple[dict[str, Any], int]]:
+        # Записи начиная с байтового смещения; вместе с каждой - смещение после неё
+        if not self.path.exists():
+            return
+        with self.path.open("rb") as f:
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                line = line.strip()
+                if line:
+                    yield json.loads(line), offset
+
+    def load_checkpoint(self) -> dict[str, Any]:
+        # Последний снимок; до первого снимка - начальный
+        cp = read_json(self.checkpoint_path, default=None)
+        if not isinstance(cp, dict):
+            return self.load_genesis() or {"seq": 0, "offset": 0, "balances": {}}
+        return cp
+
+    def load_genesis(self) -> dict[str, Any] | None:
+        genesis = read_json(self.genesis_path, default=None)
+        return genesis if isinstance(genesis, dict) else None
+
+    def has_genesis(self) -> bool:
+        return self.genesis_path.exists()
+
+    def ensure_genesis(self, opening: Callable[[], Balances]) -> bool:
+        # Записывает начальный снимок opening() при создании журнала.
+        # Журнал с записями, но без снимка, не трогаем: балансы до него
+        # уже не восстановить. True - снимок записан сейчас
+        if self.has_genesis():
+            return False
+        with file_lock(self.path):
+            if self.has_genesis() or self.last_seq() > 0:
+                return False
+            balances = {
+                str(uid): {c: float(b) for c, b in wallet.items()}
+                for uid, wallet in opening().items()
+            }
+            genesis = {"seq": 0, "offset": 0, "ts": _now_iso(), "balances": balances}
+            write_json_file(self.genesis_path, genesis, fsync=True)
+        return True
+
+    def project(self) -> Balances:
+        # Балансы как проекция журнала: последний снимок + записи после него
+        balances, _, _ = self._project_from_checkpoint()
+        return balances
+
+    def _project_from_checkpoint(self) -> tuple[Balances, int, int]:
+        cp = self.load_checkpoint()
+        balances: Balances = {
+            int(uid): dict(b) for uid, b in cp.get("balances", {}).items()
+        }
+        seq, offset = int(cp.get("seq", 0)), int(cp.get("offset", 0))
+        for entry, offset in self.iter_entries(offset):
+            _apply_entry(balances.setdefault(int(entry["user_id"]), {}), entry)
+            seq = int(entry["seq"])
+        return balances, seq, offset
+
+    # запись
+
+    def append(self, entries: list[dict[str, Any]]) -> list[dict[str, Any]] | None:
+        # Дописывает сделки одной операцией записи, присваивая seq и время.
+        # В транзакции DataCache запись выполняется вместе с записью
+        # portfolios.json (см. append_data), и возвращается None
+        if not entries:
+            return []
+        # номер последней записи и дозапись - под одной блокировкой файла,
+        # иначе два процесса выдадут одинаковые seq; время - момент сделки
+        ts = _now_iso()
+        return append_data(self.path, lambda: self._append(entries, ts))
+
+    def _append(self, entries: list[dict[str, Any]], ts: str) -> list[dict[str, Any]]:
+        seq = self.last_seq()
+        out = []
+        for e in entries:
+            seq += 1
+            out.append(
+                {
+                    "seq": seq,
+                    "ts": ts,
+                    "user_id": int(e["user_id"]),
+                    "action": e["action"],
+                    "currency_code": e["currency_code"],
+                    "amount": float(e["amount"]),
+                    "rate": e.get("rate"),
+                }
+            )
+
+        payload = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in out)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(payload)
+
+        first = out[0]["seq"]
+        if (first - 1) // self.checkpoint_every != seq // self.checkpoint_every:
+            self.checkpoint()
+        return out
+
+    def checkpoint(self) -> dict[str, Any]:
+        # Снимок балансов на текущий конец журнала
+        balances, seq, offset = self._project_from_checkpoint()
+        cp = {
+            "seq": seq,
+            "offset": offset,
+            "ts": _now_iso(),
+            "balances": {str(uid): b for uid, b in balances.items()},
+        }
+        write_json_file(self.checkpoint_path, cp, fsync=True)
+        return cp
+
+    # полное воспроизведение
+
+    def replay(self, workers: int | None = None, full: bool = False) -> Balances:
+        # Пересчёт балансов всех пользователей.
+        # full=True - с начального снимка, иначе от последнего снимка.
+        # Пользователи независимы, поэтому их записи воспроизводятся параллельно.
+        if full:
+            cp = self.load_genesis() or {"offset": 0, "balances": {}}
+        else:
+            cp = self.load_checkpoint()
+        start = {int(uid): dict(b) for uid, b in cp.get("balances", {}).items()}
+        offset = int(cp.get("offset", 0))
+
+        per_user: dict[int, list[dict[str, Any]]] = {uid: [] for uid in start}
+        total = 0
+        for entry, _ in self.iter_entries(offset):
+            per_user.setdefault(int(entry["user_id"]), []).append(entry)
+            total += 1
+
+        jobs = [(uid, start.get(uid, {}), items) for uid, items in per_user.items()]
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(jobs) < 2 or total < PARALLEL_MIN_ENTRIES:
+            return _replay_users(jobs)
+
+        # multiprocessing импортируется только для параллельного прогона
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunks = [jobs[i::workers] for i in range(workers) if jobs[i::workers]]
+        out: Balances = {}
+        with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+            for part in pool.map(_replay_users, chunks):
+                out.update(part)
+        return out
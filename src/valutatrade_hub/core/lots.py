@@ -0,0 +1,106 @@
+# Учёт себестоимости: лоты покупок и реализованный PnL при продаже
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Any
+
+COST_BASIS_POLICIES = ("fifo", "lifo", "average")
+
+# Лот хранится как [количество, цена за единицу в USD, время покупки]
+
+
+def validate_policy(policy: str) -> str:
+    p = str(policy or "").strip().lower()
+    if p not in COST_BASIS_POLICIES:
+        raise ValueError(
+            f"Неизвестная политика учёта '{policy}'. "
+            f"Допустимо: {', '.join(COST_BASIS_POLICIES)}"
+        )
+    return p
+
+
+def resolve_policy(wallet: dict[str, Any], requested: str | None, default: str) -> str:
+    # Политика кошелька фиксируется первой продажей и действует, пока в нём
+    # есть лоты: average сворачивает лоты в один, после этого fifo/lifo
+    # посчитали бы себестоимость по уже не существующим покупкам
+    fixed = wallet.get("policy")
+    if fixed is None:
+        return requested or default
+    if requested and requested != fixed:
+        raise ValueError(
+            f"Лоты {wallet.get('currency_code', '')} учитываются по политике "
+            f"{fixed}; продажа по {requested} невозможна, пока лоты не списаны."
+        )
+    return fixed
+
+
+def wallet_lots(wallet: dict[str, Any]) -> deque:
+    # Лоты кошелька как deque (список из JSON превращается один раз,
+    # дальше в рамках операции/пакета используется тот же объект)
+    lots = wallet.get("lots")
+    if not isinstance(lots, deque):
+        lots = deque(lots or [])
+        wallet["lots"] = lots
+    return lots
+
+
+def record_lot(
+    wallet: dict[str, Any], qty: float, price: float | None, ts: str
+) -> list | None:
+    # Покупка = новый лот; без известной цены лот не заводится
+    if price is None:
+        return None
+    lot = [float(qty), float(price), ts]
+    wallet_lots(wallet).append(lot)
+    return lot
+
+
+def consume_lots(
+    wallet: dict[str, Any], qty: float, sell_price: float | None, policy: str
+) -> dict[str, Any]:
+    # Списывает qty из лотов по политике и считает реализованный PnL.
+    # Количество сверх лотов (баланс без истории покупок) считается
+    # купленным по цене продажи, т.е. с нулевым PnL.
+    lots = wallet_lots(wallet)
+    remaining = float(qty)
+    cost = 0.0
+    if lots:
+        wallet["policy"] = policy
+
+    if policy == "average":
+        # сворачиваем лоты в один со средней ценой: дальше - O(1)
+        if len(lots) > 1:
+            total_qty = sum(lot[0] for lot in lots)
+            total_cost = sum(lot[0] * lot[1] for lot in lots)
+            ts = lots[-1][2]
+            lots.clear()
+            if total_qty > 0:
+                lots.append([total_qty, total_cost / total_qty, ts])
+        take_from_left = True
+    else:
+        take_from_left = policy == "fifo"
+
+    while remaining > 0 and lots:
+        lot = lots[0] if take_from_left else lots[-1]
+        take = min(lot[0], remaining)
+        cost += take * lot[1]
+        remaining -= take
+        lot[0] -= take
+        if lot[0] <= 1e-12:
+            if take_from_left:
+                lots.popleft()
+            else:
+                lots.pop()
+
+    if not lots:
+        # лоты списаны - следующая продажа может выбрать политику заново
+        wallet.pop("policy", None)
+
+    matched = float(qty) - remaining
+    if sell_price is None:
+        return {"cost_basis": cost, "matched_qty": matched, "realized_pnl": None}
+
+    cost += remaining * sell_price
+    pnl = float(qty) * sell_price - cost
+    return {"cost_basis": cost, "matched_qty": matched, "realized_pnl": pnl}
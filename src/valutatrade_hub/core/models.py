@@ -2,15 +2,17 @@
 
 from __future__ import annotations
 
-import hashlib
 import math
-import secrets
+import sys
 from datetime import datetime
-from typing import Any
+from types import MappingProxyType
+from typing import Any, Mapping
 
 
 def _hash_password(password: str, salt: str) -> str:
-    # Хэш
+    # Хэш (hashlib грузит OpenSSL - импорт только когда нужен пароль)
+    import hashlib
+
     return hashlib.sha256(f"{password}{salt}".encode("utf-8")).hexdigest()
 
 
@@ -24,8 +26,37 @@ def _is_number(value: Any) -> bool:
     return isinstance(value, (int, float)) and not isinstance(value, bool)
 
 
+# Фиксированные курсы для оценки портфеля
+_FIXED_RATES: dict[tuple[str, str], float] = {
+    ("EUR", "USD"): 1.0786,
+    ("BTC", "USD"): 59337.21,
+    ("RUB", "USD"): 0.01016,
+    ("ETH", "USD"): 3720.00,
+}
+
+
+def _fixed_rate(frm: str, to: str) -> float:
+    if frm == to:
+        return 1.0
+    direct = _FIXED_RATES.get((frm, to))
+    if direct is not None:
+        return direct
+    inverse = _FIXED_RATES.get((to, frm))
+    if inverse is not None and inverse != 0:
+        return 1.0 / inverse
+    raise ValueError(f"Курс {frm}->{to} недоступен.")
+
+
 # пользователь
 class User:
+    __slots__ = (
+        "_user_id",
+        "_username",
+        "_hashed_password",
+        "_salt",
+        "_registration_date",
+    )
+
     def __init__(
         self,
         user_id: int,
@@ -48,6 +79,8 @@ class User:
     @staticmethod
     def generate_salt() -> str:
         # уникальная соль для пользователя
+        import secrets
+
         return secrets.token_hex(8)
 
     @classmethod
@@ -129,11 +162,14 @@ class User:
 
 # кошелёк пользователя для одной конкретной валюты
 class Wallet:
+    __slots__ = ("_currency_code", "_balance")
+
     def __init__(self, currency_code: str, balance: float = 0.0) -> None:
         code = str(currency_code).strip().upper()
         if not code:
             raise ValueError("Код валюты не может быть пустым.")
-        self._currency_code = code
+        # один объект строки на код для всех кошельков
+        self._currency_code = sys.intern(code)
         self.balance = balance  # через property setter
 
     @property
@@ -180,6 +216,8 @@ class Wallet:
 
 # управление кошельками пользователя
 class Portfolio:
+    __slots__ = ("_user", "_user_id", "_wallets")
+
     def __init__(self, user: User, wallets: dict[str, Wallet] | None = None) -> None:
         self._user = user
         self._user_id = user.user_id
@@ -190,8 +228,9 @@ class Portfolio:
         return self._user
 
     @property
-    def wallets(self) -> dict[str, Wallet]:
-        return dict(self._wallets)
+    def wallets(self) -> Mapping[str, Wallet]:
+        # представление только для чтения, без копирования словаря
+        return MappingProxyType(self._wallets)
 
     def add_currency(self, currency_code: str) -> Wallet:
         # добавляет новый кошелёк в портфель
@@ -218,27 +257,9 @@ class Portfolio:
         if not base:
             raise ValueError("Базовая валюта не может быть пустой.")
 
-        fixed_rates: dict[tuple[str, str], float] = {
-            ("EUR", "USD"): 1.0786,
-            ("BTC", "USD"): 59337.21,
-            ("RUB", "USD"): 0.01016,
-            ("ETH", "USD"): 3720.00,
-        }
-
-        def rate(frm: str, to: str) -> float:
-            if frm == to:
-                return 1.0
-            direct = fixed_rates.get((frm, to))
-            if direct is not None:
-                return direct
-            inverse = fixed_rates.get((to, frm))
-            if inverse is not None and inverse != 0:
-                return 1.0 / inverse
-            raise ValueError(f"Курс {frm}->{to} недоступен.")
-
         total = 0.0
         for code, wallet in self._wallets.items():
-            total += wallet.balance * rate(code, base)
+            total += wallet.balance * _fixed_rate(code, base)
         return total
 
     def to_dict(self) -> dict[str, Any]:
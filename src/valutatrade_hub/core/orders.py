@@ -0,0 +1,214 @@
+# Условные ордера (limit/stop), индекс срабатывания по цене и хранение
+
+from __future__ import annotations
+
+import json
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Any, Iterable
+
+from valutatrade_hub.core.utils import read_json_file, write_json_file
+
+ORDER_SIDES = ("buy", "sell")
+ORDER_KINDS = ("limit", "stop")
+
+# Направление срабатывания: "le" - при цене <= порога, "ge" - при цене >= порога
+_DIRECTIONS = {
+    ("buy", "limit"): "le",
+    ("sell", "limit"): "ge",
+    ("buy", "stop"): "ge",
+    ("sell", "stop"): "le",
+}
+
+
+def trigger_direction(side: str, kind: str) -> str:
+    try:
+        return _DIRECTIONS[(side, kind)]
+    except KeyError:
+        raise ValueError(f"Неизвестный тип ордера: {side}/{kind}") from None
+
+
+def _key(direction: str, price: float) -> float:
+    # Ключ сортировки подобран так, что сработавшие ордера всегда
+    # оказываются в хвосте массива: для "le" - пороги >= цены,
+    # для "ge" храним -порог, и сработавшие - тоже ключи >= -цены
+    return price if direction == "le" else -price
+
+
+class _SortedSide:
+    # Пара параллельных массивов (ключ, id), упорядоченных по ключу
+
+    __slots__ = ("keys", "ids")
+
+    def __init__(self, keys: list[float] | None = None, ids: list[int] | None = None):
+        self.keys = keys or []
+        self.ids = ids or []
+
+    def insert(self, key: float, order_id: int) -> None:
+        i = bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.ids.insert(i, order_id)
+
+    def pop_from(self, key: float) -> list[int]:
+        # Снимает все элементы с ключом >= key: O(log n + k)
+        i = bisect_left(self.keys, key)
+        if i == len(self.keys):
+            return []
+        out = self.ids[i:]
+        del self.keys[i:]
+        del self.ids[i:]
+        return out
+
+
+class TriggerBook:
+    # Книга триггеров: для каждой пары и направления - отсортированный массив
+    # порогов. Поиск сработавших ордеров при новой цене - O(log n + k).
+
+    def __init__(self) -> None:
+        self._sides: dict[tuple[str, str], _SortedSide] = {}
+        self._cancelled: set[int] = set()
+        self._size = 0
+
+    @classmethod
+    def from_orders(
+        cls, orders: Iterable[tuple[int, str, str, float]]
+    ) -> "TriggerBook":
+        # Массовая загрузка (id, пара, направление, порог): одна сортировка
+        # на сторону вместо n вставок
+        groups: dict[tuple[str, str], list[tuple[float, int]]] = {}
+        for order_id, pair, direction, price in orders:
+            groups.setdefault((pair, direction), []).append(
+                (_key(direction, price), order_id)
+            )
+
+        book = cls()
+        for side_key, items in groups.items():
+            items.sort()
+            book._sides[side_key] = _SortedSide(
+                [k for k, _ in items], [i for _, i in items]
+            )
+            book._size += len(items)
+        return book
+
+    def __len__(self) -> int:
+        return self._size - len(self._cancelled)
+
+    def add(self, order_id: int, pair: str, direction: str, price: float) -> None:
+        if direction not in ("le", "ge"):
+            raise ValueError(f"Неизвестное направление: {direction}")
+        side = self._sides.setdefault((pair, direction), _SortedSide())
+        side.insert(_key(direction, price), order_id)
+        self._size += 1
+
+    def discard(self, order_id: int) -> None:
+        # Ленивая отмена: ордер пропускается при срабатывании
+        self._cancelled.add(order_id)
+
+    def pop_crossed(self, pair: str, price: float) -> list[int]:
+        # id ордеров пары, условие которых выполнено при цене price
+        fired: list[int] = []
+        for direction in ("le", "ge"):
+            side = self._sides.get((pair, direction))
+            if side is not None:
+                fired.extend(side.pop_from(_key(direction, price)))
+        self._size -= len(fired)
+
+        if self._cancelled:
+            live = [i for i in fired if i not in self._cancelled]
+            self._cancelled.difference_update(fired)
+            return live
+        return fired
+
+
+def book_from_orders(orders: Iterable[dict[str, Any]]) -> TriggerBook:
+    # Строит книгу из сохранённых ордеров (data/orders.json); ордера, не
+    # исполненные при срабатывании (status=failed), в книгу не попадают
+    return TriggerBook.from_orders(
+        (o["id"], o["pair"], trigger_direction(o["side"], o["kind"]), o["price"])
+        for o in orders
+        if o.get("status", "open") == "open"
+    )
+
+
+def apply_order_event(orders: dict[int, dict[str, Any]], event: dict) -> None:
+    # Применяет запись журнала ордеров к словарю id -> ордер. Повтор записи
+    # уже применённой последовательности ничего не меняет (см. OrderStore)
+    op, order_id = event["op"], event.get("id")
+    if op == "place":
+        order = event["order"]
+        orders.setdefault(order["id"], order)
+    elif op == "fail":
+        order = orders.get(order_id)
+        if order is not None:
+            order.update({k: v for k, v in event.items() if k not in ("op", "id")})
+            order["status"] = "failed"
+    elif op in ("cancel", "fill"):
+        orders.pop(order_id, None)
+    else:
+        raise ValueError(f"Неизвестная запись журнала ордеров: {op}")
+
+
+class OrderStore:
+    # Ордера на диске: снимок (orders.json, {"next_id", "orders"}) и журнал
+    # изменений после него (NDJSON, только дозапись): place, cancel, fill и
+    # fail дописывают по строке, поэтому их цена не зависит от числа ордеров.
+    # Когда журнал дорастает до числа ордеров, он сворачивается в новый
+    # снимок - O(n), но не чаще чем раз на n изменений.
+    # Вызывающий держит file_lock(path) на всё чтение-изменение-запись.
+
+    def __init__(self, path: Path, log_path: Path) -> None:
+        self.path = path
+        self.log_path = log_path
+
+    def read_snapshot(self) -> dict[str, Any]:
+        return read_json_file(self.path, {"next_id": 1, "orders": []})
+
+    def log_size(self) -> int:
+        try:
+            return self.log_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def read_log(self, offset: int = 0) -> tuple[list[dict], int]:
+        # Записи журнала от смещения offset и смещение конца прочитанного;
+        # строка без перевода строки (запись оборвалась) пропускается
+        try:
+            with self.log_path.open("rb") as f:
+                f.seek(offset)
+                raw = f.read()
+        except FileNotFoundError:
+            return [], 0
+        end = raw.rfind(b"\n") + 1
+        events = [json.loads(line) for line in raw[:end].splitlines() if line]
+        return events, offset + end
+
+    def append(self, events: list[dict]) -> int:
+        # Дописывает записи одной операцией записи, возвращает конец журнала
+        payload = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events)
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.log_path.open("ab") as f:
+            f.write(payload.encode("utf-8"))
+            return f.tell()
+
+    def state(self) -> dict[str, Any]:
+        # Текущие ордера: снимок и журнал после него
+        data = self.read_snapshot()
+        orders = {o["id"]: o for o in data.get("orders", [])}
+        next_id = int(data.get("next_id", 1))
+        events, _ = self.read_log()
+        for e in events:
+            apply_order_event(orders, e)
+            if e["op"] == "place":
+                next_id = max(next_id, e["order"]["id"] + 1)
+        next_id = max(next_id, max(orders, default=0) + 1)
+        return {"next_id": next_id, "orders": list(orders.values())}
+
+    def compact(self) -> dict[str, Any]:
+        # Сворачивает журнал в снимок. Снимок пишется раньше, чем очищается
+        # журнал: если процесс упадёт между ними, старый журнал применится
+        # к новому снимку повторно и ничего не изменит
+        data = self.state()
+        write_json_file(self.path, data, fsync=True)
+        with self.log_path.open("wb"):
+            pass
+        return data
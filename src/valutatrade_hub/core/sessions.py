@@ -0,0 +1,208 @@
+# Сессии пользователей: после login выдаётся непрозрачный токен, который
+# передаётся в команды через --token или VALUTATRADE_TOKEN. Несколько
+# операторов (или ботов) работают с одним каталогом данных одновременно,
+# у каждого своя сессия.
+#
+# Хранилище - data/sessions.db (SQLite, WAL): запись из нескольких процессов
+# сериализует сама SQLite, поиск - по первичному ключу. В таблице лежит только
+# sha256 токена, сам токен знает лишь его владелец. Найденные сессии
+# кэшируются в памяти процесса на SESSION_CACHE_TTL секунд, поэтому в shell,
+# run и serve повторные проверки не обращаются к диску.
+
+from __future__ import annotations
+
+import hashlib
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator
+
+from valutatrade_hub.core.utils import data_file
+
+SESSIONS_DB = data_file("sessions.db")
+
+# Токен, заданный вызывающим кодом (--token / VALUTATRADE_TOKEN)
+_token: ContextVar[str | None] = ContextVar("valutatrade_token", default=None)
+
+
+@contextmanager
+def token_scope(token: str | None) -> Iterator[str | None]:
+    # Команды внутри блока работают с сессией token, а не с сессией по умолчанию
+    reset = _token.set(token or None)
+    try:
+        yield token
+    finally:
+        _token.reset(reset)
+
+
+def current_token() -> str | None:
+    return _token.get()
+
+
+def switch_token(token: str) -> None:
+    # Заменяет токен текущего token_scope до его конца: login в shell/run,
+    # запущенном с --token, переводит следующие команды на новую сессию
+    _token.set(token)
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec="seconds")
+
+
+class SessionStore:
+    # SESSION_TTL - срок жизни сессии, с (7 суток);
+    # SESSION_CACHE_TTL - сколько секунд сессия берётся из памяти без
+    # проверки в базе (30): столько выход в другом процессе может быть не виден
+
+    def __init__(
+        self,
+        path: Path = SESSIONS_DB,
+        ttl: float | None = None,
+        cache_ttl: float | None = None,
+    ) -> None:
+        if ttl is None:
+            ttl = float(os.getenv("SESSION_TTL", str(7 * 24 * 3600)))
+        if cache_ttl is None:
+            cache_ttl = float(os.getenv("SESSION_CACHE_TTL", "30"))
+        if ttl <= 0:
+            raise ValueError("SESSION_TTL должен быть > 0.")
+        self.path = path
+        self.ttl = ttl
+        self.cache_ttl = cache_ttl
+        # sha256 токена -> (сессия, срок, когда проверена в базе)
+        self._cache: dict[str, tuple[dict[str, Any], float, float]] = {}
+        self._lock = threading.Lock()
+        self._db: Any = None
+
+    def _conn(self) -> Any:
+        # Соединение открывается при первом обращении (sqlite3 не нужен
+        # командам без сессии) и одно на хранилище, под self._lock
+        if self._db is None:
+            import sqlite3
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(
+                str(self.path),
+                timeout=10.0,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " token_hash TEXT PRIMARY KEY,"
+                " user_id INTEGER NOT NULL,"
+                " username TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_expires ON sessions(expires_at)"
+            )
+            self._db = db
+        return self._db
+
+    def create(self, user_id: int, username: str, now: float | None = None) -> str:
+        # Новая сессия; заодно удаляются истёкшие
+        now = time.time() if now is None else now
+        token = secrets.token_urlsafe(32)
+        key, expires = _hash(token), now + self.ttl
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+                db.execute(
+                    "INSERT INTO sessions VALUES (?, ?, ?, ?, ?)",
+                    (key, int(user_id), username, now, expires),
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            session = {"user_id": int(user_id), "username": username}
+            self._cache[key] = ({**session, "expires_at": _iso(expires)}, expires, now)
+        return token
+
+    def get(self, token: str, now: float | None = None) -> dict[str, Any] | None:
+        # Сессия по токену или None (нет такой, истекла, вышли)
+        now = time.time() if now is None else now
+        key = _hash(token)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                session, expires, checked = cached
+                if expires <= now:
+                    del self._cache[key]
+                    return None
+                if now - checked < self.cache_ttl:
+                    return dict(session)
+
+            row = (
+                self._conn()
+                .execute(
+                    "SELECT user_id, username, expires_at FROM sessions"
+                    " WHERE token_hash = ?",
+                    (key,),
+                )
+                .fetchone()
+            )
+            if row is None or row[2] <= now:
+                self._cache.pop(key, None)
+                return None
+            session = {
+                "user_id": row[0],
+                "username": row[1],
+                "expires_at": _iso(row[2]),
+            }
+            self._cache[key] = (session, row[2], now)
+            return dict(session)
+
+    def revoke(self, token: str) -> bool:
+        key = _hash(token)
+        with self._lock:
+            self._cache.pop(key, None)
+            cur = self._conn().execute(
+                "DELETE FROM sessions WHERE token_hash = ?", (key,)
+            )
+            return cur.rowcount > 0
+
+    def purge(self, now: float | None = None) -> int:
+        # Удаляет истёкшие сессии; возвращает их число
+        now = time.time() if now is None else now
+        with self._lock:
+            self._cache.clear()
+            cur = self._conn().execute(
+                "DELETE FROM sessions WHERE expires_at <= ?", (now,)
+            )
+            return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_store: SessionStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> SessionStore:
+    # Хранилище процесса (одно на процесс, с общим кэшем)
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore()
+    return _store
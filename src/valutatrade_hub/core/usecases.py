@@ -1,16 +1,38 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, NamedTuple
 
-from valutatrade_hub.core.currencies import get_currency
 from valutatrade_hub.core.exceptions import (
     CurrencyNotFoundError,
     InsufficientFundsError,
 )
+from valutatrade_hub.core.lots import (
+    consume_lots,
+    record_lot,
+    resolve_policy,
+    validate_policy,
+)
 from valutatrade_hub.core.models import Portfolio, User, Wallet
+from valutatrade_hub.core.orders import (
+    ORDER_KINDS,
+    ORDER_SIDES,
+    OrderStore,
+    TriggerBook,
+    apply_order_event,
+    book_from_orders,
+    trigger_direction,
+)
 from valutatrade_hub.core.utils import (
+    ORDERS_JSON,
+    ORDERS_LOG,
     data_file,
+    file_lock,
+    flush_data,
+    immediate_data,
     load_portfolios,
     load_rates,
     load_users,
@@ -24,9 +46,31 @@ from valutatrade_hub.core.utils import (
     validate_username,
     write_json,
 )
-from valutatrade_hub.infra.decorators import log_action
+from valutatrade_hub.infra.decorators import annotate_action, log_action
+from valutatrade_hub.infra.metrics import counter, histogram, timed
+from valutatrade_hub.infra.profiling import span
 from valutatrade_hub.infra.settings import SettingsLoader
 
+# Реестр валют (dataclasses), хранилище сессий (sqlite3, hashlib) и журнал
+# сделок импортируются в функциях, которым они нужны: logout и get-rate
+# запускаются отдельным процессом, и их импорт - основная часть времени
+# запуска (benchmarks/bench_startup.py)
+if TYPE_CHECKING:
+    from valutatrade_hub.core.ledger import Ledger
+
+# Метрики (infra/metrics.py)
+
+USECASE_SECONDS = histogram("usecase_seconds", "Время выполнения операции, с", ("op",))
+USECASE_ERRORS = counter(
+    "usecase_errors_total", "Операции, завершившиеся ошибкой", ("op",)
+)
+_rates_cache = counter(
+    "rates_cache_total", "Обращения к кэшу курсов rates.json", ("result",)
+)
+RATES_CACHE_HIT = _rates_cache.labels(result="hit")
+RATES_CACHE_MISS = _rates_cache.labels(result="miss")
+RATES_REFRESHES = counter("rates_refresh_total", "Обновления устаревшего кэша курсов")
+
 # Курсы и кэш
 
 CACHE_TTL_SECONDS = 300  # 5 минут
@@ -75,16 +119,24 @@ def _refresh_rates_stub() -> dict[str, Any]:
 
 def ensure_rates_fresh() -> dict[str, Any]:
     # Возвращает актуальные курсы. Если кэш устарел — обновляет и сохраняет
-    cache = load_rates()
-    if not _is_fresh(cache.get("last_refresh")) or "rates" not in cache:
-        cache = _refresh_rates_stub()
-        save_rates(cache)
-    return cache
+    with span("ensure_rates_fresh"):
+        cache = load_rates()
+        if not _is_fresh(cache.get("last_refresh")) or "rates" not in cache:
+            RATES_CACHE_MISS.inc()
+            cache = _refresh_rates_stub()
+            save_rates(cache)
+            RATES_REFRESHES.inc()
+        else:
+            RATES_CACHE_HIT.inc()
+        return cache
 
 
+@timed(USECASE_SECONDS, USECASE_ERRORS, op="get_rate")
 def get_rate(from_currency: str, to_currency: str) -> dict:
     # Курс из from_currency в to_currency.
     # Формат rates: сколько единиц валюты X за 1 единицу base.
+    from valutatrade_hub.core.currencies import get_currency
+
     from_code = normalize_currency_code(from_currency)
     to_code = normalize_currency_code(to_currency)
 
@@ -162,8 +214,62 @@ def get_rate(from_currency: str, to_currency: str) -> dict:
 
 # Регистрация/логин/сессия
 
+# Сессия по умолчанию: {"token": ...} последнего login без --token.
+# Сами сессии лежат в data/sessions.db (core/sessions.py)
 SESSION_JSON = data_file("session.json")
 
+# Сессия, заданная вызывающим кодом (у каждого соединения serve - своя).
+# Пока она установлена, login/logout/get_current_user работают с ней,
+# а не с хранилищем сессий
+_session: ContextVar[dict | None] = ContextVar("valutatrade_session", default=None)
+
+
+@contextmanager
+def session_scope(session: dict) -> Iterator[dict]:
+    # session - словарь {"user_id", "username"}, login/logout меняют его на месте
+    token = _session.set(session)
+    try:
+        yield session
+    finally:
+        _session.reset(token)
+
+
+def _default_token() -> str | None:
+    return read_json(SESSION_JSON, default={}).get("token")
+
+
+def _set_session(
+    user_id: Any, username: str | None, set_default: bool = True
+) -> str | None:
+    # Возвращает токен новой сессии (None для сессии serve и при выходе)
+    from valutatrade_hub.core.sessions import current_token, get_store, switch_token
+
+    scoped = _session.get()
+    if scoped is not None:
+        scoped.update(user_id=user_id, username=username)
+        return None
+
+    explicit = current_token()
+    if user_id is None:
+        token = explicit or _default_token()
+        if token:
+            get_store().revoke(token)
+        if not explicit:
+            write_json(SESSION_JSON, {"token": None})
+        return None
+
+    token = get_store().create(user_id, str(username))
+    # с --token/VALUTATRADE_TOKEN (или set_default=False) сессия по умолчанию
+    # не меняется: новый токен получает только тот, кто выполнил login. Под
+    # --token новая сессия становится текущей для следующих команд процесса
+    # (shell, run)
+    if set_default:
+        if explicit:
+            switch_token(token)
+        else:
+            write_json(SESSION_JSON, {"token": token})
+    return token
+
 
 def _next_user_id(users: list[dict]) -> int:
     if not users:
@@ -179,16 +285,22 @@ def _find_user_by_username(users: list[dict], username: str) -> dict | None:
 
 
 def get_current_user() -> dict | None:
-    # Текущий пользователь из session.json или None
-    session = read_json(SESSION_JSON, default={"user_id": None, "username": None})
-    if session.get("user_id") is None:
+    # Текущий пользователь: сессия serve, сессия токена (--token,
+    # VALUTATRADE_TOKEN) или сессия по умолчанию; None, если входа нет
+    session = _session.get()
+    if session is not None:
+        return session if session.get("user_id") is not None else None
+    from valutatrade_hub.core.sessions import current_token, get_store
+
+    token = current_token() or _default_token()
+    if not token:
         return None
-    return session
+    return get_store().get(token)
 
 
 def logout() -> None:
     # Сброс сессии
-    write_json(SESSION_JSON, {"user_id": None, "username": None})
+    _set_session(None, None)
 
 
 def register(username: str, password: str) -> dict:
@@ -213,8 +325,9 @@ def register(username: str, password: str) -> dict:
     return user.get_user_info()
 
 
-def login(username: str, password: str) -> dict:
-    # Логин пользователя
+def login(username: str, password: str, set_default: bool = True) -> dict:
+    # Логин пользователя; set_default=False - только выдать токен, не меняя
+    # сессию по умолчанию (session.json)
     name = validate_username(username)
     pwd = str(password) if password is not None else ""
 
@@ -234,10 +347,14 @@ def login(username: str, password: str) -> dict:
     if not user.verify_password(pwd):
         raise ValueError("Неверное имя пользователя или пароль.")
 
-    write_json(SESSION_JSON, {"user_id": user.user_id, "username": user.username})
-    return user.get_user_info()
+    info = user.get_user_info()
+    token = _set_session(user.user_id, user.username, set_default)
+    if token is not None:
+        info["token"] = token
+    return info
 
 
+@timed(USECASE_SECONDS, USECASE_ERRORS, op="show_portfolio")
 def show_portfolio(base_currency: str = "USD") -> dict:
     # Показать портфель текущего пользователя
     session = get_current_user()
@@ -266,27 +383,31 @@ def show_portfolio(base_currency: str = "USD") -> dict:
     if u_raw is None:
         raise ValueError("Пользователь не найден.")
 
-    user = User(
-        user_id=u_raw["user_id"],
-        username=u_raw["username"],
-        hashed_password=u_raw["hashed_password"],
-        salt=u_raw["salt"],
-        registration_date=u_raw["registration_date"],
-    )
+    with span("build_portfolio"):
+        user = User(
+            user_id=u_raw["user_id"],
+            username=u_raw["username"],
+            hashed_password=u_raw["hashed_password"],
+            salt=u_raw["salt"],
+            registration_date=u_raw["registration_date"],
+        )
 
-    wallets = {}
-    raw_wallets = raw.get("wallets", {})
-    for code, w in raw_wallets.items():
-        # w: {"currency_code": "...", "balance": ...}
-        wallets[code] = Wallet(currency_code=w["currency_code"], balance=w["balance"])
+        wallets = {}
+        raw_wallets = raw.get("wallets", {})
+        for code, w in raw_wallets.items():
+            # w: {"currency_code": "...", "balance": ...}
+            wallets[code] = Wallet(
+                currency_code=w["currency_code"], balance=w["balance"]
+            )
 
-    portfolio = Portfolio(user=user, wallets=wallets)
+        portfolio = Portfolio(user=user, wallets=wallets)
 
-    rows = []
-    for w in portfolio.wallets.values():
-        rows.append({"currency_code": w.currency_code, "balance": w.balance})
+        rows = []
+        for w in portfolio.wallets.values():
+            rows.append({"currency_code": w.currency_code, "balance": w.balance})
 
-    total = portfolio.get_total_value(base_currency=base)
+    with span("valuation"):
+        total = portfolio.get_total_value(base_currency=base)
 
     return {
         "user": user.get_user_info(),
@@ -320,9 +441,127 @@ def _save_user_portfolio(updated: dict) -> None:
     save_portfolios(out)
 
 
+def _usd_per_unit(rates_data: dict, code: str) -> float | None:
+    # Цена 1 единицы code в USD по текущему снимку курсов (если известна).
+    # Поддерживает оба формата rates.json: {"rates": ...} и {"pairs": ...}
+    if code == "USD":
+        return 1.0
+    pair = (rates_data.get("pairs") or {}).get(f"{code}_USD")
+    if isinstance(pair, dict) and pair.get("rate"):
+        return float(pair["rate"])
+    rates = rates_data.get("rates") or {}
+    if rates_data.get("base", "USD") == "USD" and rates.get(code):
+        return 1.0 / float(rates[code])
+    return None
+
+
+def _trade_rates() -> dict:
+    # Курсы для сделок: последний снимок rates.json (pairs пишет update-rates)
+    # только для чтения - сделка никогда не пишет rates.json. Заглушка
+    # LocalStub (её пишет ensure_rates_fresh) - не рыночные цены, и цена
+    # сделки по ней не определяется
+    cache = load_rates()
+    if cache.get("source") == "LocalStub":
+        return {}
+    return cache
+
+
+def _trade_price(rates_data: dict, code: str) -> tuple[float | None, bool]:
+    # Цена code в USD для сделки и признак того, что она взята из снимка
+    # старше rates_ttl_seconds (сделка не отклоняется, а помечается)
+    price = _usd_per_unit(rates_data, code)
+    if code == "USD" or price is None:
+        return price, False
+    return price, not _is_fresh(rates_data.get("last_refresh"))
+
+
+def _ledger_entry(
+    user_id: Any, action: str, code: str, amt: float, rate: float | None
+) -> dict:
+    return {
+        "user_id": user_id,
+        "action": action,
+        "currency_code": code,
+        "amount": amt,
+        "rate": rate,
+    }
+
+
+def _portfolio_balances(portfolios: list[dict]) -> dict[int, dict[str, float]]:
+    return {
+        int(p["user_id"]): {
+            code: float(w.get("balance", 0.0))
+            for code, w in p.get("wallets", {}).items()
+            if float(w.get("balance", 0.0)) != 0.0
+        }
+        for p in portfolios
+    }
+
+
+def _ledger() -> Ledger:
+    # Журнал сделок; при его создании фиксируются начальные балансы
+    # портфелей (вызывать до изменения портфелей)
+    from valutatrade_hub.core.ledger import Ledger
+
+    ledger = Ledger()
+    ledger.ensure_genesis(lambda: _portfolio_balances(load_portfolios()))
+    return ledger
+
+
+def _default_policy() -> str:
+    return validate_policy(SettingsLoader().get("cost_basis_policy", "fifo"))
+
+
+def _apply_buy(
+    wallets: dict, code: str, amt: float, price: float | None = None
+) -> dict:
+    # Зачисление на кошелёк code (кошелёк создаётся при необходимости)
+    # и новый лот по цене price (USD за единицу)
+    if code not in wallets:
+        wallets[code] = {"currency_code": code, "balance": 0.0}
+    wallet = wallets[code]
+    wallet["balance"] = float(wallet["balance"]) + float(amt)
+    record_lot(wallet, amt, price, _now_utc().replace(microsecond=0).isoformat())
+    return {"balance": wallet["balance"], "price": price}
+
+
+def _apply_sell(
+    wallets: dict,
+    code: str,
+    amt: float,
+    price: float | None = None,
+    policy: str | None = None,
+    default_policy: str = "fifo",
+) -> dict:
+    # Списание с кошелька code; если кошелька нет - доступно 0.0.
+    # Лоты списываются по политике policy (не задана - политика кошелька
+    # или default_policy), возвращается реализованный PnL
+    if code not in wallets:
+        raise InsufficientFundsError(available=0.0, required=float(amt), code=code)
+
+    wallet = wallets[code]
+    balance = float(wallet["balance"])
+    if float(amt) > balance:
+        raise InsufficientFundsError(available=balance, required=float(amt), code=code)
+
+    policy = resolve_policy(wallet, policy, default_policy)
+    wallet["balance"] = balance - float(amt)
+    pnl = consume_lots(wallet, amt, price, policy)
+    return {
+        "balance": wallet["balance"],
+        "price": price,
+        "realized_pnl": pnl["realized_pnl"],
+        "cost_basis": pnl["cost_basis"],
+        "policy": policy,
+    }
+
+
+@timed(USECASE_SECONDS, USECASE_ERRORS, op="buy")
 @log_action("buy")
 def buy_currency(currency_code: str, amount: Any) -> dict:
     # Покупка валюты: увеличиваем баланс кошелька currency_code на amount
+    from valutatrade_hub.core.currencies import get_currency
+
     session = get_current_user()
     if session is None:
         raise ValueError("Необходимо выполнить login.")
@@ -332,22 +571,26 @@ def buy_currency(currency_code: str, amount: Any) -> dict:
     amt = validate_amount(amount)
 
     user_id = session["user_id"]
+    annotate_action(user_id=user_id, currency=code, amount=amt)
+    ledger = _ledger()
     portfolio = _load_user_portfolio(user_id)
     wallets = portfolio.get("wallets", {})
-
-    if code not in wallets:
-        wallets[code] = {"currency_code": code, "balance": 0.0}
-
-    wallets[code]["balance"] = float(wallets[code]["balance"]) + float(amt)
+    price, stale = _trade_price(_trade_rates(), code)
+    res = _apply_buy(wallets, code, amt, price)
     portfolio["wallets"] = wallets
 
+    # сначала журнал (источник истины), затем проекция в portfolios.json
+    ledger.append([_ledger_entry(user_id, "buy", code, amt, price)])
     _save_user_portfolio(portfolio)
-    return {"currency_code": code, "balance": wallets[code]["balance"]}
+    return {"currency_code": code, **res, "price_stale": stale}
 
 
+@timed(USECASE_SECONDS, USECASE_ERRORS, op="sell")
 @log_action("sell")
-def sell_currency(currency_code: str, amount: Any) -> dict:
+def sell_currency(currency_code: str, amount: Any, policy: str | None = None) -> dict:
     # Продажа валюты: уменьшаем баланс кошелька currency_code на amount
+    from valutatrade_hub.core.currencies import get_currency
+
     session = get_current_user()
     if session is None:
         raise ValueError("Необходимо выполнить login.")
@@ -357,21 +600,450 @@ def sell_currency(currency_code: str, amount: Any) -> dict:
     code = cur.code
 
     amt = validate_amount(amount)
+    policy = validate_policy(policy) if policy else None
 
     user_id = session["user_id"]
+    annotate_action(user_id=user_id, currency=code, amount=amt)
+    ledger = _ledger()
     portfolio = _load_user_portfolio(user_id)
     wallets = portfolio.get("wallets", {})
 
     # Если кошелька нет - считаем доступно 0.0 и кидаем InsufficientFundsError
-    if code not in wallets:
-        raise InsufficientFundsError(available=0.0, required=float(amt), code=code)
-
-    balance = float(wallets[code]["balance"])
-    if float(amt) > balance:
-        raise InsufficientFundsError(available=balance, required=float(amt), code=code)
-
-    wallets[code]["balance"] = balance - float(amt)
+    # цена продажи - по актуальным курсам, как и у лотов при покупке
+    price, stale = _trade_price(_trade_rates(), code)
+    res = _apply_sell(wallets, code, amt, price, policy, _default_policy())
     portfolio["wallets"] = wallets
 
+    ledger.append([_ledger_entry(user_id, "sell", code, amt, price)])
     _save_user_portfolio(portfolio)
-    return {"currency_code": code, "balance": wallets[code]["balance"]}
+    return {"currency_code": code, **res, "price_stale": stale}
+
+
+# Пакетное исполнение сделок
+
+TRADE_ACTIONS = ("buy", "sell")
+
+
+def _order_error(index: int, order: dict, e: Exception) -> dict:
+    return {
+        "index": index,
+        "ok": False,
+        "action": order.get("action"),
+        "currency_code": order.get("currency_code") or order.get("currency"),
+        "amount": order.get("amount"),
+        "error": str(e),
+        "error_type": type(e).__name__,
+    }
+
+
+def _validate_order(order: dict) -> dict:
+    # Проверка одного ордера без обращения к портфелям
+    from valutatrade_hub.core.currencies import get_currency
+
+    action = str(order.get("action") or "").strip().lower()
+    if action not in TRADE_ACTIONS:
+        raise ValueError(f"Неизвестное действие '{order.get('action')}'.")
+
+    code = get_currency(order.get("currency_code") or order.get("currency")).code
+    amt = validate_amount(order.get("amount"))
+    policy = order.get("policy")
+    policy = validate_policy(policy) if policy else None
+    return {"action": action, "currency_code": code, "amount": amt, "policy": policy}
+
+
+def _check_owner(order: dict, session: dict) -> None:
+    # Пакет исполняется только от имени вошедшего пользователя: ордер с чужим
+    # user_id/username отклоняется, а не исполняется на чужом счёте
+    uid, name = order.get("user_id"), order.get("username")
+    if uid not in (None, "") and int(uid) != session["user_id"]:
+        raise ValueError(f"Ордер для другого пользователя (user_id={uid}).")
+    if name not in (None, "") and str(name).strip() != session["username"]:
+        raise ValueError(f"Ордер для другого пользователя ('{name}').")
+
+
+@log_action("trade_batch")
+def execute_trades(orders: Iterable[dict]) -> list[dict]:
+    # Исполняет ордера текущего пользователя за один цикл чтения/записи
+    # portfolios.json; результат - по каждому ордеру (в исходном порядке)
+    session = get_current_user()
+    if session is None:
+        raise ValueError("Необходимо выполнить login.")
+    annotate_action(user_id=session["user_id"])
+
+    def owner(order: dict) -> Any:
+        _check_owner(order, session)
+        return session["user_id"]
+
+    return _execute_batch(list(orders), owner)
+
+
+@log_action("order_trigger")
+def _execute_triggered(orders: list[dict]) -> list[dict]:
+    # Сработавшие условные ордера разных пользователей. user_id в них
+    # записал place_order от имени владельца, поэтому он не проверяется;
+    # снаружи (CLI, serve) этот путь недоступен
+    return _execute_batch(orders, lambda order: order["user_id"])
+
+
+def _execute_batch(orders: list[dict], owner: Callable[[dict], Any]) -> list[dict]:
+    # Порядок ордеров внутри одного пользователя сохраняется
+    results: list[dict | None] = [None] * len(orders)
+
+    # 1) валидация всех ордеров сразу, группировка по пользователю
+    default_policy = _default_policy()
+    by_user: dict[Any, list[tuple[int, dict]]] = {}
+    for i, order in enumerate(orders):
+        try:
+            valid = _validate_order(order)
+            valid["user_id"] = owner(order)
+        except (ValueError, TypeError) as e:
+            results[i] = _order_error(i, order, e)
+            continue
+        by_user.setdefault(valid["user_id"], []).append((i, valid))
+
+    # 2) один load портфелей, применение, один save
+    ledger = _ledger() if by_user else None
+    portfolios = load_portfolios()
+    index = {p.get("user_id"): p for p in portfolios}
+    rates = _trade_rates() if by_user else {}
+    prices: dict[str, tuple[float | None, bool]] = {}
+    entries: list[dict] = []
+
+    for user_id, items in by_user.items():
+        portfolio = index.get(user_id)
+        for i, o in items:
+            if portfolio is None:
+                results[i] = _order_error(i, o, ValueError("Портфель не найден."))
+                continue
+            wallets = portfolio.setdefault("wallets", {})
+            code, amt = o["currency_code"], o["amount"]
+            if code not in prices:
+                prices[code] = _trade_price(rates, code)
+            price, stale = prices[code]
+            try:
+                if o["action"] == "buy":
+                    res = _apply_buy(wallets, code, amt, price)
+                else:
+                    res = _apply_sell(
+                        wallets, code, amt, price, o["policy"], default_policy
+                    )
+            except (InsufficientFundsError, ValueError) as e:
+                results[i] = _order_error(i, o, e)
+                continue
+            entries.append(_ledger_entry(user_id, o["action"], code, amt, price))
+            results[i] = {"index": i, "ok": True, **o, **res, "price_stale": stale}
+
+    if entries and ledger is not None:
+        ledger.append(entries)
+        save_portfolios(portfolios)
+
+    return results  # type: ignore[return-value]
+
+
+# Восстановление портфелей из журнала
+
+
+def replay_ledger(
+    workers: int | None = None, full: bool = False, check: bool = False
+) -> dict:
+    # Пересобирает балансы всех портфелей из журнала сделок.
+    # check=True - только сравнить с portfolios.json, ничего не записывая.
+    # Отложенные сделки кэша сначала дописываются в журнал
+    from valutatrade_hub.core.ledger import Ledger
+    from valutatrade_hub.core.wallet_store import WalletStore
+
+    flush_data()
+    ledger = Ledger()
+    if not check and not ledger.has_genesis():
+        # без начальных балансов пересчёт обнулил бы всё, что было до журнала
+        raise ValueError(
+            "Нет начальных балансов журнала (ledger_genesis.json): "
+            "пересчёт не записан. Проверить расхождения: replay --check."
+        )
+    # балансы журнала и portfolios.json сравниваются в компактных WalletStore
+    # (массивы вместо словаря на каждого пользователя)
+    expected = WalletStore.from_balances(ledger.replay(workers=workers, full=full))
+    portfolios = load_portfolios()
+    actual = WalletStore.from_portfolios(portfolios)
+    known = {int(p["user_id"]) for p in portfolios}
+    mismatches = [
+        {"user_id": uid, "currency_code": code, "portfolio": mine, "ledger": theirs}
+        for uid, code, mine, theirs in actual.diff(expected)
+        if uid in known
+    ]
+
+    if not check and mismatches:
+        for p in portfolios:
+            balances = expected.portfolio(p["user_id"]).wallets
+            wallets = p.setdefault("wallets", {})
+            for code, w in wallets.items():
+                w["balance"] = balances.get(code, 0.0)
+            for code, bal in balances.items():
+                if code not in wallets and bal != 0.0:
+                    wallets[code] = {"currency_code": code, "balance": bal}
+        save_portfolios(portfolios)
+
+    return {"users": len(portfolios), "mismatches": mismatches, "written": not check}
+
+
+# Условные ордера (limit/stop)
+
+ORDER_OPEN, ORDER_FAILED = "open", "failed"
+# Журнал ордеров сворачивается в снимок orders.json, когда записей в нём
+# не меньше, чем ордеров (и не меньше этого числа)
+ORDER_LOG_COMPACT_MIN = 1000
+
+_order_store = OrderStore(ORDERS_JSON, ORDERS_LOG)
+
+
+def _file_stamp(path: Path) -> tuple[int, int, int] | None:
+    # Версия файла: write_json_file пишет через replace, поэтому у каждой
+    # записи новый inode, даже если mtime совпал (грубое разрешение часов)
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class _OrderRef(NamedTuple):
+    # Краткая запись ордера в памяти: всё, что нужно для исполнения и отмены
+    user_id: int
+    side: str
+    currency_code: str
+    amount: float
+    pair: str
+    status: str
+
+    @classmethod
+    def of(cls, o: dict) -> "_OrderRef":
+        return cls(
+            o["user_id"],
+            o["side"],
+            o["currency_code"],
+            o["amount"],
+            o["pair"],
+            o.get("status", ORDER_OPEN),
+        )
+
+
+class _OrderIndex:
+    # Книга триггеров открытых ордеров и краткие записи всех ордеров, которые
+    # живут весь процесс: place_order/cancel_order/process_rate_update меняют
+    # их на месте и дописывают строки в журнал ордеров, поэтому ни обновление
+    # курса, ни срабатывание не читают и не переписывают orders.json.
+    # Строки, дописанные другим процессом, дочитываются с запомненного
+    # смещения; целиком индекс строится заново, только если сменился снимок
+    # orders.json (свёртка журнала или запись файла другим процессом).
+    # Все методы вызываются под file_lock(ORDERS_JSON)
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.book: TriggerBook | None = None
+        self.refs: dict[int, _OrderRef] = {}
+        self.next_id = 1
+        self.stamp: tuple[int, int, int] | None = None
+        # прочитанная часть журнала: смещение конца и число записей
+        self.offset = 0
+        self.records = 0
+
+    def sync(self) -> TriggerBook:
+        stamp = _file_stamp(ORDERS_JSON)
+        size = _order_store.log_size()
+        if self.book is None or stamp != self.stamp or size < self.offset:
+            self._rebuild(stamp)
+        elif size > self.offset:
+            events, self.offset = _order_store.read_log(self.offset)
+            for e in events:
+                self._apply(e)
+            self.records += len(events)
+        return self.book  # type: ignore[return-value]
+
+    def _rebuild(self, stamp: tuple[int, int, int] | None) -> None:
+        data = _order_store.read_snapshot()
+        orders = {o["id"]: o for o in data.get("orders", [])}
+        self.next_id = int(data.get("next_id", 1))
+        events, self.offset = _order_store.read_log()
+        for e in events:
+            apply_order_event(orders, e)
+            if e["op"] == "place":
+                self.next_id = max(self.next_id, e["order"]["id"] + 1)
+        self.next_id = max(self.next_id, max(orders, default=0) + 1)
+        self.book = book_from_orders(orders.values())
+        self.refs = {order_id: _OrderRef.of(o) for order_id, o in orders.items()}
+        self.stamp = stamp
+        self.records = len(events)
+
+    def _apply(self, e: dict, popped: bool = False) -> None:
+        # popped - сработавший ордер уже снят с книги этим процессом
+        op = e["op"]
+        if op == "place":
+            o = e["order"]
+            if o["id"] not in self.refs and self.book is not None:
+                self.refs[o["id"]] = _OrderRef.of(o)
+                direction = trigger_direction(o["side"], o["kind"])
+                self.book.add(o["id"], o["pair"], direction, o["price"])
+            self.next_id = max(self.next_id, o["id"] + 1)
+            return
+        ref = self.refs.get(e["id"])
+        if ref is None:
+            return
+        if ref.status == ORDER_OPEN and not popped and self.book is not None:
+            self.book.discard(e["id"])
+        if op == "fail":
+            self.refs[e["id"]] = ref._replace(status=ORDER_FAILED)
+        else:
+            del self.refs[e["id"]]
+
+    def write(self, events: list[dict], popped: bool = False) -> None:
+        # Дописывает записи в журнал и вносит их в индекс; журнал до этой
+        # записи уже прочитан в sync()
+        try:
+            self.offset = _order_store.append(events)
+            for e in events:
+                self._apply(e, popped)
+            self.records += len(events)
+            if self.records >= max(ORDER_LOG_COMPACT_MIN, len(self.refs)):
+                _order_store.compact()
+                self.stamp = _file_stamp(ORDERS_JSON)
+                self.offset = self.records = 0
+        except BaseException:
+            self.reset()
+            raise
+
+
+_orders_index = _OrderIndex()
+
+
+def place_order(
+    side: str, currency_code: str, amount: Any, price: Any, kind: str = "limit"
+) -> dict:
+    # Ордер "купить/продать amount currency_code, когда {CODE}_USD пересечёт price"
+    from valutatrade_hub.core.currencies import get_currency
+
+    session = get_current_user()
+    if session is None:
+        raise ValueError("Необходимо выполнить login.")
+
+    side = str(side).strip().lower()
+    kind = str(kind).strip().lower()
+    if side not in ORDER_SIDES:
+        raise ValueError(f"Неизвестное действие '{side}'.")
+    if kind not in ORDER_KINDS:
+        raise ValueError(f"Неизвестный тип ордера '{kind}'.")
+
+    code = get_currency(currency_code).code
+    if code == "USD":
+        raise ValueError("Ордер на USD не имеет смысла: курс USD_USD всегда 1.")
+    amt = validate_amount(amount)
+    threshold = validate_amount(price)
+
+    # выдача id и дозапись журнала - под блокировкой файла: ордер,
+    # добавленный другим процессом в это время, не теряется
+    with file_lock(ORDERS_JSON):
+        _orders_index.sync()
+        order = {
+            "id": _orders_index.next_id,
+            "user_id": session["user_id"],
+            "side": side,
+            "kind": kind,
+            "currency_code": code,
+            "amount": amt,
+            "pair": f"{code}_USD",
+            "price": threshold,
+            "direction": trigger_direction(side, kind),
+            "status": ORDER_OPEN,
+            "created_at": _now_utc().replace(microsecond=0).isoformat(),
+        }
+        _orders_index.write([{"op": "place", "order": order}])
+    return order
+
+
+def list_orders() -> list[dict]:
+    # Ордера текущего пользователя: открытые и не исполненные при срабатывании
+    session = get_current_user()
+    if session is None:
+        raise ValueError("Необходимо выполнить login.")
+    uid = session["user_id"]
+    with file_lock(ORDERS_JSON):
+        orders = _order_store.state()["orders"]
+    return [o for o in orders if o.get("user_id") == uid]
+
+
+def cancel_order(order_id: int) -> dict:
+    # Отмена открытого ордера или удаление записи о неисполненном
+    session = get_current_user()
+    if session is None:
+        raise ValueError("Необходимо выполнить login.")
+
+    with file_lock(ORDERS_JSON):
+        _orders_index.sync()
+        ref = _orders_index.refs.get(order_id)
+        if ref is None or ref.user_id != session["user_id"]:
+            raise ValueError(f"Ордер {order_id} не найден.")
+        _orders_index.write([{"op": "cancel", "id": order_id}])
+    return {"id": order_id, **ref._asdict()}
+
+
+def process_rate_update(pairs: dict[str, float]) -> list[dict]:
+    # Вызывается после записи новых курсов: находит сработавшие ордера
+    # через книгу триггеров и исполняет их одним пакетом. В журнал ордеров
+    # дописывается по строке на ордер: исполненный удаляется (сделка - в
+    # журнале сделок), неисполненный остаётся со статусом failed и текстом
+    # ошибки
+    if not pairs:
+        return []
+
+    with file_lock(ORDERS_JSON):
+        book = _orders_index.sync()
+        fired: list[int] = []
+        for pair, rate in pairs.items():
+            fired.extend(book.pop_crossed(pair, float(rate)))
+        if not fired:
+            return []
+
+        try:
+            # исполняем в порядке создания ордеров
+            fired.sort()
+            refs = [_orders_index.refs[order_id] for order_id in fired]
+            # сделки - на диске раньше, чем ордера отмечены исполненными в
+            # журнале ордеров (он пишется мимо кэша данных)
+            with immediate_data():
+                results = _execute_triggered(
+                    [
+                        {
+                            "user_id": ref.user_id,
+                            "action": ref.side,
+                            "currency_code": ref.currency_code,
+                            "amount": ref.amount,
+                        }
+                        for ref in refs
+                    ]
+                )
+        except BaseException:
+            # сработавшие ордера уже сняты с книги - пусть перестроится
+            _orders_index.reset()
+            raise
+
+        fills = [
+            {**r, "order_id": order_id, "trigger_price": float(pairs[ref.pair])}
+            for order_id, ref, r in zip(fired, refs, results)
+        ]
+        now = _now_utc().replace(microsecond=0).isoformat()
+        events = [
+            {"op": "fill", "id": f["order_id"]}
+            if f["ok"]
+            else {
+                "op": "fail",
+                "id": f["order_id"],
+                "error": f["error"],
+                "error_type": f["error_type"],
+                "trigger_price": f["trigger_price"],
+                "failed_at": now,
+            }
+            for f in fills
+        ]
+        _orders_index.write(events, popped=True)
+    return fills
@@ -3,14 +3,29 @@
 
 from __future__ import annotations
 
+import csv
 import json
 import math
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any
+from time import perf_counter
+from typing import Any, Callable, Iterator
 
-# Папка data в корне проекта (на одном уровне с pyproject.toml)
+try:  # межпроцессная блокировка файла (POSIX)
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from valutatrade_hub.infra.metrics import counter, histogram
+from valutatrade_hub.infra.profiling import span
+
+# Папка data в корне проекта (на одном уровне с pyproject.toml);
+# VALUTATRADE_DATA_DIR задаёт другой каталог (бенчмарки, изолированные запуски)
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
-DATA_DIR = PROJECT_ROOT / "data"
+DATA_DIR = Path(os.environ.get("VALUTATRADE_DATA_DIR") or PROJECT_ROOT / "data")
 
 
 def data_file(filename: str) -> Path:
@@ -61,27 +76,154 @@ def validate_amount(amount: Any) -> float:
     return x
 
 
+# Кэш файлов данных долгоживущего процесса (DataCache из core/datacache.py):
+# пока он установлен, read_json/write_json работают через память
+_data_cache: Any = None
+
+
+def set_data_cache(cache: Any) -> Any:
+    # Устанавливает кэш (None - снять), возвращает предыдущий
+    global _data_cache
+    previous, _data_cache = _data_cache, cache
+    return previous
+
+
+def append_data(path: Path, write: Callable[[], Any]) -> Any:
+    # Дозапись файла данных (журнал сделок) функцией write под file_lock(path).
+    # В транзакции DataCache она пишется на диск вместе с JSON-файлами
+    # команды (тогда возвращается None)
+    if _data_cache is not None:
+        return _data_cache.append(path, write)
+    with file_lock(path):
+        return write()
+
+
+@contextmanager
+def immediate_data() -> Iterator[None]:
+    # Записи блока попадают на диск при выходе из него - в обход отложенной
+    # записи и транзакции команды DataCache (см. DataCache.immediate)
+    if _data_cache is None:
+        yield
+        return
+    with _data_cache.immediate():
+        yield
+
+
+def flush_data() -> None:
+    # Сбрасывает отложенные записи кэша: перед чтением с диска файлов,
+    # которые кэш не читает (журнал сделок)
+    if _data_cache is not None:
+        _data_cache.flush()
+
+
 def read_json(path: Path, default: Any) -> Any:
+    with span("read_json"):
+        if _data_cache is not None:
+            return _data_cache.read(path, default)
+        return read_json_file(path, default)
+
+
+# Ввод-вывод файлов данных: время и объём чтения/записи
+_storage_seconds = histogram(
+    "storage_seconds", "Время чтения/записи JSON-файла данных, с", ("op",)
+)
+_storage_bytes = counter("storage_bytes_total", "Байт прочитано/записано", ("op",))
+READ_SECONDS = _storage_seconds.labels(op="read")
+WRITE_SECONDS = _storage_seconds.labels(op="write")
+READ_BYTES = _storage_bytes.labels(op="read")
+WRITE_BYTES = _storage_bytes.labels(op="write")
+
+
+def read_json_file(path: Path, default: Any) -> Any:
     if not path.exists():
         return default
+    t0 = perf_counter()
     try:
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
+        raw = path.read_bytes()
+        data = json.loads(raw)
     except json.JSONDecodeError as e:
         raise ValueError(f"Файл данных повреждён: {path}") from e
     except OSError as e:
         raise ValueError(f"Не удалось прочитать файл данных: {path}") from e
+    READ_SECONDS.observe(perf_counter() - t0)
+    READ_BYTES.inc(len(raw))
+    return data
+
+
+def _json_default(obj: Any) -> Any:
+    # deque (лоты кошелька) сохраняем как обычный список
+    if isinstance(obj, deque):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 
 def write_json(path: Path, obj: Any) -> None:
+    with span("write_json"):
+        if _data_cache is not None:
+            _data_cache.write(path, obj)
+            return
+        write_json_file(path, obj)
+
+
+def write_json_file(path: Path, obj: Any, fsync: bool = False) -> None:
+    # fsync=True - данные на диске до переименования (файлы, которые нельзя
+    # восстановить, например начальный снимок журнала)
+    t0 = perf_counter()
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+    text = json.dumps(obj, ensure_ascii=False, indent=2, default=_json_default)
+    raw = text.encode("utf-8")
+    # tmp + replace: читатель не увидит файл наполовину, а у каждой версии
+    # файла свой inode (по нему кэши замечают запись другим процессом)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with tmp.open("wb") as f:
+        f.write(raw)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+    WRITE_SECONDS.observe(perf_counter() - t0)
+    WRITE_BYTES.inc(len(raw))
+
+
+# Блокировки файлов данных: путь -> [RLock потоков, глубина, файл .lock]
+_file_locks: dict[str, list[Any]] = {}
+_file_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    # Эксклюзивная блокировка path между процессами (flock на <path>.lock)
+    # и потоками. Повторный вход в том же потоке не блокируется, поэтому
+    # вложенные операции над одним файлом безопасны (путь приводится к
+    # абсолютному: flock второго дескриптора того же файла в одном потоке
+    # ждал бы сам себя)
+    with _file_locks_guard:
+        key = os.path.abspath(path)
+        entry = _file_locks.setdefault(key, [threading.RLock(), 0, None])
+    with entry[0]:
+        if entry[1] == 0:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            f = path.with_name(path.name + ".lock").open("a")
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            entry[2] = f
+        entry[1] += 1
+        try:
+            yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                f, entry[2] = entry[2], None
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                f.close()
 
 
 USERS_JSON = data_file("users.json")
 PORTFOLIOS_JSON = data_file("portfolios.json")
 RATES_JSON = data_file("rates.json")
+ORDERS_JSON = data_file("orders.json")
+ORDERS_LOG = data_file("orders_log.ndjson")
 
 
 def load_users() -> list[dict[str, Any]]:
@@ -106,3 +248,49 @@ def load_rates() -> dict[str, Any]:
 
 def save_rates(rates: dict[str, Any]) -> None:
     write_json(RATES_JSON, rates)
+
+
+def _order_amount(value: Any) -> Any:
+    # CSV отдаёт строки: приводим сумму к числу, если это возможно
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            return value
+    return value
+
+
+def read_trade_orders(path: Path, fmt: str | None = None) -> list[dict[str, Any]]:
+    # Читает ордера из CSV (заголовок action,currency,amount[,username])
+    # или NDJSON (один JSON-объект на строку)
+    if fmt is None:
+        fmt = "csv" if path.suffix.lower() == ".csv" else "ndjson"
+    fmt = fmt.lower()
+    if fmt not in ("csv", "ndjson"):
+        raise ValueError(f"Неизвестный формат ордеров: {fmt}")
+
+    orders: list[dict[str, Any]] = []
+    try:
+        with path.open("r", encoding="utf-8", newline="") as f:
+            if fmt == "csv":
+                for row in csv.DictReader(f):
+                    orders.append({k.strip(): v for k, v in row.items() if k})
+            else:
+                for n, line in enumerate(f, start=1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        obj = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"Некорректный JSON в строке {n}") from e
+                    if not isinstance(obj, dict):
+                        raise ValueError(f"Строка {n}: ожидается JSON-объект")
+                    orders.append(obj)
+    except OSError as e:
+        raise ValueError(f"Не удалось прочитать файл ордеров: {path}") from e
+
+    for o in orders:
+        if "amount" in o:
+            o["amount"] = _order_amount(o["amount"])
+    return orders
@@ -0,0 +1,192 @@
+# Компактное хранилище кошельков: структура массивов вместо объектов Wallet
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Iterable, Iterator
+
+from valutatrade_hub.core.currencies import currency_code, currency_index
+from valutatrade_hub.core.exceptions import InsufficientFundsError
+from valutatrade_hub.core.models import _fixed_rate
+from valutatrade_hub.core.utils import validate_amount
+
+
+class WalletStore:
+    # Три параллельных массива (user_id, индекс валюты, баланс float64),
+    # упорядоченных по (user_id, валюта). Кошельки пользователя лежат подряд,
+    # поиск - бинарный по user_id. Новый кошелёк вставляется со сдвигом
+    # массивов (memmove в C), что дёшево по сравнению с созданием объектов.
+
+    __slots__ = ("users", "currencies", "balances")
+
+    def __init__(self) -> None:
+        self.users = array("q")
+        self.currencies = array("H")
+        self.balances = array("d")
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple[int, str, float]]) -> "WalletStore":
+        # Массовая загрузка (user_id, код, баланс) с одной сортировкой
+        keyed = sorted(
+            (int(uid), currency_index(code), float(bal)) for uid, code, bal in rows
+        )
+        store = cls()
+        store.users = array("q", (k[0] for k in keyed))
+        store.currencies = array("H", (k[1] for k in keyed))
+        store.balances = array("d", (k[2] for k in keyed))
+        return store
+
+    @classmethod
+    def from_portfolios(cls, portfolios: Iterable[dict[str, Any]]) -> "WalletStore":
+        # Из формата portfolios.json
+        return cls.from_rows(
+            (p["user_id"], code, w.get("balance", 0.0))
+            for p in portfolios
+            for code, w in (p.get("wallets") or {}).items()
+        )
+
+    @classmethod
+    def from_balances(cls, balances: dict[int, dict[str, float]]) -> "WalletStore":
+        # Из {user_id: {код: баланс}} (результат Ledger.replay)
+        return cls.from_rows(
+            (uid, code, bal) for uid, b in balances.items() for code, bal in b.items()
+        )
+
+    def to_portfolios(self, user_ids: Iterable[int] = ()) -> list[dict[str, Any]]:
+        # Обратно в формат portfolios.json; user_ids - пользователи без кошельков
+        out: dict[int, dict[str, Any]] = {
+            int(uid): {"user_id": int(uid), "wallets": {}} for uid in user_ids
+        }
+        for uid, cidx, bal in zip(self.users, self.currencies, self.balances):
+            code = currency_code(cidx)
+            p = out.setdefault(uid, {"user_id": uid, "wallets": {}})
+            p["wallets"][code] = {"currency_code": code, "balance": bal}
+        return list(out.values())
+
+    def __len__(self) -> int:
+        return len(self.balances)
+
+    @property
+    def nbytes(self) -> int:
+        # Объём данных массивов (без учёта заголовков объектов)
+        return sum(
+            a.itemsize * len(a) for a in (self.users, self.currencies, self.balances)
+        )
+
+    def _span(self, user_id: int) -> tuple[int, int]:
+        return bisect_left(self.users, user_id), bisect_right(self.users, user_id)
+
+    def _find(self, user_id: int, cidx: int) -> tuple[int, bool]:
+        # Строка кошелька или позиция для вставки
+        lo, hi = self._span(user_id)
+        for row in range(lo, hi):
+            c = self.currencies[row]
+            if c == cidx:
+                return row, True
+            if c > cidx:
+                return row, False
+        return hi, False
+
+    def user_ids(self) -> Iterator[int]:
+        last = None
+        for uid in self.users:
+            if uid != last:
+                yield uid
+                last = uid
+
+    def diff(
+        self, other: "WalletStore", tol: float = 1e-9
+    ) -> Iterator[tuple[int, str, float, float]]:
+        # Расхождения (user_id, код, баланс здесь, баланс в other) слиянием двух
+        # упорядоченных массивов; отсутствующий кошелёк считается нулевым
+        au, ac, ab = self.users, self.currencies, self.balances
+        bu, bc, bb = other.users, other.currencies, other.balances
+        i = j = 0
+        while i < len(ab) or j < len(bb):
+            if j == len(bb) or (i < len(ab) and (au[i], ac[i]) < (bu[j], bc[j])):
+                uid, cidx, mine, theirs = au[i], ac[i], ab[i], 0.0
+                i += 1
+            elif i == len(ab) or (bu[j], bc[j]) < (au[i], ac[i]):
+                uid, cidx, mine, theirs = bu[j], bc[j], 0.0, bb[j]
+                j += 1
+            else:
+                uid, cidx, mine, theirs = au[i], ac[i], ab[i], bb[j]
+                i += 1
+                j += 1
+            if abs(mine - theirs) > tol:
+                yield uid, currency_code(cidx), mine, theirs
+
+    def get_balance(self, user_id: int, code: str) -> float:
+        row, found = self._find(user_id, currency_index(code))
+        return self.balances[row] if found else 0.0
+
+    def deposit(self, user_id: int, code: str, amount: Any) -> float:
+        amt = validate_amount(amount)
+        cidx = currency_index(code)
+        row, found = self._find(user_id, cidx)
+        if not found:
+            self.users.insert(row, user_id)
+            self.currencies.insert(row, cidx)
+            self.balances.insert(row, 0.0)
+        self.balances[row] += amt
+        return self.balances[row]
+
+    def withdraw(self, user_id: int, code: str, amount: Any) -> float:
+        amt = validate_amount(amount)
+        row, found = self._find(user_id, currency_index(code))
+        available = self.balances[row] if found else 0.0
+        if amt > available:
+            raise InsufficientFundsError(
+                available=available, required=amt, code=code.upper()
+            )
+        self.balances[row] = available - amt
+        return self.balances[row]
+
+    def portfolio(self, user_id: int) -> "PortfolioView":
+        return PortfolioView(self, user_id)
+
+
+class PortfolioView:
+    # Лёгкое представление портфеля одного пользователя поверх WalletStore
+
+    __slots__ = ("_store", "_user_id")
+
+    def __init__(self, store: WalletStore, user_id: int) -> None:
+        self._store = store
+        self._user_id = int(user_id)
+
+    @property
+    def user_id(self) -> int:
+        return self._user_id
+
+    @property
+    def wallets(self) -> dict[str, float]:
+        # {код: баланс}
+        s = self._store
+        lo, hi = s._span(self._user_id)
+        return {currency_code(s.currencies[r]): s.balances[r] for r in range(lo, hi)}
+
+    def get_balance(self, code: str) -> float:
+        return self._store.get_balance(self._user_id, code)
+
+    def deposit(self, code: str, amount: Any) -> float:
+        return self._store.deposit(self._user_id, code, amount)
+
+    def withdraw(self, code: str, amount: Any) -> float:
+        return self._store.withdraw(self._user_id, code, amount)
+
+    def get_total_value(self, base_currency: str = "USD") -> float:
+        base = str(base_currency).strip().upper()
+        if not base:
+            raise ValueError("Базовая валюта не может быть пустой.")
+        return sum(bal * _fixed_rate(code, base) for code, bal in self.wallets.items())
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "user_id": self._user_id,
+            "wallets": {
+                code: {"currency_code": code, "balance": bal}
+                for code, bal in self.wallets.items()
+            },
+        }
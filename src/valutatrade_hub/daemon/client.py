@@ -0,0 +1,126 @@
+# Клиент демона project serve.
+#
+#     with DaemonClient() as c:                 # data/valutatrade.sock
+#         c.login("alice", "1234")
+#         c.buy("BTC", 0.01)
+#         rates = c.pipeline([("get_rate", {"from_currency": "BTC",
+#                                           "to_currency": "USD"})] * 100)
+
+from __future__ import annotations
+
+import socket
+from typing import Any, Iterable
+
+from valutatrade_hub.daemon.protocol import decode, encode, parse_address
+
+# Сколько запросов конвейера может ждать ответа одновременно: при большем
+# числе ответы сервера заполнили бы буфер сокета, пока клиент ещё пишет
+PIPELINE_WINDOW = 128
+
+
+class DaemonError(ValueError):
+    def __init__(self, message: str, error_type: str | None = None) -> None:
+        super().__init__(message)
+        self.error_type = error_type
+
+
+class DaemonClient:
+    def __init__(
+        self, address: str | None = None, timeout: float | None = 30.0
+    ) -> None:
+        target = parse_address(address)
+        if isinstance(target, tuple):
+            sock = socket.create_connection(target, timeout=timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(target)
+        self._sock = sock
+        self._rfile = sock.makefile("rb")
+        self._next_id = 0
+
+    # низкий уровень: отправка без ожидания и чтение ответов по порядку
+
+    def _request(self, op: str, args: dict[str, Any]) -> bytes:
+        self._next_id += 1
+        return encode({"id": self._next_id, "op": op, "args": args})
+
+    def send(self, op: str, **args: Any) -> int:
+        self._sock.sendall(self._request(op, args))
+        return self._next_id
+
+    def receive(self) -> dict[str, Any]:
+        line = self._rfile.readline()
+        if not line:
+            raise ConnectionError("serve закрыл соединение")
+        return decode(line)
+
+    def call(self, op: str, **args: Any) -> Any:
+        self.send(op, **args)
+        return _result(self.receive())
+
+    def pipeline(
+        self, calls: Iterable[tuple[str, dict[str, Any]]], window: int = PIPELINE_WINDOW
+    ) -> list[dict[str, Any]]:
+        # Отправляет запросы, не дожидаясь ответов (не больше window в пути).
+        # Возвращает ответы как есть, ошибки не поднимаются
+        calls = list(calls)
+        responses: list[dict[str, Any]] = []
+        sent = min(window, len(calls))
+        self._sock.sendall(b"".join(self._request(op, a) for op, a in calls[:sent]))
+        while len(responses) < len(calls):
+            responses.append(self.receive())
+            if sent < len(calls):
+                op, a = calls[sent]
+                self._sock.sendall(self._request(op, a))
+                sent += 1
+        return responses
+
+    # операции
+
+    def ping(self) -> str:
+        return self.call("ping")
+
+    def register(self, username: str, password: str) -> dict:
+        return self.call("register", username=username, password=password)
+
+    def login(self, username: str, password: str) -> dict:
+        return self.call("login", username=username, password=password)
+
+    def logout(self) -> None:
+        return self.call("logout")
+
+    def get_rate(self, from_currency: str, to_currency: str) -> dict:
+        return self.call(
+            "get_rate", from_currency=from_currency, to_currency=to_currency
+        )
+
+    def buy(self, currency_code: str, amount: float) -> dict:
+        return self.call("buy", currency_code=currency_code, amount=amount)
+
+    def sell(
+        self, currency_code: str, amount: float, policy: str | None = None
+    ) -> dict:
+        return self.call(
+            "sell", currency_code=currency_code, amount=amount, policy=policy
+        )
+
+    def show_portfolio(self, base_currency: str = "USD") -> dict:
+        return self.call("show_portfolio", base_currency=base_currency)
+
+    def close(self) -> None:
+        self._rfile.close()
+        self._sock.close()
+
+    def __enter__(self) -> "DaemonClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def _result(response: dict[str, Any]) -> Any:
+    if not response.get("ok"):
+        raise DaemonError(response.get("error", ""), response.get("error_type"))
+    return response.get("result")
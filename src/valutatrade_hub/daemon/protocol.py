@@ -0,0 +1,55 @@
+# Протокол serve: JSON Lines поверх Unix-сокета или TCP (только localhost).
+#
+#     -> {"id": 1, "op": "buy", "args": {"currency_code": "BTC", "amount": 0.1}}
+#     <- {"id": 1, "ok": true, "result": {...}}
+#     <- {"id": 2, "ok": false, "error": "...", "error_type": "ValueError"}
+#
+# Запросы одного соединения выполняются по порядку, ответы приходят в том же
+# порядке; клиент может отправить несколько запросов, не дожидаясь ответов.
+
+from __future__ import annotations
+
+import ipaddress
+import json
+from typing import Any
+
+from valutatrade_hub.core.utils import data_file
+
+DEFAULT_SOCKET = data_file("valutatrade.sock")
+
+
+def parse_address(address: str | None) -> str | tuple[str, int]:
+    # "host:port" или ":port" - TCP, иначе путь к Unix-сокету. В протоколе
+    # нет аутентификации соединений, поэтому TCP - только на loopback
+    if not address:
+        return str(DEFAULT_SOCKET)
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in host:
+        host = host or "127.0.0.1"
+        if not _is_loopback(host):
+            raise ValueError(
+                f"serve по TCP доступен только на localhost, а не на '{host}'."
+            )
+        return host, int(port)
+    return address
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def encode(message: dict[str, Any]) -> bytes:
+    line = json.dumps(message, ensure_ascii=False, default=str, separators=(",", ":"))
+    return line.encode("utf-8") + b"\n"
+
+
+def decode(line: bytes) -> dict[str, Any]:
+    message = json.loads(line)
+    if not isinstance(message, dict):
+        raise ValueError("Сообщение должно быть JSON-объектом.")
+    return message
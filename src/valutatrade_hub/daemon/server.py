@@ -0,0 +1,229 @@
+# Демон project serve: операции core/usecases.py (register, login, get_rate,
+# buy, sell, show_portfolio) по протоколу JSON Lines (daemon/protocol.py).
+# Данные держатся в памяти (DataCache) и записываются на диск по таймеру;
+# каждая операция выполняется в транзакции кэша (со своей копией данных).
+# Чтения (get_rate, show_portfolio) идут параллельно друг с другом и с
+# изменениями, изменяющие операции - по одной. У каждого соединения своя
+# сессия.
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import signal
+import socket
+import socketserver
+import threading
+from pathlib import Path
+from typing import Any, Callable
+
+from valutatrade_hub.core.datacache import DataCache
+from valutatrade_hub.core.exceptions import DataConflictError
+from valutatrade_hub.core.usecases import (
+    buy_currency,
+    get_rate,
+    login,
+    logout,
+    register,
+    sell_currency,
+    session_scope,
+    show_portfolio,
+)
+from valutatrade_hub.daemon.protocol import decode, encode, parse_address
+
+OPERATIONS: dict[str, Callable[..., Any]] = {
+    "register": register,
+    "login": login,
+    "logout": logout,
+    "get_rate": get_rate,
+    "buy": buy_currency,
+    "sell": sell_currency,
+    "show_portfolio": show_portfolio,
+}
+# Операции, которые не меняют данные пользователей. Они могут записать
+# rates.json при обновлении курсов; конфликт с параллельным обновлением
+# безопасно разрешается повтором
+READ_OPERATIONS = frozenset({"get_rate", "show_portfolio"})
+
+logger = logging.getLogger("parser_service")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_UnixServer | _TcpServer"
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.daemon.count("connections")
+        if self.server.address_family != socket.AF_UNIX:
+            # ответы короткие: без Nagle они уходят сразу
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self) -> None:
+        session: dict[str, Any] = {"user_id": None, "username": None}
+        try:
+            for line in self.rfile:
+                if line.strip():
+                    response = self.server.daemon.dispatch(line, session)
+                    self.wfile.write(encode(response))
+        except ConnectionError:
+            # клиент закрыл соединение, не дождавшись ответов
+            pass
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    daemon: "Daemon"
+
+
+class _TcpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    daemon: "Daemon"
+
+
+class _Tcp6Server(_TcpServer):
+    address_family = socket.AF_INET6
+
+
+class Daemon:
+    def __init__(self, address: str | None = None, flush_interval: float = 1.0) -> None:
+        self.address = parse_address(address)
+        self.cache = DataCache(flush_interval)
+        self.stats = {"connections": 0, "requests": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+        # изменяющие операции выполняются по одной
+        self._write_lock = threading.Lock()
+        self._server: _UnixServer | _TcpServer | None = None
+
+    @property
+    def url(self) -> str:
+        if isinstance(self.address, tuple):
+            host, port = (
+                self._server.server_address[:2] if self._server else self.address
+            )
+            return f"{host}:{port}"
+        return self.address
+
+    def count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    # обработка запроса
+
+    def dispatch(self, line: bytes, session: dict[str, Any]) -> dict[str, Any]:
+        rid = None
+        try:
+            message = decode(line)
+            rid = message.get("id")
+            op = message.get("op")
+            args = message.get("args") or {}
+            if op == "ping":
+                return {"id": rid, "ok": True, "result": "pong"}
+            func = OPERATIONS.get(op)
+            if func is None:
+                raise ValueError(f"Неизвестная операция '{op}'.")
+            if not isinstance(args, dict):
+                raise ValueError("args должен быть JSON-объектом.")
+            self.count("requests")
+            result = self._run(op, func, args, session)
+            return {"id": rid, "ok": True, "result": result}
+        except (ValueError, TypeError) as e:
+            self.count("errors")
+            return {
+                "id": rid,
+                "ok": False,
+                "error": str(e),
+                "error_type": type(e).__name__,
+            }
+        except Exception as e:
+            self.count("errors")
+            logger.exception("serve: внутренняя ошибка")
+            return {
+                "id": rid,
+                "ok": False,
+                "error": "Внутренняя ошибка. Подробности в logs/parser_service.log",
+                "error_type": type(e).__name__,
+            }
+
+    def _run(self, op: str, func: Callable[..., Any], args: dict, session: dict) -> Any:
+        # Операция в транзакции кэша: чтения без общей блокировки (при
+        # конфликте - один повтор), изменения - под _write_lock
+        retry = op in READ_OPERATIONS
+        lock = contextlib.nullcontext() if retry else self._write_lock
+        while True:
+            try:
+                with lock, session_scope(session), self.cache.transaction():
+                    return func(**args)
+            except DataConflictError:
+                if not retry:
+                    raise
+                retry = False
+
+    # жизненный цикл
+
+    def start(self) -> "Daemon":
+        # Открывает сокет и устанавливает кэш данных; обслуживание - serve_forever
+        if isinstance(self.address, tuple):
+            tcp = _Tcp6Server if ":" in self.address[0] else _TcpServer
+            server: _UnixServer | _TcpServer = tcp(self.address, _Handler)
+        else:
+            self._remove_stale_socket(self.address)
+            Path(self.address).parent.mkdir(parents=True, exist_ok=True)
+            server = _UnixServer(self.address, _Handler)
+        server.daemon = self
+        self._server = server
+        self.cache.start()
+        return self
+
+    def serve_forever(self) -> None:
+        if self._server is None:
+            self.start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self) -> None:
+        # Останавливает serve_forever (из другого потока)
+        if self._server is not None:
+            self._server.shutdown()
+
+    def close(self) -> None:
+        if self._server is None:
+            return
+        self._server.server_close()
+        self._server = None
+        if not isinstance(self.address, tuple):
+            try:
+                os.unlink(self.address)
+            except FileNotFoundError:
+                pass
+        try:
+            self.cache.close()
+        except DataConflictError as e:
+            logger.error("serve: изменения не записаны: %s", e)
+
+    def install_signal_handlers(self) -> None:
+        # SIGTERM/SIGINT: остановить приём и записать данные на диск.
+        # shutdown() ждёт выхода из serve_forever, поэтому - из отдельного потока
+        def handler(signum: int, frame: Any) -> None:
+            threading.Thread(target=self.shutdown, daemon=True).start()
+
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, handler)
+
+    @staticmethod
+    def _remove_stale_socket(path: str) -> None:
+        # Файл сокета от упавшего процесса удаляется; если демон жив - ошибка
+        if not os.path.exists(path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+        else:
+            raise ValueError(f"serve уже запущен: {path}")
+        finally:
+            probe.close()
@@ -2,38 +2,157 @@
 
 from __future__ import annotations
 
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
 from pathlib import Path
+from typing import Any
 
 from valutatrade_hub.infra.settings import SettingsLoader
 
+ACTIONS_LOGGER = "valutatrade_hub.actions"
+
+# Поля записи действия (log_action), которые попадают в JSON
+ACTION_FIELDS = ("action", "status", "duration_ms", "user_id", "currency", "amount")
+
+_listener: Any = None
+
+
+class JsonFormatter(logging.Formatter):
+    # Одна запись - одна строка JSON
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for key in ACTION_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["error"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _queue_options() -> tuple[int, str]:
+    # LOG_QUEUE_SIZE - ёмкость очереди записей, LOG_QUEUE_POLICY - что делать,
+    # когда очередь полна: block (ждать) или drop (отбросить запись)
+    size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    policy = os.getenv("LOG_QUEUE_POLICY", "block").strip().lower()
+    return size, policy
+
+
+def setup_actions_logging(
+    log_path: Path | None = None,
+    queue_size: int | None = None,
+    policy: str | None = None,
+) -> logging.Logger:
+    """Логгер действий: запись ставится в очередь, в файл её пишет фоновый поток.
+
+    Вызывающий поток не ждёт ни диска, ни ротации файла; формат JSON
+    считается тоже в фоновом потоке.
+    """
+    global _listener
 
-def get_actions_logger() -> logging.Logger:
-    logger = logging.getLogger("valutatrade_hub.actions")
-    if logger.handlers:
-        return logger
+    from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
     settings = SettingsLoader().load()
-    settings.logs_dir.mkdir(parents=True, exist_ok=True)
-
-    handler = RotatingFileHandler(
-        filename=str(settings.actions_log),
+    log_path = log_path or settings.actions_log
+    size, default_policy = _queue_options()
+    queue_size = size if queue_size is None else queue_size
+    policy = policy or default_policy
+    if policy not in ("block", "drop"):
+        raise ValueError("LOG_QUEUE_POLICY: ожидается block или drop.")
+
+    class _BoundedQueueHandler(QueueHandler):
+        dropped = 0
+
+        def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+            # Только подстановка аргументов и текст исключения: traceback
+            # не должен жить в очереди, остальное форматирует слушатель
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+            return record
+
+        def enqueue(self, record: logging.LogRecord) -> None:
+            if policy == "block":
+                self.queue.put(record)
+                return
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                type(self).dropped += 1
+
+    class _Listener(QueueListener):
+        def enqueue_sentinel(self) -> None:
+            # put_nowait из stdlib падает на заполненной ограниченной очереди
+            self.queue.put(self._sentinel)
+
+    shutdown_actions_logging()
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    file_handler = RotatingFileHandler(
+        filename=str(log_path),
         maxBytes=512_000,
         backupCount=3,
         encoding="utf-8",
     )
-    fmt = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
-    handler.setFormatter(fmt)
+    file_handler.setFormatter(JsonFormatter())
+
+    records: queue.Queue = queue.Queue(maxsize=queue_size)
+    handler = _BoundedQueueHandler(records)
+    _listener = _Listener(records, file_handler)
+    _listener.handler = handler
+    _listener.start()
 
+    logger = logging.getLogger(ACTIONS_LOGGER)
     logger.setLevel(getattr(logging, settings.log_level, logging.INFO))
     logger.addHandler(handler)
     logger.propagate = False
     return logger
-    logger.propagate = False
-    return logger
 
 
+def shutdown_actions_logging() -> int:
+    # Дописывает очередь в файл и останавливает фоновый поток.
+    # Возвращает число отброшенных записей (политика drop)
+    global _listener
+
+    if _listener is None:
+        return 0
+    listener, _listener = _listener, None
+    logging.getLogger(ACTIONS_LOGGER).removeHandler(listener.handler)
+    listener.stop()
+    dropped = listener.handler.dropped
+    file_handler = listener.handlers[0]
+    if dropped:
+        file_handler.handle(
+            logging.makeLogRecord(
+                {
+                    "levelname": "WARNING",
+                    "levelno": logging.WARNING,
+                    "msg": f"Отброшено записей лога (очередь полна): {dropped}",
+                }
+            )
+        )
+    file_handler.close()
+    return dropped
+
+
+def get_actions_logger() -> logging.Logger:
+    logger = logging.getLogger(ACTIONS_LOGGER)
+    if logger.handlers:
+        return logger
+    logger = setup_actions_logging()
+    atexit.register(shutdown_actions_logging)
+    return logger
+
 
 def setup_parser_service_logger(log_path: Path | None = None) -> Path:
     """Настраивает логгер parser_service в файл (сообщения на русском).
@@ -53,6 +172,8 @@ def setup_parser_service_logger(log_path: Path | None = None) -> Path:
         settings = SettingsLoader().load()
         log_path = settings.logs_dir / "parser_service.log"
 
+    from logging.handlers import RotatingFileHandler
+
     log_path.parent.mkdir(parents=True, exist_ok=True)
 
     handler = RotatingFileHandler(
@@ -0,0 +1,357 @@
+# Метрики процесса: счётчики, gauge и гистограммы задержек с фиксированными
+# корзинами. Метрика объявляется один раз при импорте модуля, дочерняя
+# метрика с метками берётся заранее (labels()), и на горячем пути остаётся
+# одна операция под блокировкой.
+#
+#     BUY_SECONDS = histogram("usecase_seconds", "...", ("op",)).labels(op="buy")
+#     BUY_SECONDS.observe(0.0021)
+#
+# Экспорт: текстовый формат Prometheus (logs/metrics.prom, для textfile
+# collector node_exporter) и JSON-снимок (logs/metrics.json).
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Iterator, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+PREFIX = "valutatrade_"
+
+# Корзины задержек, с: от 100 мкс (чтение из памяти) до 10 с (таймаут API)
+LATENCY_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class _Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        # acquire/release дешевле with на горячем пути
+        lock = self._lock
+        lock.acquire()
+        self.value += amount
+        lock.release()
+
+
+class _Gauge(_Counter):
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # последняя - +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        # число наблюдений - сумма корзин, отдельно не считается
+        i = bisect_left(self.bounds, value)
+        lock = self._lock
+        lock.acquire()
+        self.counts[i] += 1
+        self.sum += value
+        lock.release()
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, hist: _Histogram) -> None:
+        self.hist = hist
+        self.t0 = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.hist.observe(perf_counter() - self.t0)
+
+
+_KINDS = {"counter": _Counter, "gauge": _Gauge, "histogram": _Histogram}
+
+
+class Metric:
+    # Семейство метрик с одним именем; значения - у дочерних по меткам
+
+    def __init__(
+        self,
+        kind: str,
+        name: str,
+        help_text: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._children: dict[tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not labelnames:
+            # метрика без меток экспортируется и до первого наблюдения (0)
+            self.labels()
+
+    def labels(self, **labels: Any) -> Any:
+        key = tuple(map(str, map(labels.__getitem__, self.labelnames)))
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    if self.kind == "histogram":
+                        child = _Histogram(self.buckets)
+                    else:
+                        child = _KINDS[self.kind]()
+                    self._children[key] = child
+        return child
+
+    # метрика без меток
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self) -> Iterator[tuple[dict[str, str], Any]]:
+        for key, child in list(self._children.items()):
+            yield dict(zip(self.labelnames, key)), child
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind: str, name: str, help_text: str, **kwargs: Any) -> Metric:
+        full = PREFIX + name
+        with self._lock:
+            metric = self._metrics.get(full)
+            if metric is None:
+                metric = Metric(kind, full, help_text, **kwargs)
+                self._metrics[full] = metric
+            elif metric.kind != kind:
+                raise ValueError(f"Метрика {full} уже объявлена как {metric.kind}.")
+            return metric
+
+    def counter(
+        self, name: str, help_text: str, labelnames: tuple[str, ...] = ()
+    ) -> Metric:
+        return self._get("counter", name, help_text, labelnames=labelnames)
+
+    def gauge(
+        self, name: str, help_text: str, labelnames: tuple[str, ...] = ()
+    ) -> Metric:
+        return self._get("gauge", name, help_text, labelnames=labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Metric:
+        return self._get(
+            "histogram", name, help_text, labelnames=labelnames, buckets=buckets
+        )
+
+    def get(self, name: str) -> Metric | None:
+        return self._metrics.get(PREFIX + name)
+
+    def reset(self) -> None:
+        # Обнуляет значения; дочерние метрики остаются теми же объектами
+        for metric in self._metrics.values():
+            for _, child in metric.samples():
+                with child._lock:
+                    if isinstance(child, _Histogram):
+                        child.counts = [0] * len(child.counts)
+                        child.sum = 0.0
+                    else:
+                        child.value = 0.0
+
+    # экспорт
+
+    def snapshot(self) -> dict[str, Any]:
+        out: dict[str, Any] = {}
+        for name, metric in sorted(self._metrics.items()):
+            values = []
+            for labels, child in metric.samples():
+                if metric.kind == "histogram":
+                    with child._lock:
+                        counts, total = list(child.counts), child.sum
+                    n = sum(counts)
+                    buckets = dict(zip([*map(str, metric.buckets), "+Inf"], counts))
+                    values.append(
+                        {"labels": labels, "count": n, "sum": total, "buckets": buckets}
+                    )
+                else:
+                    values.append({"labels": labels, "value": child.value})
+            out[name] = {"type": metric.kind, "help": metric.help, "values": values}
+        return out
+
+    def to_prometheus(self) -> str:
+        lines: list[str] = []
+        for name, data in self.snapshot().items():
+            lines.append(f"# HELP {name} {data['help']}")
+            lines.append(f"# TYPE {name} {data['type']}")
+            for v in data["values"]:
+                labels = v["labels"]
+                if data["type"] != "histogram":
+                    lines.append(f"{name}{_labels(labels)} {_num(v['value'])}")
+                    continue
+                cumulative = 0
+                for le, n in v["buckets"].items():
+                    cumulative += n
+                    le_labels = _labels({**labels, "le": le})
+                    lines.append(f"{name}_bucket{le_labels} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_num(v['sum'])}")
+                lines.append(f"{name}_count{_labels(labels)} {v['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, out_dir: Path | None = None) -> tuple[Path, Path]:
+        # logs/metrics.prom и logs/metrics.json; запись атомарная (tmp + replace),
+        # чтобы node_exporter не прочитал файл наполовину
+        if out_dir is None:
+            from valutatrade_hub.infra.settings import SettingsLoader
+
+            out_dir = SettingsLoader().load().logs_dir
+        out_dir.mkdir(parents=True, exist_ok=True)
+        prom, snap = out_dir / "metrics.prom", out_dir / "metrics.json"
+        _atomic_write(prom, self.to_prometheus())
+        _atomic_write(snap, json.dumps(self.snapshot(), ensure_ascii=False, indent=2))
+        return prom, snap
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    body = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+    return "{" + body + "}"
+
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+def timed(seconds: Metric, errors: Metric, **labels: Any) -> Callable[[F], F]:
+    # Декоратор: время вызова в гистограмму seconds, исключения - в errors
+    hist = seconds.labels(**labels)
+    failed = errors.labels(**labels)
+
+    def decorator(func: F) -> F:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            t0 = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                failed.inc()
+                raise
+            finally:
+                hist.observe(perf_counter() - t0)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+class MetricsExporter:
+    # Фоновая запись метрик раз в interval секунд и при остановке
+
+    def __init__(self, interval: float, out_dir: Path | None = None) -> None:
+        self.interval = interval
+        self.out_dir = out_dir
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "MetricsExporter":
+        if self.interval > 0:
+            self._thread = threading.Thread(
+                target=self._loop, name="metrics-exporter", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                REGISTRY.write(self.out_dir)
+            except OSError:
+                pass
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        REGISTRY.write(self.out_dir)
+
+
+@contextmanager
+def exporting(interval: float | None = None) -> Iterator[MetricsExporter]:
+    # METRICS_INTERVAL - период записи метрик долгоживущих команд, с (15)
+    if interval is None:
+        interval = float(os.getenv("METRICS_INTERVAL", "15"))
+    exporter = MetricsExporter(interval).start()
+    try:
+        yield exporter
+    finally:
+        exporter.stop()
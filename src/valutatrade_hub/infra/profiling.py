@@ -0,0 +1,163 @@
+# Профилирование команд: --profile MODE (или VALUTATRADE_PROFILE=MODE), где
+# MODE - spans, cpu, mem или несколько через запятую (cpu,mem).
+#
+# spans - именованные участки (read_json, write_json, ensure_rates_fresh,
+# fetch_rates, valuation, ...): число вызовов и суммарное время каждого.
+# Пока замер не включён, span() возвращает пустой контекст и почти ничего
+# не стоит. cpu - cProfile (файл .pstats и топ функций), mem - tracemalloc
+# (пик и топ мест выделения памяти). Отчёт пишется в logs/profile/.
+
+from __future__ import annotations
+
+import contextlib
+import io
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, ContextManager
+
+MODES = ("spans", "cpu", "mem")
+TOP = 30
+
+# имя участка -> [число вызовов, суммарное время, с]; None - замер выключен
+_spans: dict[str, list[float]] | None = None
+_spans_lock = threading.Lock()
+_NULL = contextlib.nullcontext()
+
+
+class _Span:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.t0 = 0.0
+
+    def __enter__(self) -> "_Span":
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        elapsed = perf_counter() - self.t0
+        spans = _spans
+        if spans is None:
+            return
+        with _spans_lock:
+            entry = spans.setdefault(self.name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+
+def span(name: str) -> ContextManager[Any]:
+    # with span("read_json"): ... - участок для разбивки времени по фазам
+    if _spans is None:
+        return _NULL
+    return _Span(name)
+
+
+def enable_spans() -> None:
+    global _spans
+    _spans = {}
+
+
+def disable_spans() -> list[tuple[str, int, float]]:
+    # Выключает замер; возвращает (имя, вызовов, мс), по убыванию времени
+    global _spans
+    spans, _spans = _spans or {}, None
+    return sorted(
+        ((name, int(n), total * 1000) for name, (n, total) in spans.items()),
+        key=lambda r: r[2],
+        reverse=True,
+    )
+
+
+def parse_modes(value: str) -> set[str]:
+    modes = {m.strip().lower() for m in value.split(",") if m.strip()}
+    if "all" in modes:
+        return set(MODES)
+    unknown = modes - set(MODES)
+    if unknown or not modes:
+        raise ValueError(
+            f"Неизвестный режим профилирования '{value}'. "
+            f"Доступно: {', '.join(MODES)}, all."
+        )
+    return modes
+
+
+def _format_spans(rows: list[tuple[str, int, float]], wall_ms: float) -> str:
+    lines = [f"{'участок':24} {'вызовов':>8} {'мс':>10} {'%':>6}"]
+    for name, n, ms in rows:
+        share = ms / wall_ms * 100 if wall_ms else 0.0
+        lines.append(f"{name:24} {n:8d} {ms:10.2f} {share:6.1f}")
+    lines.append(f"{'всего (команда)':24} {'':8} {wall_ms:10.2f}")
+    return "\n".join(lines)
+
+
+def profile_call(
+    func: Callable[[], Any],
+    label: str,
+    modes: str,
+    out_dir: Path | None = None,
+    top: int = TOP,
+) -> Any:
+    """Выполняет func под выбранными профилировщиками и пишет отчёт.
+
+    Отчёт (logs/profile/<label>-<время>.txt и .pstats для cpu) пишется и
+    тогда, когда func завершилась ошибкой; разбивка по участкам
+    печатается в stderr.
+    """
+    selected = parse_modes(modes)
+    if out_dir is None:
+        from valutatrade_hub.infra.settings import SettingsLoader
+
+        out_dir = SettingsLoader().load().logs_dir / "profile"
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    base = out_dir / f"{label}-{stamp}"
+
+    profiler = None
+    if "cpu" in selected:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    if "mem" in selected:
+        import tracemalloc
+
+        tracemalloc.start()
+
+    enable_spans()
+    t0 = perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        return func()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall_ms = (perf_counter() - t0) * 1000
+        spans = disable_spans()
+
+        sections = [f"# {label}: {wall_ms:.2f} мс", _format_spans(spans, wall_ms)]
+        out_dir.mkdir(parents=True, exist_ok=True)
+        if profiler is not None:
+            import pstats
+
+            profiler.dump_stats(str(base.with_suffix(".pstats")))
+            buf = io.StringIO()
+            stats = pstats.Stats(profiler, stream=buf)
+            stats.sort_stats("cumulative").print_stats(top)
+            sections.append(f"# cProfile, топ-{top} по cumulative\n{buf.getvalue()}")
+        if "mem" in selected:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            stats_lines = [str(s) for s in snapshot.statistics("lineno")[:top]]
+            sections.append(
+                f"# tracemalloc: пик {peak / 1024:.1f} КиБ, топ-{top} мест\n"
+                + "\n".join(stats_lines)
+            )
+
+        report = base.with_suffix(".txt")
+        report.write_text("\n\n".join(sections) + "\n", encoding="utf-8")
+        print(sections[1], file=sys.stderr)
+        print(f"Профиль: {report}", file=sys.stderr)
@@ -2,13 +2,12 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, NamedTuple
 
 
-@dataclass(frozen=True)
-class Settings:
+# NamedTuple, а не dataclass: dataclasses тянет inspect (~6ms к старту CLI)
+class Settings(NamedTuple):
     # Пути к данным
     data_dir: Path
     users_json: Path
@@ -22,6 +21,12 @@ class Settings:
     # Базовая валюта по умолчанию
     default_base_currency: str
 
+    # Журнал сделок: снимок балансов каждые N записей
+    ledger_checkpoint_every: int
+
+    # Учёт себестоимости при продаже: fifo / lifo / average
+    cost_basis_policy: str
+
     # Логи
     logs_dir: Path
     actions_log: Path
@@ -61,6 +66,8 @@ class SettingsLoader:
             session_json=data_dir / "session.json",
             rates_ttl_seconds=300,
             default_base_currency="USD",
+            ledger_checkpoint_every=1000,
+            cost_basis_policy="fifo",
             logs_dir=logs_dir,
             actions_log=logs_dir / "actions.log",
             log_level="INFO",
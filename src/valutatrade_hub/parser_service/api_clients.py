@@ -1,19 +1,54 @@
 from __future__ import annotations
 
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
 from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import islice
 from time import perf_counter
-from typing import Any
+from typing import Any, Callable, Iterator
 
 import requests
 
 from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.fetch_cache import (
+    FetchCache,
+    get_fetch_cache,
+    next_update_from_headers,
+    parse_http_date,
+    request_key,
+)
+from valutatrade_hub.parser_service.health import get_source_health
+from valutatrade_hub.parser_service.hedging import (
+    HedgePolicy,
+    get_hedge_policy,
+    hedge_executor,
+    mirror_url,
+    request_executor,
+)
+from valutatrade_hub.parser_service.http import get_shared_session
+from valutatrade_hub.parser_service.rate_limit import (
+    RateLimiter,
+    get_rate_limiter,
+    parse_retry_after,
+)
+from valutatrade_hub.parser_service.storage import cached_source_pairs
+
+# Монет на странице /coins/markets (максимум CoinGecko)
+MARKETS_PAGE_SIZE = 250
 
 
 class ApiRequestError(RuntimeError):
     pass
 
 
+class RateLimitDeferred(ApiRequestError):
+    # Запрос не отправлен: квота исчерпана или источник заблокирован после 429
+    pass
+
+
 @dataclass(frozen=True)
 class FetchResult:
     pairs_usd_per_unit: dict[str, float]
@@ -22,8 +57,15 @@ class FetchResult:
 
 
 class BaseApiClient(ABC):
-    def __init__(self, config: ParserConfig) -> None:
+    def __init__(
+        self, config: ParserConfig, session: requests.Session | None = None
+    ) -> None:
         self.config = config
+        # общая сессия с пулом соединений, если не передана своя
+        self.session = session if session is not None else get_shared_session(config)
+
+    # Имя источника в реестре (для --source и RATE_SOURCES)
+    source_key: str = ""
 
     @property
     @abstractmethod
@@ -32,41 +74,334 @@ class BaseApiClient(ABC):
     @abstractmethod
     def fetch_rates(self) -> FetchResult: ...
 
+    def provided_pairs(self) -> frozenset[str]:
+        # Пары, которые отдаёт источник. Источники с общими парами
+        # взаимозаменяемы: опрашивается лучший, остальные - запасные.
+        # По умолчанию - пары, которые источник вернул в прошлый раз;
+        # пустое множество - источник ещё не опрашивался.
+        return self.cached_pairs()
+
+    def cached_pairs(self) -> frozenset[str]:
+        # Пары источника из кэша курсов (rates.json)
+        pairs = cached_source_pairs(self.config.rates_file)
+        return pairs.get(self.source_name, frozenset())
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        return get_rate_limiter(self.config.rate_limit_file, self.config.rate_quotas)
+
+    def _take_token(self) -> None:
+        # Короткое ожидание токена укладываем в запрос, длинное - откладываем
+        limiter = self.rate_limiter
+        wait = limiter.acquire(self.source_name)
+        if 0 < wait <= self.config.rate_limit_max_wait:
+            time.sleep(wait)
+            wait = limiter.acquire(self.source_name)
+        if wait > 0:
+            limiter.defer(self.source_name)
+            raise RateLimitDeferred(
+                f"{self.source_name}: запрос отложен на {wait:.0f} с (лимит запросов)"
+            )
+
+    @property
+    def fetch_cache(self) -> FetchCache | None:
+        if not self.config.conditional_fetch:
+            return None
+        return get_fetch_cache(self.config.fetch_cache_file)
+
+    def _get(
+        self,
+        url: str,
+        params: dict[str, Any] | None = None,
+        cache_key: str | None = None,
+    ) -> tuple[requests.Response, dict[str, Any]]:
+        # GET через общую сессию. Время делится на connect_ms (соединение и
+        # ожидание заголовков ответа) и transfer_ms (чтение тела ответа).
+        # С cache_key отправляются сохранённые валидаторы (ответ может быть 304).
+        name = self.source_name
+        cache = self.fetch_cache
+        headers = cache.validator_headers(cache_key) if cache and cache_key else None
+        self._take_token()
+        t_start = perf_counter()
+        try:
+            resp, t0, t1, t2, hedge = self._hedged(url, params, headers)
+        except requests.exceptions.Timeout as e:
+            raise ApiRequestError(f"{name}: timeout") from e
+        except requests.exceptions.RequestException as e:
+            raise ApiRequestError(f"{name}: network error: {e}") from e
+
+        if resp.status_code == 429:
+            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            self.rate_limiter.on_throttled(name, retry_after)
+        elif resp.status_code < 400:
+            self.rate_limiter.on_success(name)
+
+        timing = {
+            # полное время с первой отправки; connect/transfer - у ответа,
+            # который пришёл первым
+            "request_ms": int((t2 - t_start) * 1000),
+            "connect_ms": round((t1 - t0) * 1000, 1),
+            "transfer_ms": round((t2 - t1) * 1000, 1),
+        }
+        if hedge:
+            timing["hedge"] = hedge
+        return resp, timing
+
+    @property
+    def hedge_policy(self) -> HedgePolicy | None:
+        cfg = self.config
+        return get_hedge_policy(
+            cfg.hedge_percentile, cfg.hedge_min_delay, cfg.hedge_budget
+        )
+
+    def _saved_latencies(self) -> list[float]:
+        # Задержки источника из прошлых запусков (source_health.json), с
+        cfg = self.config
+        health = get_source_health(
+            cfg.source_health_file,
+            cfg.breaker_threshold,
+            cfg.breaker_cooldown,
+            cfg.breaker_cooldown_max,
+        )
+        entry = health.stats().get(self.source_name) or {}
+        return [ms / 1000 for ms in entry.get("latencies_ms") or []]
+
+    def _send(
+        self, url: str, params: dict[str, Any] | None, headers: dict | None
+    ) -> tuple[requests.Response, float, float, float]:
+        # Один запрос: ответ и моменты отправки, заголовков и конца тела
+        t0 = perf_counter()
+        resp = self.session.get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=self.config.request_timeout,
+            stream=True,
+        )
+        t1 = perf_counter()
+        resp.content  # дочитываем тело, соединение вернётся в пул
+        t2 = perf_counter()
+        policy = self.hedge_policy
+        if policy is not None:
+            policy.record(self.source_name, t2 - t0)
+        return resp, t0, t1, t2
+
+    def _hedged(
+        self, url: str, params: dict[str, Any] | None, headers: dict | None
+    ) -> tuple[requests.Response, float, float, float, str | None]:
+        # Если ответа нет дольше перцентиля недавних задержек, в пределах
+        # бюджета и лимита запросов отправляется второй такой же запрос.
+        # Берётся первый успешный ответ; ответ проигравшего закрывается,
+        # когда придёт (прервать уже отправленный запрос requests не умеет).
+        policy = self.hedge_policy
+        delay = None
+        if policy is not None:
+            policy.seed(self.source_name, self._saved_latencies)
+            delay = policy.delay(self.source_name)
+        if delay is None:
+            return (*self._send(url, params, headers), None)
+
+        primary = request_executor(self.config.http_pool_size).submit(
+            self._send, url, params, headers
+        )
+        try:
+            return (*primary.result(timeout=delay), None)
+        except FuturesTimeout:
+            pass
+        # нет токена - хедж просто не отправляется: основной запрос уже ушёл,
+        # отложенным он не считается
+        if (
+            not policy.try_spend(self.source_name)
+            or self.rate_limiter.acquire(self.source_name) > 0
+        ):
+            return (*primary.result(), None)
+
+        hedge_url = mirror_url(url, self.config.hedge_mirrors)
+        second = hedge_executor(self.config.hedge_pool_size).submit(
+            self._send, hedge_url, params, headers
+        )
+        labels = {primary: "primary", second: "hedge"}
+        pending = set(labels)
+        error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.add_done_callback(_close_response)
+                    return (*future.result(), labels[future])
+                error = future.exception()
+        raise error
+
+    # условные запросы
+
+    def _from_entry(
+        self, entry: dict[str, Any], how: str, timing: dict[str, Any]
+    ) -> FetchResult:
+        return FetchResult(
+            pairs_usd_per_unit=dict(entry["pairs"]),
+            source=self.source_name,
+            meta={
+                **entry.get("meta", {}),
+                **timing,
+                "cached": how,
+                "fetched_at": entry.get("fetched_at"),
+                "next_update": entry.get("next_update"),
+            },
+        )
+
+    def _cached(self, key: str) -> FetchResult | None:
+        # Сохранённый результат, если новых данных у источника ещё нет
+        cache = self.fetch_cache
+        if cache is None:
+            return None
+        entry = cache.fresh(key, datetime.now(timezone.utc))
+        return self._from_entry(entry, "fresh", {}) if entry else None
+
+    def _not_modified(
+        self, key: str, resp: requests.Response, timing: dict[str, Any]
+    ) -> FetchResult:
+        # 304: данные не изменились, продлеваем срок сохранённой записи
+        cache = self.fetch_cache
+        entry = cache.get(key) if cache else None
+        if entry is None:
+            raise ApiRequestError(f"{self.source_name}: 304 без сохранённого ответа")
+        next_update = next_update_from_headers(resp.headers, datetime.now(timezone.utc))
+        entry = {
+            **entry,
+            "next_update": next_update.isoformat() if next_update else None,
+        }
+        cache.put(key, entry)
+        return self._from_entry(entry, "not_modified", timing)
+
+    def _remember(
+        self,
+        key: str,
+        result: FetchResult,
+        resp: requests.Response,
+        next_update: datetime | None = None,
+    ) -> None:
+        cache = self.fetch_cache
+        if cache is None:
+            return
+        now = datetime.now(timezone.utc)
+        if next_update is None:
+            next_update = next_update_from_headers(resp.headers, now)
+        cache.put(
+            key,
+            {
+                "pairs": result.pairs_usd_per_unit,
+                "meta": result.meta,
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "next_update": next_update.isoformat() if next_update else None,
+                "fetched_at": now.replace(microsecond=0).isoformat(),
+            },
+        )
+
 
 class CoinGeckoClient(BaseApiClient):
+    source_key = "coingecko"
+
     @property
     def source_name(self) -> str:
         return "CoinGecko"
 
+    def provided_pairs(self) -> frozenset[str]:
+        # с crypto_top состав зависит от рейтинга - берём пары прошлого ответа
+        return self.config.crypto_pairs() or self.cached_pairs()
+
     def fetch_rates(self) -> FetchResult:
-        # CoinGecko дает цену в USD за 1 монету -> это наш стандарт "USD per unit"
+        # CoinGecko дает цену в USD за 1 монету -> это наш стандарт "USD per unit".
+        # Явно перечисленные монеты - через simple/price (ids режутся на части
+        # по длине URL), топ по капитализации - страницами /coins/markets.
+        # Части запрашиваются параллельно, каждая берёт свой токен лимита.
         ids = []
         for c in self.config.crypto_currencies:
             coin_id = self.config.crypto_id_map.get(c)
             if coin_id:
                 ids.append(coin_id)
 
-        if not ids:
+        url = self.config.coingecko_url
+        budget = (
+            self.config.coingecko_max_url - len(url) - len("?ids=&vs_currencies=usd")
+        )
+        top = self.config.crypto_top
+        # (рейтинг?, url, params, разбор ответа); страницы рейтинга - первыми
+        parts = [
+            (
+                True,
+                self.config.coingecko_markets_url,
+                {
+                    "vs_currency": "usd",
+                    "order": "market_cap_desc",
+                    "per_page": MARKETS_PAGE_SIZE,
+                    "page": page,
+                },
+                self._parse_markets,
+            )
+            for page in range(1, -(-top // MARKETS_PAGE_SIZE) + 1)
+        ]
+        parts += [
+            (
+                False,
+                url,
+                {"ids": ",".join(chunk), "vs_currencies": "usd"},
+                self._parse_simple,
+            )
+            for chunk in chunk_ids(ids, budget)
+        ]
+
+        if not parts:
             return FetchResult(
                 pairs_usd_per_unit={},
                 source=self.source_name,
                 meta={"note": "no crypto ids"},
             )
-
-        params = {"ids": ",".join(ids), "vs_currencies": "usd"}
-
-        t0 = perf_counter()
-        try:
-            resp = requests.get(
-                self.config.coingecko_url,
-                params=params,
-                timeout=self.config.request_timeout,
-            )
-        except requests.exceptions.Timeout as e:
-            raise ApiRequestError("CoinGecko: timeout") from e
-        except requests.exceptions.RequestException as e:
-            raise ApiRequestError(f"CoinGecko: network error: {e}") from e
-        dt_ms = int((perf_counter() - t0) * 1000)
+        if len(parts) == 1:
+            return self._fetch_part(*parts[0][1:])
+
+        workers = min(len(parts), self.config.http_pool_size)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self._fetch_part, *part[1:]) for part in parts]
+
+        ranked: dict[str, float] = {}
+        explicit: dict[str, float] = {}
+        results: list[FetchResult] = []
+        errors: list[str] = []
+        for (is_markets, *_), future in zip(parts, futures):
+            try:
+                result = future.result()
+            except ApiRequestError as e:
+                errors.append(str(e))
+                continue
+            results.append(result)
+            target = ranked if is_markets else explicit
+            for pair, rate in result.pairs_usd_per_unit.items():
+                target.setdefault(pair, rate)
+        if not results:
+            raise ApiRequestError("; ".join(errors))
+
+        # Рейтинг обрезаем до top монет, явно заданные монеты перекрывают
+        # совпавшие тикеры
+        out = dict(islice(ranked.items(), top))
+        out.update(explicit)
+        return FetchResult(out, self.source_name, _merge_meta(results, errors, out))
+
+    def _fetch_part(
+        self,
+        url: str,
+        params: dict[str, Any],
+        parse: Callable[[Any], dict[str, float]],
+    ) -> FetchResult:
+        key = request_key(self.source_name, url, params)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        resp, timing = self._get(url, params=params, cache_key=key)
+        if resp.status_code == 304:
+            return self._not_modified(key, resp, timing)
 
         if resp.status_code == 429:
             raise ApiRequestError("CoinGecko: 429 Too Many Requests (лимит запросов)")
@@ -78,7 +413,23 @@ class CoinGeckoClient(BaseApiClient):
         except ValueError as e:
             raise ApiRequestError("CoinGecko: invalid JSON") from e
 
+        out = parse(data)
+        result = FetchResult(
+            pairs_usd_per_unit=out,
+            source=self.source_name,
+            meta={
+                "status_code": resp.status_code,
+                **timing,
+                "count": len(out),
+            },
+        )
+        self._remember(key, result, resp)
+        return result
+
+    def _parse_simple(self, data: Any) -> dict[str, float]:
         # data: {"bitcoin": {"usd": 59337.21}, ...}
+        if not isinstance(data, dict):
+            raise ApiRequestError("CoinGecko: invalid simple/price format")
         out: dict[str, float] = {}
         inv_map = {v: k for k, v in self.config.crypto_id_map.items()}
         for coin_id, obj in data.items():
@@ -88,23 +439,41 @@ class CoinGeckoClient(BaseApiClient):
             usd_val = obj.get("usd")
             if isinstance(usd_val, (int, float)) and usd_val > 0:
                 out[f"{ticker}_USD"] = float(usd_val)
-
-        return FetchResult(
-            pairs_usd_per_unit=out,
-            source=self.source_name,
-            meta={
-                "status_code": resp.status_code,
-                "request_ms": dt_ms,
-                "count": len(out),
-            },
-        )
+        return out
+
+    @staticmethod
+    def _parse_markets(data: Any) -> dict[str, float]:
+        # data: [{"symbol": "btc", "current_price": 59337.21, "market_cap": ...},
+        # ...] по убыванию капитализации. Тикеры не уникальны (разные монеты с
+        # символом "btc"): берём монету с наибольшей market_cap, остальные
+        # пропускаем. Между страницами побеждает более ранняя страница.
+        if not isinstance(data, list):
+            raise ApiRequestError("CoinGecko: invalid coins/markets format")
+        best: dict[str, tuple[float, float]] = {}
+        for obj in data:
+            symbol = str(obj.get("symbol") or "").upper()
+            price = obj.get("current_price")
+            if not symbol or not isinstance(price, (int, float)) or price <= 0:
+                continue
+            cap = obj.get("market_cap")
+            cap = float(cap) if isinstance(cap, (int, float)) else 0.0
+            pair = f"{symbol}_USD"
+            if pair not in best or cap > best[pair][0]:
+                best[pair] = (cap, float(price))
+        return {pair: price for pair, (_, price) in best.items()}
 
 
 class ExchangeRateApiClient(BaseApiClient):
+    source_key = "exchangerate"
+
     @property
     def source_name(self) -> str:
         return "ExchangeRate-API"
 
+    def provided_pairs(self) -> frozenset[str]:
+        # при "fiat": "all" - пары прошлого ответа
+        return self.config.fiat_pairs() or self.cached_pairs()
+
     def fetch_rates(self) -> FetchResult:
         key = self.config.exchangerate_api_key
         if not key:
@@ -113,19 +482,17 @@ class ExchangeRateApiClient(BaseApiClient):
             )
 
         url = (
-    f"{self.config.exchangerate_url}/{key}/latest/"
-    f"{self.config.base_fiat_currency}"
-)
-
+            f"{self.config.exchangerate_url}/{key}/latest/"
+            f"{self.config.base_fiat_currency}"
+        )
+        key = request_key(self.source_name, url)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
 
-        t0 = perf_counter()
-        try:
-            resp = requests.get(url, timeout=self.config.request_timeout)
-        except requests.exceptions.Timeout as e:
-            raise ApiRequestError("ExchangeRate-API: timeout") from e
-        except requests.exceptions.RequestException as e:
-            raise ApiRequestError(f"ExchangeRate-API: network error: {e}") from e
-        dt_ms = int((perf_counter() - t0) * 1000)
+        resp, timing = self._get(url, cache_key=key)
+        if resp.status_code == 304:
+            return self._not_modified(key, resp, timing)
 
         if resp.status_code == 401:
             raise ApiRequestError(
@@ -144,7 +511,7 @@ class ExchangeRateApiClient(BaseApiClient):
             raise ApiRequestError("ExchangeRate-API: invalid JSON") from e
 
         # ожидаем: {"result":"success","base_code":"USD","time_last_update_utc":"..."}
-# и "rates": {...}
+        # и "rates": {...}
 
         if data.get("result") != "success":
             err_type = data.get("error-type")
@@ -154,19 +521,76 @@ class ExchangeRateApiClient(BaseApiClient):
         if not isinstance(rates, dict):
             raise ApiRequestError("ExchangeRate-API: invalid rates format")
 
+        # Вся карта курсов за один проход (или только fiat_currencies, если
+        # список задан в файле валют)
+        base = self.config.base_fiat_currency
+        wanted = self.config.fiat_currencies
+        wanted = frozenset(wanted) if wanted is not None else None
         out: dict[str, float] = {}
-        for ccy in self.config.fiat_currencies:
-            v = rates.get(ccy)
+        for ccy, v in rates.items():
+            if ccy == base or (wanted is not None and ccy not in wanted):
+                continue
             if isinstance(v, (int, float)) and v > 0:
                 out[f"{ccy}_USD"] = 1.0 / float(v)
 
-        return FetchResult(
+        result = FetchResult(
             pairs_usd_per_unit=out,
             source=self.source_name,
             meta={
                 "status_code": resp.status_code,
-                "request_ms": dt_ms,
+                **timing,
                 "time_last_update_utc": data.get("time_last_update_utc"),
                 "count": len(out),
             },
         )
+        # источник обновляется примерно раз в сутки и сам сообщает, когда
+        self._remember(key, result, resp, _next_update(data))
+        return result
+
+
+def _close_response(future: Future) -> None:
+    # Ответ проигравшего хеджированного запроса больше не нужен
+    if not future.cancelled() and future.exception() is None:
+        future.result()[0].close()
+
+
+def chunk_ids(ids: list[str], budget: int) -> Iterator[list[str]]:
+    # Делит ids на части, чтобы строка "id1%2Cid2..." (запятая кодируется
+    # в URL как %2C) укладывалась в budget символов
+    chunk: list[str] = []
+    size = 0
+    for coin_id in ids:
+        cost = len(coin_id) + (3 if chunk else 0)
+        if chunk and size + cost > budget:
+            yield chunk
+            chunk, size = [], 0
+            cost = len(coin_id)
+        chunk.append(coin_id)
+        size += cost
+    if chunk:
+        yield chunk
+
+
+def _merge_meta(
+    results: list[FetchResult], errors: list[str], out: dict[str, float]
+) -> dict[str, Any]:
+    # Метаданные ответа из нескольких частей: время - по самой медленной,
+    # "из кэша" - только если из кэша взяты все части
+    meta: dict[str, Any] = {"parts": len(results) + len(errors), "count": len(out)}
+    for key in ("request_ms", "connect_ms", "transfer_ms"):
+        values = [r.meta[key] for r in results if key in r.meta]
+        if values:
+            meta[key] = max(values)
+    if errors:
+        meta["errors"] = errors
+    if all(r.meta.get("cached") for r in results):
+        meta["cached"] = results[0].meta["cached"]
+        meta["fetched_at"] = min(r.meta.get("fetched_at") or "" for r in results)
+    return meta
+
+
+def _next_update(data: dict[str, Any]) -> datetime | None:
+    unix = data.get("time_next_update_unix")
+    if isinstance(unix, (int, float)) and unix > 0:
+        return datetime.fromtimestamp(unix, tz=timezone.utc)
+    return parse_http_date(data.get("time_next_update_utc"))
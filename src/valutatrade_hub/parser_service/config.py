@@ -1,10 +1,31 @@
 from __future__ import annotations
 
+import json
 import os
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
 from valutatrade_hub.core.utils import data_file
+from valutatrade_hub.parser_service.rate_limit import Quota
+
+# Набор отслеживаемых валют по умолчанию (переопределяется CURRENCIES_FILE):
+# несколько фиатных валют и монет. Полный набор (вся карта ExchangeRate-API и
+# топ-2000 монет, ~2000 пар за обновление) - FULL_CURRENCIES_FILE
+DEFAULT_CURRENCIES_FILE = Path(__file__).with_name("currencies.json")
+FULL_CURRENCIES_FILE = Path(__file__).with_name("currencies_full.json")
+
+# Квоты тарифных планов по умолчанию (переопределяются через env)
+DEFAULT_QUOTAS = {
+    "CoinGecko": ("COINGECKO_QUOTA", "30/60"),
+    "ExchangeRate-API": ("EXCHANGERATE_QUOTA", "1500/2592000"),
+}
+
+# Интервалы опроса в режиме --watch, секунды (переопределяются через env)
+DEFAULT_POLL_INTERVALS = {
+    "CoinGecko": ("COINGECKO_INTERVAL", "60"),
+    "ExchangeRate-API": ("EXCHANGERATE_INTERVAL", "3600"),
+}
 
 
 @dataclass(frozen=True)
@@ -16,41 +37,191 @@ class ParserConfig:
 
     # URL внешних сервисов
     coingecko_url: str
+    coingecko_markets_url: str
     exchangerate_url: str  # базовый префикс, ключ вставим в клиенте
+    # Предельная длина URL запроса CoinGecko (по ней режется список ids)
+    coingecko_max_url: int
 
-    # Валюты
+    # Валюты (из файла currencies.json)
     base_fiat_currency: str
-    fiat_currencies: tuple[str, ...]
+    # None - все валюты, которые отдаёт ExchangeRate-API
+    fiat_currencies: tuple[str, ...] | None
     crypto_currencies: tuple[str, ...]
     crypto_id_map: dict[str, str]
+    # Сколько монет с наибольшей капитализацией брать из /coins/markets
+    crypto_top: int
 
     # Файлы хранения
     rates_file: Path
     history_file: Path
+    # Последние ответы источников и их валидаторы (ETag, Last-Modified, next_update)
+    fetch_cache_file: Path
 
     # Сеть
     request_timeout: int
+    # Общий срок на обновление: источники, не ответившие к нему, считаются ошибкой
+    update_deadline: float
+    # Пул соединений и повторы при временных ошибках (500/502/503/504, сеть)
+    http_pool_size: int
+    http_retries: int
+    http_backoff: float
+    # Не ходить в сеть, пока у источника не может быть новых данных
+    conditional_fetch: bool
+    # Хеджирование: второй запрос, если ответа нет дольше перцентиля
+    # недавних задержек (0 - выключено), но не раньше min_delay секунд;
+    # budget - доля дополнительных запросов; mirrors - {префикс URL: зеркало}
+    hedge_percentile: float
+    hedge_min_delay: float
+    hedge_budget: float
+    hedge_mirrors: dict[str, str]
+    # Потоки и соединения для вторых запросов сверх http_pool_size
+    hedge_pool_size: int
+    # Запись ответов на диск ("record") или ответы только из записей
+    # ("replay") вместо сети; None - обычная работа
+    http_fixtures: str | None
+    http_fixtures_dir: Path
+
+    # Лимиты запросов: квоты по источникам, файл состояния, сколько
+    # секунд можно подождать токен (дольше - запрос откладывается)
+    rate_quotas: dict[str, Quota]
+    rate_limit_file: Path
+    rate_limit_max_wait: float
+
+    # Включённые источники курсов: имена из реестра или name=модуль:Класс
+    rate_sources: tuple[str, ...]
+
+    # Circuit breaker: файл состояния здоровья источников, сколько ошибок
+    # подряд размыкают цепь и на сколько секунд (растёт вдвое до MAX)
+    source_health_file: Path
+    breaker_threshold: int
+    breaker_cooldown: float
+    breaker_cooldown_max: float
+    # rates-health: p90 задержки источника выше этого порога - "slow", мс
+    health_slow_ms: float
+
+    # Режим --watch: интервалы опроса по источникам, разброс интервала
+    # (доля, ±), пауза после ошибки BASE * 2^(n-1), не больше MAX
+    poll_intervals: dict[str, float]
+    watch_jitter: float
+    watch_backoff_base: float
+    watch_backoff_max: float
 
     @classmethod
     def from_env(cls) -> "ParserConfig":
         """Собирает конфиг из переменных окружения и дефолтов."""
         exchangerate_api_key = os.getenv("EXCHANGERATE_API_KEY")
 
-        # Наборы валют для отслеживания
-        fiat = ("EUR", "GBP", "RUB")
-        crypto = ("BTC", "ETH", "SOL")
+        sources = os.getenv("RATE_SOURCES", "coingecko,exchangerate")
+        # Адреса API можно подменить (например, на fake_upstream для бенчмарков)
+        coingecko_api = os.getenv(
+            "COINGECKO_API_URL", "https://api.coingecko.com/api/v3"
+        ).rstrip("/")
+        fixtures = os.getenv("HTTP_FIXTURES", "").strip().lower() or None
+        if fixtures not in (None, "record", "replay"):
+            raise ValueError("HTTP_FIXTURES: ожидается record или replay")
 
-        crypto_id_map = {"BTC": "bitcoin", "ETH": "ethereum", "SOL": "solana"}
+        # Наборы валют для отслеживания
+        currencies = load_currencies(
+            Path(os.getenv("CURRENCIES_FILE") or DEFAULT_CURRENCIES_FILE)
+        )
 
         return cls(
             exchangerate_api_key=exchangerate_api_key,
-            coingecko_url="https://api.coingecko.com/api/v3/simple/price",
-            exchangerate_url="https://v6.exchangerate-api.com/v6",
-            base_fiat_currency="USD",
-            fiat_currencies=fiat,
-            crypto_currencies=crypto,
-            crypto_id_map=crypto_id_map,
+            coingecko_url=f"{coingecko_api}/simple/price",
+            coingecko_markets_url=f"{coingecko_api}/coins/markets",
+            exchangerate_url=os.getenv(
+                "EXCHANGERATE_URL", "https://v6.exchangerate-api.com/v6"
+            ).rstrip("/"),
+            coingecko_max_url=int(os.getenv("COINGECKO_MAX_URL", "2000")),
+            base_fiat_currency=currencies["base"],
+            fiat_currencies=currencies["fiat"],
+            crypto_currencies=tuple(currencies["crypto"]),
+            crypto_id_map=currencies["crypto"],
+            crypto_top=currencies["crypto_top"],
             rates_file=data_file("rates.json"),
-            history_file=data_file("exchange_rates.json"),
+            history_file=data_file("exchange_rates.ndjson"),
+            fetch_cache_file=data_file("parser_fetch_cache.json"),
             request_timeout=int(os.getenv("REQUEST_TIMEOUT", "10")),
+            update_deadline=float(os.getenv("UPDATE_DEADLINE", "15")),
+            http_pool_size=int(os.getenv("HTTP_POOL_SIZE", "10")),
+            http_retries=int(os.getenv("HTTP_RETRIES", "2")),
+            http_backoff=float(os.getenv("HTTP_BACKOFF", "0.5")),
+            conditional_fetch=os.getenv("CONDITIONAL_FETCH", "1") != "0",
+            hedge_percentile=float(os.getenv("HEDGE_PERCENTILE", "0")),
+            hedge_min_delay=float(os.getenv("HEDGE_MIN_DELAY", "0.05")),
+            hedge_budget=float(os.getenv("HEDGE_BUDGET", "0.1")),
+            hedge_mirrors=dict(
+                item.split("=", 1)
+                for item in os.getenv("HEDGE_MIRRORS", "").split(",")
+                if "=" in item
+            ),
+            hedge_pool_size=int(os.getenv("HEDGE_POOL_SIZE", "4")),
+            http_fixtures=fixtures,
+            http_fixtures_dir=Path(
+                os.getenv("HTTP_FIXTURES_DIR") or data_file("http_fixtures")
+            ),
+            rate_quotas={
+                source: Quota.parse(os.getenv(env, default))
+                for source, (env, default) in DEFAULT_QUOTAS.items()
+            },
+            rate_limit_file=data_file("rate_limits.json"),
+            rate_limit_max_wait=float(os.getenv("RATE_LIMIT_MAX_WAIT", "2")),
+            rate_sources=tuple(
+                item.strip() for item in sources.split(",") if item.strip()
+            ),
+            source_health_file=data_file("source_health.json"),
+            breaker_threshold=int(os.getenv("BREAKER_THRESHOLD", "3")),
+            breaker_cooldown=float(os.getenv("BREAKER_COOLDOWN", "60")),
+            breaker_cooldown_max=float(os.getenv("BREAKER_COOLDOWN_MAX", "3600")),
+            health_slow_ms=float(os.getenv("HEALTH_SLOW_MS", "2000")),
+            poll_intervals={
+                source: float(os.getenv(env, default))
+                for source, (env, default) in DEFAULT_POLL_INTERVALS.items()
+            },
+            watch_jitter=float(os.getenv("WATCH_JITTER", "0.1")),
+            watch_backoff_base=float(os.getenv("WATCH_BACKOFF_BASE", "10")),
+            watch_backoff_max=float(os.getenv("WATCH_BACKOFF_MAX", "900")),
+        )
+
+    def crypto_pairs(self) -> frozenset[str]:
+        # Пары криптовалют к USD, для которых известен id CoinGecko.
+        # С crypto_top состав зависит от рейтинга - пустое множество (неизвестно).
+        if self.crypto_top:
+            return frozenset()
+        return frozenset(
+            f"{c}_USD" for c in self.crypto_currencies if c in self.crypto_id_map
+        )
+
+    def fiat_pairs(self) -> frozenset[str]:
+        if self.fiat_currencies is None:
+            return frozenset()
+        return frozenset(f"{c}_USD" for c in self.fiat_currencies)
+
+
+def load_currencies(path: Path) -> dict[str, Any]:
+    # Файл валют: base, fiat ("all" или список кодов), crypto {код: id CoinGecko},
+    # crypto_top (0 - только явно перечисленные монеты)
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except OSError as e:
+        raise ValueError(f"Не удалось прочитать файл валют: {path}") from e
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Файл валют повреждён: {path}") from e
+
+    fiat = raw.get("fiat", "all")
+    crypto = raw.get("crypto") or {}
+    if not (fiat == "all" or isinstance(fiat, list)) or not isinstance(crypto, dict):
+        raise ValueError(
+            f'Файл валют {path}: ожидается fiat - "all" или список, '
+            "crypto - словарь {код: id}"
         )
+    try:
+        top = int(raw.get("crypto_top", 0))
+    except (TypeError, ValueError):
+        raise ValueError(f"Файл валют {path}: crypto_top должно быть числом") from None
+    return {
+        "base": str(raw.get("base", "USD")).upper(),
+        "fiat": None if fiat == "all" else tuple(str(c).upper() for c in fiat),
+        "crypto": {str(k).upper(): str(v) for k, v in crypto.items()},
+        "crypto_top": max(0, top),
+    }
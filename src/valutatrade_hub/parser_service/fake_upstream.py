@@ -0,0 +1,250 @@
+# Локальный HTTP-сервер, имитирующий CoinGecko (simple/price, coins/markets)
+# и ExchangeRate-API (latest) с настраиваемыми задержкой, ошибками и
+# сериями 429 - для бенчмарков и нагрузочных тестов без сети и квот.
+#
+#     PYTHONPATH=src python -m valutatrade_hub.parser_service.fake_upstream \
+#         --port 8900 --latency 0.05 --jitter 0.05 --error-rate 0.01
+#
+#     COINGECKO_API_URL=http://127.0.0.1:8900/api/v3 \
+#     EXCHANGERATE_URL=http://127.0.0.1:8900/v6 EXCHANGERATE_API_KEY=fake \
+#     poetry run project update-rates
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+# Часть кодов - настоящие, остальные достраиваются до нужного числа валют
+_REAL_FIAT = (
+    "EUR GBP JPY CNY RUB CHF CAD AUD NZD SEK NOK DKK PLN CZK HUF TRY INR BRL "
+    "MXN ZAR KRW SGD HKD ILS AED SAR THB IDR MYR PHP"
+).split()
+
+
+@dataclass
+class UpstreamBehavior:
+    latency: float = 0.0  # базовая задержка ответа, с
+    jitter: float = 0.0  # + случайная добавка от 0 до jitter, с
+    stall_rate: float = 0.0  # доля запросов, которые "зависают"...
+    stall: float = 0.0  # ...на stall секунд сверх обычной задержки
+    error_rate: float = 0.0  # доля ответов 500
+    burst_every: int = 0  # в каждом окне из burst_every запросов...
+    burst_len: int = 0  # ...последние burst_len получают 429
+    retry_after: int = 1  # Retry-After в ответах 429, с
+    coins: int = 5000  # размер рынка для coins/markets
+    fiat: int = 160  # число валют в ответе ExchangeRate-API
+    seed: int | None = None
+
+
+def _price(name: str) -> float:
+    # Детерминированная цена по имени: одинакова между запусками
+    h = int(hashlib.sha1(name.encode("utf-8")).hexdigest()[:8], 16)
+    return round(0.01 + (h % 10_000_000) / 100, 2)
+
+
+def _fiat_codes(n: int) -> list[str]:
+    codes = list(_REAL_FIAT[:n])
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    i = 0
+    while len(codes) < n:
+        codes.append("Q" + letters[i // 26 % 26] + letters[i % 26])
+        i += 1
+    return codes
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive: клиенты с пулом соединений переиспользуют их
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def do_GET(self) -> None:
+        self.server.upstream.handle(self)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    upstream: "FakeUpstream"
+
+
+class FakeUpstream:
+    def __init__(
+        self,
+        behavior: UpstreamBehavior | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.behavior = behavior or UpstreamBehavior()
+        self._rng = random.Random(self.behavior.seed)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.upstream = self
+        self._thread: threading.Thread | None = None
+        self._fiat = _fiat_codes(self.behavior.fiat)
+        self.stats: dict[str, int] = {"requests": 0}
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def coingecko_api_url(self) -> str:
+        return f"{self.url}/api/v3"
+
+    @property
+    def exchangerate_url(self) -> str:
+        return f"{self.url}/v6"
+
+    def start(self) -> "FakeUpstream":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-upstream", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeUpstream":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    # обработка запроса
+
+    def _decide(self) -> tuple[int | None, float]:
+        # Статус-ошибка (или None) и задержка ответа для очередного запроса
+        b = self.behavior
+        with self._lock:
+            self.stats["requests"] += 1
+            n = self.stats["requests"]
+            delay = b.latency + (self._rng.uniform(0, b.jitter) if b.jitter else 0.0)
+            if b.stall_rate and self._rng.random() < b.stall_rate:
+                delay += b.stall
+            if b.burst_every and (n - 1) % b.burst_every >= b.burst_every - b.burst_len:
+                return 429, delay
+            if b.error_rate and self._rng.random() < b.error_rate:
+                return 500, delay
+            return None, delay
+
+    def _count(self, status: int) -> None:
+        with self._lock:
+            self.stats[str(status)] = self.stats.get(str(status), 0) + 1
+
+    def handle(self, handler: BaseHTTPRequestHandler) -> None:
+        status, delay = self._decide()
+        if delay > 0:
+            time.sleep(delay)
+
+        parts = urlsplit(handler.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        headers: dict[str, str] = {}
+        if status == 429:
+            body: Any = {"status": {"error_code": 429, "error_message": "rate limit"}}
+            headers["Retry-After"] = str(self.behavior.retry_after)
+        elif status == 500:
+            body = {"error": "internal error"}
+        else:
+            status, body = self._route(parts.path, query)
+
+        self._count(status)
+        payload = json.dumps(body).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def _route(self, path: str, query: dict[str, str]) -> tuple[int, Any]:
+        if path == "/api/v3/simple/price":
+            ids = [i for i in query.get("ids", "").split(",") if i]
+            return 200, {i: {"usd": _price(i)} for i in ids}
+
+        if path == "/api/v3/coins/markets":
+            page = max(1, int(query.get("page", 1)))
+            per_page = max(1, min(250, int(query.get("per_page", 100))))
+            start = (page - 1) * per_page
+            stop = min(start + per_page, self.behavior.coins)
+            return 200, [
+                {
+                    "id": f"coin-{i}",
+                    "symbol": f"c{i}",
+                    "current_price": _price(f"coin-{i}"),
+                    "market_cap_rank": i + 1,
+                }
+                for i in range(start, stop)
+            ]
+
+        segments = path.strip("/").split("/")
+        # /v6/<key>/latest/<base>
+        if len(segments) == 4 and segments[0] == "v6" and segments[2] == "latest":
+            base = segments[3].upper()
+            now = int(time.time())
+            rates = {base: 1.0}
+            rates.update({c: _price(c) / 1000 for c in self._fiat if c != base})
+            return 200, {
+                "result": "success",
+                "base_code": base,
+                "time_last_update_unix": now,
+                # следующее обновление "уже наступило": каждый запрос идёт в сеть
+                "time_next_update_unix": now,
+                "rates": rates,
+            }
+
+        return 404, {"error": "not found"}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Имитация CoinGecko и ExchangeRate-API")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--latency", type=float, default=0.0)
+    ap.add_argument("--jitter", type=float, default=0.0)
+    ap.add_argument("--stall-rate", type=float, default=0.0)
+    ap.add_argument("--stall", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--burst-every", type=int, default=0)
+    ap.add_argument("--burst-len", type=int, default=0)
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--seed", type=int)
+    args = ap.parse_args()
+
+    behavior = UpstreamBehavior(
+        latency=args.latency,
+        jitter=args.jitter,
+        stall_rate=args.stall_rate,
+        stall=args.stall,
+        error_rate=args.error_rate,
+        burst_every=args.burst_every,
+        burst_len=args.burst_len,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    upstream = FakeUpstream(behavior, args.host, args.port)
+    print(f"fake upstream: {upstream.url}")
+    try:
+        upstream.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
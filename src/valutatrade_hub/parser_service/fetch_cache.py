@@ -0,0 +1,101 @@
+# Кэш ответов источников с валидаторами (next_update, ETag, Last-Modified)
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any
+
+from valutatrade_hub.parser_service.storage import atomic_write_json, read_json_safe
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+_caches: dict[Path, "FetchCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def request_key(source: str, url: str, params: dict[str, Any] | None = None) -> str:
+    # Ключ записи: источник + хэш URL и параметров (в URL может быть API-ключ)
+    raw = url + "?" + "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+    return f"{source}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]}"
+
+
+def parse_http_date(value: Any) -> datetime | None:
+    # RFC 2822 ("Fri, 27 Mar 2020 00:00:00 +0000") -> datetime UTC
+    if not value:
+        return None
+    try:
+        dt = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        return None
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+def next_update_from_headers(headers: Any, now: datetime) -> datetime | None:
+    # Срок свежести по Cache-Control: max-age или Expires
+    m = _MAX_AGE_RE.search(headers.get("Cache-Control", "") or "")
+    if m:
+        return now + timedelta(seconds=int(m.group(1)))
+    return parse_http_date(headers.get("Expires"))
+
+
+class FetchCache:
+    # Записи хранятся в памяти и сохраняются в файл при изменении,
+    # поэтому переживают как перезапуск процесса, так и тики --watch
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, Any]] | None = None
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if self._entries is None:
+            try:
+                data = read_json_safe(self.path, default={})
+            except ValueError:
+                data = {}
+            self._entries = data if isinstance(data, dict) else {}
+        return self._entries
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            return self._load().get(key)
+
+    def fresh(self, key: str, now: datetime) -> dict[str, Any] | None:
+        # Запись, по которой новых данных у источника ещё быть не может
+        entry = self.get(key)
+        if not entry or not entry.get("next_update"):
+            return None
+        try:
+            next_update = datetime.fromisoformat(entry["next_update"])
+        except ValueError:
+            return None
+        return entry if now < next_update else None
+
+    def validator_headers(self, key: str) -> dict[str, str]:
+        entry = self.get(key) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, key: str, entry: dict[str, Any]) -> None:
+        with self._lock:
+            entries = self._load()
+            entries[key] = entry
+            atomic_write_json(self.path, entries)
+
+
+def get_fetch_cache(path: Path) -> FetchCache:
+    # Один объект кэша на файл в пределах процесса
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = FetchCache(path)
+        return cache
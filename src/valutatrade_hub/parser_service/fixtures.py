@@ -0,0 +1,100 @@
+# Запись и воспроизведение HTTP-ответов источников (HTTP_FIXTURES).
+# record: запросы идут в сеть, ответы сохраняются в файлы;
+# replay: ответы берутся только из файлов, сеть не используется.
+# Подменяется сессия клиентов, поэтому разбор ответов, кэш, лимиты и
+# обработка ошибок в BaseApiClient работают как с настоящим API.
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Iterable
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from valutatrade_hub.parser_service.storage import atomic_write_json
+
+FIXTURE_MODES = ("record", "replay")
+
+# Заголовки, которые не относятся к уже распакованному телу ответа
+_SKIP_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def fixture_key(url: str) -> str:
+    # Имя файла записи - хэш полного URL с параметрами, API-ключ в url уже
+    # заменён на *** (записи воспроизводятся и с другим ключом)
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+class FixtureSession(requests.Session):
+    def __init__(
+        self,
+        mode: str,
+        directory: Path,
+        inner: requests.Session | None = None,
+        secrets: Iterable[str | None] = (),
+    ) -> None:
+        super().__init__()
+        if mode not in FIXTURE_MODES:
+            raise ValueError(f"Неизвестный режим записи '{mode}'")
+        if mode == "record" and inner is None:
+            raise ValueError("Для записи нужна сессия, которая ходит в сеть")
+        self.mode = mode
+        self.directory = directory
+        self.inner = inner
+        self._secrets = [s for s in secrets if s]
+
+    def _redact(self, url: str) -> str:
+        for secret in self._secrets:
+            url = url.replace(secret, "***")
+        return url
+
+    def path_for(self, url: str, params: dict[str, Any] | None = None) -> Path:
+        full = requests.Request("GET", url, params=params).prepare().url or url
+        return self.directory / f"{fixture_key(self._redact(full))}.json"
+
+    def get(self, url: str, params: Any = None, **kwargs: Any) -> requests.Response:
+        path = self.path_for(url, params)
+        if self.mode == "replay":
+            try:
+                record = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                # для клиента это сетевая ошибка, как при недоступном API
+                raise requests.exceptions.ConnectionError(
+                    f"нет записи ответа для {self._redact(url)} ({path.name})"
+                ) from None
+            return _to_response(record)
+
+        resp = self.inner.get(url, params=params, **kwargs)
+        # 304 не содержит тела - оставляем предыдущую полную запись
+        if resp.status_code != 304:
+            atomic_write_json(path, _to_record(resp, self._redact(resp.url or url)))
+        return resp
+
+    def close(self) -> None:
+        if self.inner is not None:
+            self.inner.close()
+        super().close()
+
+
+def _to_record(resp: requests.Response, url: str) -> dict[str, Any]:
+    return {
+        "url": url,
+        "status": resp.status_code,
+        "headers": {
+            k: v for k, v in resp.headers.items() if k.lower() not in _SKIP_HEADERS
+        },
+        "body": resp.content.decode("utf-8", errors="replace"),
+    }
+
+
+def _to_response(record: dict[str, Any]) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = int(record["status"])
+    resp.headers = CaseInsensitiveDict(record.get("headers") or {})
+    resp._content = str(record.get("body", "")).encode("utf-8")
+    resp.encoding = "utf-8"
+    resp.url = record.get("url", "")
+    return resp
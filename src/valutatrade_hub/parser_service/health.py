@@ -0,0 +1,276 @@
+# Здоровье источников: circuit breaker (closed/open/half_open) и скользящие
+# оценки задержки и доли успешных ответов. Состояние хранится в файле и
+# переживает запуски update-rates. Там же - статистика для rates-health:
+# последние задержки и исходы запросов, последняя ошибка и последний успех.
+# Ответы из кэша условных запросов учитываются отдельно (cached): в окно
+# исходов и долю успеха они не входят, иначе кэш скрывал бы сбои источника.
+
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+from typing import Any, ContextManager
+
+from valutatrade_hub.parser_service.storage import locked_json_state
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Вес нового замера в скользящих средних
+EWMA_ALPHA = 0.3
+# Нижняя граница доли успеха при ранжировании (не делим на ноль)
+MIN_SUCCESS_RATE = 0.05
+# Сколько последних запросов источника хранится для перцентилей и доли успеха
+STATS_WINDOW = 100
+
+_registries: dict[Path, "SourceHealth"] = {}
+_registries_lock = threading.Lock()
+
+
+class SourceHealth:
+    # threshold ошибок подряд размыкают цепь на cooldown секунд; каждое
+    # следующее размыкание без успеха между ними - на вдвое больший срок
+    # (не больше cooldown_max). После паузы пропускается один пробный запрос.
+
+    def __init__(
+        self,
+        path: Path,
+        threshold: int = 3,
+        cooldown: float = 60.0,
+        cooldown_max: float = 3600.0,
+    ) -> None:
+        self.path = path
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.cooldown_max = cooldown_max
+
+    def _state(self) -> ContextManager[dict[str, Any]]:
+        return locked_json_state(self.path)
+
+    @staticmethod
+    def _entry(state: dict[str, Any], source: str) -> dict[str, Any]:
+        return state.setdefault(
+            source,
+            {
+                "state": CLOSED,
+                "failures": 0,
+                "trips": 0,
+                "open_until": 0.0,
+                "probe_at": 0.0,
+                "latency_ms": None,
+                "success_rate": None,
+            },
+        )
+
+    def allow(self, source: str, now: float | None = None) -> bool:
+        # Можно ли сейчас опрашивать источник
+        now = time.time() if now is None else now
+        with self._state() as state:
+            e = self._entry(state, source)
+            if e["state"] == CLOSED:
+                return True
+            if e["state"] == OPEN and now < e["open_until"]:
+                return False
+            if e["state"] == HALF_OPEN and now < e["probe_at"] + self.cooldown:
+                # пробный запрос уже выполняется (или его процесс упал -
+                # тогда после cooldown пробуем снова)
+                return False
+            e["state"] = HALF_OPEN
+            e["probe_at"] = now
+            return True
+
+    def _observe(self, e: dict[str, Any], ok: bool, latency_ms: float | None) -> None:
+        outcomes = e.setdefault("outcomes", [])
+        outcomes.append(1 if ok else 0)
+        del outcomes[:-STATS_WINDOW]
+        if latency_ms is not None:
+            window = e.setdefault("latencies_ms", [])
+            window.append(round(latency_ms, 1))
+            del window[:-STATS_WINDOW]
+
+        sample = 1.0 if ok else 0.0
+        rate = e["success_rate"]
+        e["success_rate"] = (
+            sample if rate is None else rate + EWMA_ALPHA * (sample - rate)
+        )
+        if latency_ms is not None:
+            lat = e["latency_ms"]
+            e["latency_ms"] = (
+                latency_ms if lat is None else lat + EWMA_ALPHA * (latency_ms - lat)
+            )
+
+    def record_success(
+        self,
+        source: str,
+        latency_ms: float | None = None,
+        pairs: int | None = None,
+        status_code: int | None = None,
+        now: float | None = None,
+    ) -> None:
+        now = time.time() if now is None else now
+        with self._state() as state:
+            e = self._entry(state, source)
+            self._observe(e, True, latency_ms)
+            e.update(state=CLOSED, failures=0, trips=0, open_until=0.0)
+            e["last_success_at"] = now
+            if pairs is not None:
+                e["pairs"] = pairs
+            if status_code is not None:
+                e["last_status_code"] = status_code
+
+    def record_cached(
+        self,
+        source: str,
+        revalidated: bool = False,
+        pairs: int | None = None,
+        now: float | None = None,
+    ) -> None:
+        # Ответ из кэша условных запросов. revalidated - источник ответил
+        # 304 Not Modified: он жив, цепь замыкается. Без запроса в сеть
+        # (данные ещё свежие) о здоровье ничего не известно - только
+        # освобождается место пробного запроса полуоткрытой цепи
+        now = time.time() if now is None else now
+        with self._state() as state:
+            e = self._entry(state, source)
+            e["cached"] = e.get("cached", 0) + 1
+            e["last_cached_at"] = now
+            if revalidated:
+                e.update(state=CLOSED, failures=0, trips=0, open_until=0.0)
+            elif e["state"] == HALF_OPEN:
+                e["probe_at"] = 0.0
+            if pairs is not None:
+                e["pairs"] = pairs
+
+    def record_failure(
+        self,
+        source: str,
+        latency_ms: float | None = None,
+        now: float | None = None,
+        error: str | None = None,
+    ) -> None:
+        now = time.time() if now is None else now
+        with self._state() as state:
+            e = self._entry(state, source)
+            self._observe(e, False, latency_ms)
+            if error is not None:
+                e["last_error"] = {"at": now, "message": error}
+            e["failures"] += 1
+            # неудачная проба размыкает цепь сразу
+            if e["state"] == HALF_OPEN or e["failures"] >= self.threshold:
+                e["trips"] += 1
+                e["state"] = OPEN
+                e["open_until"] = now + min(
+                    self.cooldown_max, self.cooldown * 2 ** (e["trips"] - 1)
+                )
+
+    def score(self, source: str) -> float:
+        return _score(self.stats().get(source))
+
+    def rank(self, sources: list[str]) -> list[str]:
+        # Источники с разомкнутой цепью - в конец, остальные - быстрые и
+        # надёжные первыми (сортировка устойчивая: при равных оценках
+        # сохраняется исходный порядок)
+        stats = self.stats()
+
+        def key(name: str) -> tuple[bool, float]:
+            e = stats.get(name)
+            return (bool(e) and e["state"] == OPEN, _score(e))
+
+        return sorted(sources, key=key)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        with self._state() as state:
+            return {source: dict(e) for source, e in state.items()}
+
+
+def _score(e: dict[str, Any] | None) -> float:
+    # Ожидаемая цена ответа: задержка / доля успеха (меньше - лучше).
+    # Источник без замеров получает 0, чтобы его попробовали первым.
+    if not e or e.get("latency_ms") is None:
+        return 0.0
+    return e["latency_ms"] / max(e.get("success_rate") or 0.0, MIN_SUCCESS_RATE)
+
+
+def percentile(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def health_report(
+    stats: dict[str, dict[str, Any]],
+    intervals: dict[str, float],
+    slow_ms: float,
+    now: float | None = None,
+) -> list[dict[str, Any]]:
+    """Сводка по источникам для rates-health (без обращения к сети).
+
+    status: ok; slow - p90 задержки выше slow_ms; failing - цепь разомкнута
+    или меньше 80% успешных запросов в окне; stale - последний успех (или
+    ответ из кэша условных запросов) раньше, чем два интервала опроса
+    источника назад.
+    """
+    now = time.time() if now is None else now
+    rows = []
+    for source, e in sorted(stats.items()):
+        latencies = e.get("latencies_ms") or []
+        outcomes = e.get("outcomes") or []
+        success = sum(outcomes) / len(outcomes) if outcomes else None
+        last_success = e.get("last_success_at")
+        # данные из кэша условных запросов актуальны так же, как ответ
+        last_data = max(last_success or 0, e.get("last_cached_at") or 0)
+        age = now - last_data if last_data else None
+        p90 = percentile(latencies, 0.9)
+
+        problems = []
+        if e.get("state") == OPEN and now < e.get("open_until", 0):
+            problems.append("failing")
+        elif success is not None and success < 0.8:
+            problems.append("failing")
+        interval = intervals.get(source)
+        if interval and (age is None or age > 2 * interval):
+            problems.append("stale")
+        if p90 is not None and p90 > slow_ms:
+            problems.append("slow")
+
+        last_error = e.get("last_error") or {}
+        rows.append(
+            {
+                "source": source,
+                "status": ",".join(problems) or "ok",
+                "breaker": e.get("state", CLOSED),
+                "p50_ms": percentile(latencies, 0.5),
+                "p90_ms": p90,
+                "p99_ms": percentile(latencies, 0.99),
+                "success_rate": None if success is None else round(success, 3),
+                "requests": len(outcomes),
+                "cached": e.get("cached", 0),
+                "last_success_at": last_success,
+                "last_success_age_s": None if age is None else round(age),
+                "pairs": e.get("pairs"),
+                "last_status_code": e.get("last_status_code"),
+                "last_error": last_error.get("message"),
+                "last_error_at": last_error.get("at"),
+            }
+        )
+    return rows
+
+
+def get_source_health(
+    path: Path, threshold: int, cooldown: float, cooldown_max: float
+) -> SourceHealth:
+    # Один объект на файл состояния в пределах процесса
+    with _registries_lock:
+        health = _registries.get(path)
+        if health is None:
+            health = _registries[path] = SourceHealth(
+                path, threshold, cooldown, cooldown_max
+            )
+        else:
+            health.threshold = threshold
+            health.cooldown = cooldown
+            health.cooldown_max = cooldown_max
+        return health
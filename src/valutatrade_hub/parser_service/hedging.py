@@ -0,0 +1,133 @@
+# Хеджирование запросов: если ответ не пришёл за заданный перцентиль
+# недавних задержек источника, отправляется второй такой же запрос (тот же
+# хост или зеркало), побеждает первый ответ. Бюджет ограничивает долю
+# дополнительных запросов.
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+
+# Меньше замеров - перцентиль ненадёжен, запрос не хеджируется
+HEDGE_MIN_SAMPLES = 20
+# Сколько последних задержек источника учитывается
+HEDGE_WINDOW = 200
+
+_policy: "HedgePolicy | None" = None
+# Пулы потоков: "request" - основные запросы, которые могут быть
+# захеджированы; "hedge" - вторые запросы (свои слоты, не ждут страниц CoinGecko)
+_executors: dict[str, ThreadPoolExecutor] = {}
+_lock = threading.Lock()
+
+
+class HedgePolicy:
+    def __init__(self, percentile: float, min_delay: float, budget: float) -> None:
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._latencies: dict[str, deque[float]] = {}
+        self._requests: dict[str, int] = {}
+        self._hedges: dict[str, int] = {}
+        self._seeded: set[str] = set()
+
+    def seed(self, source: str, load: Callable[[], Iterable[float]]) -> None:
+        # Один раз на источник: окно дополняется сохранёнными задержками
+        # (source_health.json), чтобы хеджировать с первого запроса процесса,
+        # а не после HEDGE_MIN_SAMPLES своих замеров
+        with self._lock:
+            if source in self._seeded:
+                return
+            self._seeded.add(source)
+        saved = list(load())[-HEDGE_WINDOW:]
+        if not saved:
+            return
+        with self._lock:
+            own = self._latencies.get(source) or ()
+            self._latencies[source] = deque([*saved, *own], maxlen=HEDGE_WINDOW)
+
+    def record(self, source: str, seconds: float) -> None:
+        with self._lock:
+            window = self._latencies.get(source)
+            if window is None:
+                window = self._latencies[source] = deque(maxlen=HEDGE_WINDOW)
+            window.append(seconds)
+
+    def delay(self, source: str) -> float | None:
+        # Через сколько секунд отправлять второй запрос (None - не хеджировать)
+        with self._lock:
+            self._requests[source] = self._requests.get(source, 0) + 1
+            window = self._latencies.get(source)
+            if not window or len(window) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(window)
+        idx = min(len(ordered) - 1, int(len(ordered) * self.percentile))
+        return max(self.min_delay, ordered[idx])
+
+    def try_spend(self, source: str) -> bool:
+        # Не больше budget дополнительных запросов на один обычный
+        with self._lock:
+            hedges = self._hedges.get(source, 0)
+            if hedges + 1 > self.budget * self._requests.get(source, 0):
+                return False
+            self._hedges[source] = hedges + 1
+            return True
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {
+                source: {
+                    "requests": n,
+                    "hedges": self._hedges.get(source, 0),
+                    "samples": len(self._latencies.get(source) or ()),
+                }
+                for source, n in self._requests.items()
+            }
+
+
+def get_hedge_policy(
+    percentile: float, min_delay: float, budget: float
+) -> HedgePolicy | None:
+    # Одна политика на процесс (окна задержек общие для всех клиентов);
+    # percentile <= 0 - хеджирование выключено
+    global _policy
+    if percentile <= 0:
+        return None
+    with _lock:
+        if _policy is None:
+            _policy = HedgePolicy(percentile, min_delay, budget)
+        else:
+            _policy.percentile = percentile
+            _policy.min_delay = min_delay
+            _policy.budget = budget
+        return _policy
+
+
+def _executor(kind: str, workers: int) -> ThreadPoolExecutor:
+    with _lock:
+        pool = _executors.get(kind)
+        if pool is None:
+            pool = _executors[kind] = ThreadPoolExecutor(
+                max_workers=max(1, workers), thread_name_prefix=kind
+            )
+        return pool
+
+
+def request_executor(workers: int) -> ThreadPoolExecutor:
+    # Потоки для основных запросов, которые могут быть захеджированы
+    return _executor("request", workers)
+
+
+def hedge_executor(workers: int) -> ThreadPoolExecutor:
+    # Потоки для вторых запросов
+    return _executor("hedge", workers)
+
+
+def mirror_url(url: str, mirrors: dict[str, str]) -> str:
+    # Адрес для второго запроса: зеркало по префиксу или тот же URL
+    for prefix, mirror in mirrors.items():
+        if url.startswith(prefix):
+            return mirror + url[len(prefix) :]
+    return url
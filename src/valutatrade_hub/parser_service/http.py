@@ -0,0 +1,85 @@
+# Общая HTTP-сессия для API-клиентов: пул соединений, keep-alive, повторы
+
+from __future__ import annotations
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+from valutatrade_hub.parser_service.config import ParserConfig
+
+# Повторяем только идемпотентные запросы и только временные ошибки сервера.
+# 429 сюда не входит: лимиты обрабатываются отдельно.
+RETRY_STATUSES = (500, 502, 503, 504)
+
+_shared: requests.Session | None = None
+_shared_lock = threading.Lock()
+
+
+def build_session(
+    pool_size: int = 10,
+    retries: int = 2,
+    backoff: float = 0.5,
+    jitter: float = 0.25,
+) -> requests.Session:
+    # Сессия с пулом соединений и экспоненциальной задержкой между повторами:
+    # backoff * 2^(n-1) + случайная добавка до jitter секунд
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        backoff_jitter=jitter,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # сжатие ответа (requests распакует его сам)
+    session.headers["Accept-Encoding"] = DEFAULT_ACCEPT_ENCODING
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+def get_shared_session(config: ParserConfig) -> requests.Session:
+    # Одна сессия на процесс: повторные обновления (в т.ч. в режиме --watch)
+    # используют уже открытые соединения
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            # вторым (хеджирующим) запросам - свои соединения сверх пула
+            hedges = config.hedge_pool_size if config.hedge_percentile > 0 else 0
+            _shared = build_session(
+                pool_size=config.http_pool_size + hedges,
+                retries=config.http_retries,
+                backoff=config.http_backoff,
+            )
+            if config.http_fixtures:
+                from valutatrade_hub.parser_service.fixtures import FixtureSession
+
+                _shared = FixtureSession(
+                    config.http_fixtures,
+                    config.http_fixtures_dir,
+                    inner=_shared if config.http_fixtures == "record" else None,
+                    secrets=[config.exchangerate_api_key],
+                )
+        return _shared
+
+
+def close_shared_session() -> None:
+    global _shared
+    with _shared_lock:
+        if _shared is not None:
+            _shared.close()
+            _shared = None
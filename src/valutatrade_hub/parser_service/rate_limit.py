@@ -0,0 +1,172 @@
+# Ограничение частоты запросов к источникам: token bucket на источник,
+# состояние в файле (общее для всех процессов), учёт 429 и Retry-After
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, ContextManager
+
+from valutatrade_hub.parser_service.fetch_cache import parse_http_date
+from valutatrade_hub.parser_service.storage import locked_json_state
+
+# Адаптивная пауза после 429 без Retry-After: BASE * 2^(n-1), не больше MAX
+THROTTLE_BACKOFF_BASE = 5.0
+THROTTLE_BACKOFF_MAX = 900.0
+
+_limiters: dict[Path, "RateLimiter"] = {}
+_limiters_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Quota:
+    # requests запросов за period секунд (ёмкость ведра = requests)
+    requests: float
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.requests / self.period
+
+    @classmethod
+    def parse(cls, value: str) -> "Quota":
+        # "30/60" -> 30 запросов в минуту
+        try:
+            n, sec = value.split("/", 1)
+            quota = cls(float(n), float(sec))
+        except ValueError:
+            raise ValueError(
+                f"Некорректная квота '{value}', ожидается N/SECONDS"
+            ) from None
+        if quota.requests <= 0 or quota.period <= 0:
+            raise ValueError(f"Некорректная квота '{value}'")
+        return quota
+
+
+def parse_retry_after(value: Any, now: float | None = None) -> float | None:
+    # Retry-After: число секунд или HTTP-дата
+    if value in (None, ""):
+        return None
+    now = time.time() if now is None else now
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    dt = parse_http_date(value)
+    if dt is None:
+        return None
+    return max(0.0, dt.timestamp() - now)
+
+
+class RateLimiter:
+    # Состояние по источнику: токены, время пополнения, блокировка до
+    # (после 429), серия 429 подряд и счётчики served/throttled/deferred
+
+    def __init__(self, path: Path, quotas: dict[str, Quota]) -> None:
+        self.path = path
+        self.quotas = quotas
+
+    def _state(self) -> ContextManager[dict[str, Any]]:
+        return locked_json_state(self.path)
+
+    def _entry(self, state: dict[str, Any], source: str, now: float) -> dict:
+        quota = self.quotas.get(source)
+        e = state.setdefault(
+            source,
+            {
+                "tokens": quota.requests if quota else 0.0,
+                "updated": now,
+                "blocked_until": 0.0,
+                "streak": 0,
+                "served": 0,
+                "throttled": 0,
+                "deferred": 0,
+            },
+        )
+        if quota is not None:
+            elapsed = max(0.0, now - e["updated"])
+            e["tokens"] = min(quota.requests, e["tokens"] + elapsed * quota.rate)
+        e["updated"] = now
+        return e
+
+    def acquire(self, source: str, now: float | None = None) -> float:
+        # Берёт токен: 0.0 - можно отправлять, иначе - сколько секунд ждать.
+        # Ожидание ещё не отказ: отложенным запрос отмечает defer()
+        now = time.time() if now is None else now
+        with self._state() as state:
+            e = self._entry(state, source, now)
+            quota = self.quotas.get(source)
+            wait = max(0.0, e["blocked_until"] - now)
+            if wait == 0.0 and quota is not None and e["tokens"] < 1.0:
+                wait = (1.0 - e["tokens"]) / quota.rate
+            if wait > 0.0:
+                return wait
+            if quota is not None:
+                e["tokens"] -= 1.0
+            e["served"] += 1
+            return 0.0
+
+    def defer(self, source: str, now: float | None = None) -> None:
+        # Запрос не отправлен из-за лимита (один раз на запрос)
+        now = time.time() if now is None else now
+        with self._state() as state:
+            self._entry(state, source, now)["deferred"] += 1
+
+    def on_throttled(
+        self, source: str, retry_after: float | None, now: float | None = None
+    ) -> float:
+        # 429: сжигаем токены и блокируем источник на Retry-After,
+        # а без него - на экспоненциально растущую паузу
+        now = time.time() if now is None else now
+        with self._state() as state:
+            e = self._entry(state, source, now)
+            e["throttled"] += 1
+            e["streak"] += 1
+            e["tokens"] = 0.0
+            if retry_after is None:
+                retry_after = min(
+                    THROTTLE_BACKOFF_MAX,
+                    THROTTLE_BACKOFF_BASE * 2 ** (e["streak"] - 1),
+                )
+            e["blocked_until"] = max(e["blocked_until"], now + retry_after)
+            return retry_after
+
+    def on_success(self, source: str) -> None:
+        with self._state() as state:
+            e = state.get(source)
+            if e and e["streak"]:
+                e["streak"] = 0
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        with self._state() as state:
+            out = {}
+            for source, e in state.items():
+                blocked = e.get("blocked_until", 0.0)
+                out[source] = {
+                    "served": e.get("served", 0),
+                    "throttled": e.get("throttled", 0),
+                    "deferred": e.get("deferred", 0),
+                    "tokens": round(e.get("tokens", 0.0), 2),
+                    "blocked_until": (
+                        datetime.fromtimestamp(blocked, tz=timezone.utc)
+                        .replace(microsecond=0)
+                        .isoformat()
+                        if blocked > time.time()
+                        else None
+                    ),
+                }
+            return out
+
+
+def get_rate_limiter(path: Path, quotas: dict[str, Quota]) -> RateLimiter:
+    # Один объект на файл состояния в пределах процесса
+    with _limiters_lock:
+        limiter = _limiters.get(path)
+        if limiter is None:
+            limiter = _limiters[path] = RateLimiter(path, quotas)
+        else:
+            limiter.quotas = quotas
+        return limiter
@@ -0,0 +1,142 @@
+# Реестр источников курсов. Источник описан строкой "модуль:Класс" и
+# импортируется только тогда, когда выбран. Источники берутся из встроенного
+# списка, из entry points группы valutatrade_hub.rate_sources и из
+# RATE_SOURCES (элементы вида name=модуль:Класс).
+
+from __future__ import annotations
+
+import importlib
+import logging
+from dataclasses import dataclass
+from importlib.metadata import entry_points
+from typing import TYPE_CHECKING, Callable, Iterable
+
+from valutatrade_hub.parser_service.config import ParserConfig
+
+if TYPE_CHECKING:
+    import requests
+
+    from valutatrade_hub.parser_service.api_clients import BaseApiClient
+
+logger = logging.getLogger("parser_service")
+
+ENTRY_POINT_GROUP = "valutatrade_hub.rate_sources"
+
+
+@dataclass(frozen=True)
+class SourceSpec:
+    name: str
+    target: str
+    # Пары источника без импорта его модуля (None или пустое множество -
+    # неизвестны до загрузки)
+    provides: Callable[[ParserConfig], frozenset[str]] | None = None
+
+    def load(self) -> type[BaseApiClient]:
+        module_name, _, attr = self.target.partition(":")
+        if not attr:
+            raise ValueError(
+                f"Источник '{self.name}': ожидается модуль:Класс, "
+                f"получено '{self.target}'"
+            )
+        try:
+            module = importlib.import_module(module_name)
+            return getattr(module, attr)
+        except (ImportError, AttributeError) as e:
+            raise ValueError(
+                f"Источник '{self.name}': не удалось загрузить {self.target}: {e}"
+            ) from e
+
+
+BUILTIN_SOURCES = (
+    SourceSpec(
+        "coingecko",
+        "valutatrade_hub.parser_service.api_clients:CoinGeckoClient",
+        ParserConfig.crypto_pairs,
+    ),
+    SourceSpec(
+        "exchangerate",
+        "valutatrade_hub.parser_service.api_clients:ExchangeRateApiClient",
+        ParserConfig.fiat_pairs,
+    ),
+)
+
+
+class SourceRegistry:
+    def __init__(
+        self, specs: Iterable[SourceSpec] = (), enabled: Iterable[str] = ()
+    ) -> None:
+        self._specs: dict[str, SourceSpec] = {}
+        for spec in specs:
+            self.register(spec)
+        # Источники, которые опрашиваются при --source all
+        self.enabled = tuple(enabled) or tuple(self._specs)
+
+    @classmethod
+    def from_config(cls, config: ParserConfig) -> "SourceRegistry":
+        registry = cls(BUILTIN_SOURCES)
+        for ep in entry_points(group=ENTRY_POINT_GROUP):
+            name = ep.name.strip().lower()
+            if name in registry._specs:
+                logger.warning("Источник '%s' из entry points уже есть, пропуск", name)
+                continue
+            registry.register(SourceSpec(name, ep.value))
+
+        enabled = []
+        for item in config.rate_sources:
+            name, sep, target = item.partition("=")
+            name = name.strip().lower()
+            if sep:
+                registry.register(SourceSpec(name, target.strip()))
+            enabled.append(name)
+        for name in enabled:
+            registry.get(name)
+        registry.enabled = tuple(enabled) or tuple(registry._specs)
+        return registry
+
+    def register(self, spec: SourceSpec) -> None:
+        self._specs[spec.name] = spec
+
+    def names(self) -> list[str]:
+        return list(self._specs)
+
+    def get(self, name: str) -> SourceSpec:
+        spec = self._specs.get(name.strip().lower())
+        if spec is None:
+            raise ValueError(
+                f"Неизвестный источник '{name}'. Доступны: {', '.join(self._specs)}"
+            )
+        return spec
+
+    def resolve(self, selection: str | None = None) -> list[SourceSpec]:
+        # "all"/None - включённые источники, иначе имя или список через запятую
+        if not selection or selection.strip().lower() == "all":
+            return [self.get(name) for name in self.enabled]
+        specs = []
+        for name in selection.split(","):
+            if name.strip():
+                spec = self.get(name)
+                if spec not in specs:
+                    specs.append(spec)
+        if not specs:
+            raise ValueError("Не указан ни один источник.")
+        return specs
+
+    def build(
+        self,
+        config: ParserConfig,
+        selection: str | None = None,
+        pairs: Iterable[str] | None = None,
+        session: requests.Session | None = None,
+    ) -> list[BaseApiClient]:
+        # Клиенты выбранных источников. Если заданы нужные пары, источники,
+        # заведомо их не дающие, пропускаются без импорта.
+        wanted = frozenset(pairs) if pairs else None
+        clients = []
+        for spec in self.resolve(selection):
+            declared = spec.provides(config) if spec.provides else None
+            if wanted is not None and declared and not declared & wanted:
+                continue
+            client = spec.load()(config, session=session)
+            client.source_key = spec.name
+            clients.append(client)
+        return clients
@@ -0,0 +1,155 @@
+# Планировщик режима update-rates --watch: один процесс опрашивает источники
+# по их интервалам, сохраняя между тиками пул соединений, снимок кэша
+# и открытую историю (см. RatesUpdater)
+
+from __future__ import annotations
+
+import logging
+import random
+import signal
+import threading
+from time import monotonic
+from typing import Any, Callable
+
+from valutatrade_hub.parser_service.api_clients import BaseApiClient
+from valutatrade_hub.parser_service.updater import RatesUpdater
+
+logger = logging.getLogger("parser_service")
+
+# Интервал для источника без настройки в poll_intervals, секунды
+DEFAULT_POLL_INTERVAL = 300.0
+
+
+class _Schedule:
+    # Срок следующего опроса источника и серия ошибок подряд
+    __slots__ = ("client", "interval", "due", "failures")
+
+    def __init__(self, client: BaseApiClient, interval: float, due: float) -> None:
+        self.client = client
+        self.interval = interval
+        self.due = due
+        self.failures = 0
+
+
+class WatchLoop:
+    def __init__(
+        self,
+        updater: RatesUpdater,
+        clients: list[BaseApiClient] | None = None,
+        clock: Callable[[], float] = monotonic,
+        rng: random.Random | None = None,
+    ) -> None:
+        cfg = updater.config
+        self.updater = updater
+        self.jitter = cfg.watch_jitter
+        self.backoff_base = cfg.watch_backoff_base
+        self.backoff_max = cfg.watch_backoff_max
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._stop = threading.Event()
+        self.ticks = 0
+
+        now = clock()
+        self.schedules = [
+            _Schedule(
+                client,
+                cfg.poll_intervals.get(client.source_name, DEFAULT_POLL_INTERVAL),
+                now,
+            )
+            for client in (updater.clients if clients is None else clients)
+        ]
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def stop(self, *_: Any) -> None:
+        # Текущий тик доводится до конца, следующий не начинается
+        self._stop.set()
+
+    def install_signal_handlers(self) -> None:
+        # SIGTERM/SIGINT -> мягкая остановка (только из главного потока)
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._on_signal)
+
+    def _on_signal(self, signum: int, _frame: Any) -> None:
+        logger.info("Получен сигнал %s: остановка после текущего тика", signum)
+        self.stop()
+
+    def _jittered(self, delay: float) -> float:
+        # Разброс ±jitter, чтобы источники и процессы не синхронизировались
+        return delay * (1.0 + self._rng.uniform(-self.jitter, self.jitter))
+
+    def tick(self) -> dict[str, Any] | None:
+        # Опрашивает источники, чей срок подошёл; None - опрашивать некого
+        now = self._clock()
+        due = [s for s in self.schedules if s.due <= now]
+        if not due:
+            return None
+
+        # Дрейф - насколько тик опоздал относительно плана
+        drift = now - min(s.due for s in due)
+        try:
+            summary = self.updater.run_update(clients=[s.client for s in due])
+        except Exception:
+            logger.exception("Тик --watch: ошибка обновления")
+            summary = {"sources": {}, "errors": ["run_update"]}
+        finished = self._clock()
+        self.ticks += 1
+
+        for s in due:
+            status = summary["sources"].get(s.client.source_name) or {}
+            if status.get("ok"):
+                s.failures = 0
+                # От планового срока, а не от факта: задержки не копятся.
+                # Если отстали больше чем на интервал - пропущенное не догоняем.
+                s.due += self._jittered(s.interval)
+                if s.due <= finished:
+                    s.due = finished + self._jittered(s.interval)
+            else:
+                s.failures += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (s.failures - 1))
+                s.due = finished + self._jittered(delay)
+                logger.warning(
+                    "Источник '%s': ошибка #%s подряд, повтор через %.1f с",
+                    s.client.source_name,
+                    s.failures,
+                    s.due - finished,
+                )
+
+        logger.info(
+            "Тик #%s: источники=%s, длительность=%d мс, дрейф=%d мс, "
+            "следующий через %.1f с",
+            self.ticks,
+            ",".join(s.client.source_name for s in due),
+            (finished - now) * 1000,
+            drift * 1000,
+            max(0.0, self.next_due() - finished),
+        )
+        return summary
+
+    def next_due(self) -> float:
+        return min(s.due for s in self.schedules)
+
+    def run(self, max_ticks: int | None = None) -> int:
+        # Цикл до stop()/сигнала (или max_ticks тиков); возвращает число тиков
+        logger.info(
+            "Режим --watch: %s",
+            ", ".join(
+                f"{s.client.source_name} каждые {s.interval:g} с"
+                for s in self.schedules
+            ),
+        )
+        while self.schedules and not self.stopped:
+            wait = self.next_due() - self._clock()
+            if wait > 0:
+                # Event.wait прерывается по stop(), сон не задерживает выход
+                self._stop.wait(wait)
+                continue
+            self.tick()
+            if max_ticks is not None and self.ticks >= max_ticks:
+                break
+        logger.info("Режим --watch остановлен, тиков: %s", self.ticks)
+        return self.ticks
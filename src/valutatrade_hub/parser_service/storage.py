@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import json
+import os
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
+
+from valutatrade_hub.core.utils import file_lock, write_json_file
 
 
 def now_utc_iso() -> str:
@@ -25,12 +29,25 @@ def read_json_safe(path: Path, default: Any) -> Any:
 
 
 def atomic_write_json(path: Path, obj: Any) -> None:
-    #  пишем во временный файл и переименовываем
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
-    tmp.replace(path)
+    # tmp + replace (общая запись файлов данных из core/utils.py)
+    write_json_file(path, obj)
+
+
+@contextmanager
+def locked_json_state(path: Path) -> Iterator[dict[str, Any]]:
+    # Чтение-изменение-запись JSON-состояния под блокировкой файла между
+    # процессами и потоками (file_lock): состояние общее для update-rates,
+    # --watch и т.д.
+    with file_lock(path):
+        try:
+            raw = path.read_text(encoding="utf-8")
+            state = json.loads(raw)
+        except (OSError, ValueError):
+            raw, state = "", {}
+        yield state
+        # файл переписываем только при изменениях
+        if json.dumps(state, ensure_ascii=False, indent=2) != raw:
+            write_json_file(path, state)
 
 
 def load_rates_cache(path: Path) -> dict[str, Any]:
@@ -43,20 +60,85 @@ def save_rates_cache(path: Path, cache_obj: dict[str, Any]) -> None:
     atomic_write_json(path, cache_obj)
 
 
+# rates.json -> (версия файла, {источник: его пары})
+_source_pairs: dict[Path, tuple[tuple[int, int, int], dict[str, frozenset[str]]]] = {}
+
+
+def cached_source_pairs(path: Path) -> dict[str, frozenset[str]]:
+    # Пары из rates.json по источнику, который дал их последним. Файл
+    # перечитывается, только если изменился (update-rates пишет его раз за запуск)
+    try:
+        st = path.stat()
+    except OSError:
+        return {}
+    stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+    cached = _source_pairs.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    try:
+        pairs = load_rates_cache(path).get("pairs")
+    except (ValueError, AttributeError):
+        pairs = None
+    by_source: dict[str, set[str]] = {}
+    for pair, value in (pairs if isinstance(pairs, dict) else {}).items():
+        if isinstance(value, dict) and value.get("source"):
+            by_source.setdefault(value["source"], set()).add(pair)
+    result = {source: frozenset(p) for source, p in by_source.items()}
+    _source_pairs[path] = (stamp, result)
+    return result
+
+
 def load_history(path: Path) -> list[dict[str, Any]]:
-    # Загрузка истории exchange_rates.json
-    return read_json_safe(path, default=[])
+    # Загрузка истории exchange_rates.ndjson (запись на строку); файл в
+    # прежнем формате JSON-массива тоже читается
+    if not path.exists():
+        return []
+    try:
+        text = path.read_text(encoding="utf-8")
+    except OSError as e:
+        raise ValueError(f"Не удалось прочитать файл данных: {path}") from e
+    if text.lstrip().startswith("["):
+        return read_json_safe(path, default=[])
+    items = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except json.JSONDecodeError:
+            # строка, оборванная при сбое записи, - пропускаем
+            continue
+    return items
 
 
 def append_history(path: Path, records: list[dict[str, Any]]) -> None:
-    # Добавляет записи в историю
+    # Дописывает записи в конец файла одним write под flock: файл не
+    # перечитывается и не переписывается, записи других процессов сохраняются
     if not records:
         return
-    items = load_history(path)
-    if not isinstance(items, list):
-        items = []
-    items.extend(records)
-    atomic_write_json(path, items)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = "".join(
+        json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in records
+    ).encode("utf-8")
+    with file_lock(path):
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view) :]
+        finally:
+            os.close(fd)
+
+
+class HistoryWriter:
+    # История для updater (в т.ч. режима --watch): записи каждого тика
+    # дописываются в конец файла, в памяти ничего не накапливается
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def append(self, records: list[dict[str, Any]]) -> None:
+        append_history(self.path, records)
 
 
 def make_history_record(
@@ -1,17 +1,25 @@
 from __future__ import annotations
 
 import logging
+import queue
+import threading
 from datetime import datetime, timezone
-from typing import Any
+from time import monotonic
+from typing import Any, Callable, Iterable, Iterator
 
+from valutatrade_hub.infra.metrics import counter, histogram
+from valutatrade_hub.infra.profiling import span
 from valutatrade_hub.parser_service.api_clients import (
     ApiRequestError,
     BaseApiClient,
     FetchResult,
+    RateLimitDeferred,
 )
 from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.health import SourceHealth, get_source_health
 from valutatrade_hub.parser_service.storage import (
-    append_history,
+    HistoryWriter,
+    load_rates_cache,
     make_history_record,
     now_utc_iso,
     save_rates_cache,
@@ -25,76 +33,369 @@ def _utc_now() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
 
+def fetch_concurrently(
+    clients: list[BaseApiClient | SourceChain], deadline: float
+) -> Iterator[tuple[Any, FetchResult | None, str | None]]:
+    # Опрашивает источники параллельно и отдаёт результаты по мере прихода.
+    # Потоки-демоны: не успевший к сроку запрос не держит ни обновление,
+    # ни завершение процесса (его ответ просто отбрасывается).
+    done: queue.Queue = queue.Queue()
+
+    def worker(client: BaseApiClient | SourceChain) -> None:
+        try:
+            with span(f"fetch_rates[{client.source_name}]"):
+                result = client.fetch_rates()
+            done.put((client, result, None))
+        except ApiRequestError as e:
+            done.put((client, None, f"ошибка запроса: {e}"))
+        except Exception as e:
+            done.put((client, None, f"непредвиденная ошибка: {e!r}"))
+
+    for client in clients:
+        threading.Thread(
+            target=worker,
+            args=(client,),
+            name=f"fetch-{client.source_name}",
+            daemon=True,
+        ).start()
+
+    pending = list(clients)
+    end = monotonic() + deadline
+    while pending:
+        remaining = end - monotonic()
+        if remaining <= 0:
+            break
+        try:
+            client, result, error = done.get(timeout=remaining)
+        except queue.Empty:
+            break
+        pending.remove(client)
+        yield client, result, error
+
+    for client in pending:
+        yield client, None, f"не ответил за {deadline:g} с (общий срок обновления)"
+
+
+FETCH_SECONDS = histogram(
+    "updater_fetch_seconds",
+    "Задержка ответа источника курсов (без ответов из кэша), с",
+    ("source",),
+)
+FETCH_TOTAL = counter(
+    "updater_fetch_total",
+    "Запросы к источникам курсов по результату (ok, cached, error, deferred, "
+    "skipped - цепь разомкнута)",
+    ("source", "result"),
+)
+
+
+class SourceChain:
+    # Группа источников с пересекающимися парами: опрашиваются по очереди,
+    # от лучшего по оценке здоровья к худшему, пока не получены все пары
+    # группы (после первого успеха - только источники с недостающими парами).
+    # Источник с разомкнутой цепью пропускается без запроса в сеть.
+
+    def __init__(self, clients: list[BaseApiClient], health: SourceHealth) -> None:
+        by_name = {c.source_name: c for c in clients}
+        self.clients = [by_name[name] for name in health.rank(list(by_name))]
+        self.health = health
+        # Итог по каждому источнику группы (для отчёта и планировщика)
+        self.attempts: dict[str, dict[str, Any]] = {}
+        # Успешные ответы последнего fetch_rates: первый - лучший источник,
+        # следующие - только пары, которых у предыдущих не было
+        self.results: list[FetchResult] = []
+
+    @property
+    def source_name(self) -> str:
+        return "/".join(c.source_name for c in self.clients)
+
+    def fetch_rates(self) -> FetchResult:
+        errors: list[Exception] = []
+        self.results = []
+        got: set[str] = set()
+        universe = set().union(*(c.provided_pairs() for c in self.clients))
+        for client in self.clients:
+            name = client.source_name
+            # после успешного ответа запасные опрашиваются только ради пар,
+            # которых ещё нет (группа сливает источники с частичным
+            # пересечением: A={BTC,ETH}, B={BTC,SOL} - SOL есть только у B)
+            if self.results and not client.provided_pairs() & (universe - got):
+                continue
+            if not self.health.allow(name):
+                logger.info("Источник '%s': цепь разомкнута, пропуск", name)
+                self.attempts[name] = {"ok": False, "error": "цепь разомкнута"}
+                errors.append(ApiRequestError(f"{name}: цепь разомкнута (пропуск)"))
+                FETCH_TOTAL.labels(source=name, result="skipped").inc()
+                continue
+
+            t0 = monotonic()
+            try:
+                result = client.fetch_rates()
+            except RateLimitDeferred as e:
+                # отложенный запрос ничего не говорит о здоровье источника
+                self.attempts[name] = {"ok": False, "error": str(e)}
+                errors.append(e)
+                FETCH_TOTAL.labels(source=name, result="deferred").inc()
+                continue
+            except Exception as e:
+                self.health.record_failure(
+                    name, (monotonic() - t0) * 1000, error=str(e)
+                )
+                FETCH_TOTAL.labels(source=name, result="error").inc()
+                self.attempts[name] = {"ok": False, "error": str(e)}
+                errors.append(e)
+                if len(self.clients) > 1:
+                    logger.warning("Источник '%s': %s, пробуем запасной", name, e)
+                continue
+
+            # ответ из кэша не отражает ни задержку, ни надёжность источника
+            cached = result.meta.get("cached")
+            pairs = len(result.pairs_usd_per_unit)
+            if cached:
+                self.health.record_cached(
+                    name, revalidated=cached == "not_modified", pairs=pairs
+                )
+                FETCH_TOTAL.labels(source=name, result="cached").inc()
+            else:
+                latency = result.meta.get("request_ms", (monotonic() - t0) * 1000)
+                self.health.record_success(
+                    name,
+                    latency,
+                    pairs=pairs,
+                    status_code=result.meta.get("status_code"),
+                )
+                FETCH_TOTAL.labels(source=name, result="ok").inc()
+                FETCH_SECONDS.labels(source=name).observe(latency / 1000)
+            if self.results:
+                result = FetchResult(
+                    {
+                        pair: rate
+                        for pair, rate in result.pairs_usd_per_unit.items()
+                        if pair not in got
+                    },
+                    result.source,
+                    result.meta,
+                )
+            self.attempts[name] = {"ok": True, "pairs": len(result.pairs_usd_per_unit)}
+            if not self.results:
+                winner = name
+            self.results.append(result)
+            got.update(result.pairs_usd_per_unit)
+            if not universe - got:
+                break
+
+        if self.results:
+            for other in self.clients:
+                self.attempts.setdefault(
+                    other.source_name, {"ok": True, "pairs": 0, "covered_by": winner}
+                )
+            return self.results[0]
+
+        if len(errors) == 1:
+            raise errors[0]
+        raise ApiRequestError("; ".join(str(e) for e in errors))
+
+
+def group_by_pairs(clients: list[BaseApiClient]) -> list[list[BaseApiClient]]:
+    # Разбивает источники на группы взаимозаменяемых (с общими парами).
+    # Группы не пересекаются по парам, поэтому новый источник сливает
+    # все группы, с которыми у него есть общие пары.
+    groups: list[tuple[set[str], list[BaseApiClient]]] = []
+    for client in clients:
+        pairs = set(client.provided_pairs())
+        members = [client]
+        rest = []
+        for g_pairs, g_clients in groups:
+            if pairs & g_pairs:
+                pairs |= g_pairs
+                members = g_clients + members
+            else:
+                rest.append((g_pairs, g_clients))
+        groups = rest + [(pairs, members)]
+    return [members for _, members in groups]
+
+
+def _wanted(
+    client: BaseApiClient, source: str | None, pairs: Iterable[str] | None
+) -> bool:
+    if source and source.strip().lower() != "all":
+        names = {name.strip().lower() for name in source.split(",")}
+        if not names & {client.source_key, client.source_name.lower()}:
+            return False
+    if pairs:
+        provided = client.provided_pairs()
+        if provided and not provided & set(pairs):
+            return False
+    return True
+
+
 class RatesUpdater:
     # Координатор обновления курсов: опрос источников + запись кэша и истории
 
-    def __init__(self, config: ParserConfig, clients: list[BaseApiClient]) -> None:
+    def __init__(
+        self,
+        config: ParserConfig,
+        clients: list[BaseApiClient],
+        on_update: list[Callable[[dict[str, float]], Any]] | None = None,
+    ) -> None:
         self.config = config
         self.clients = clients
+        # Обработчики новых курсов {пара: курс}, вызываются после записи кэша
+        self.on_update = list(on_update or [])
+        # Тёплое состояние между запусками run_update (режим --watch):
+        # снимок кэша в памяти (пары и last_refresh) и история
+        self._snapshot: dict[str, dict[str, Any]] | None = None
+        self._last_refresh: str | None = None
+        self.history = HistoryWriter(config.history_file)
+        self.health = get_source_health(
+            config.source_health_file,
+            config.breaker_threshold,
+            config.breaker_cooldown,
+            config.breaker_cooldown_max,
+        )
 
-    def run_update(self, source: str | None = None) -> dict[str, Any]:
-        # Обновляет кэш rates.json и пишет историю в exchange_rates.json
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        # Пары из rates.json (читается один раз, дальше - из памяти)
+        if self._snapshot is None:
+            try:
+                data = load_rates_cache(self.config.rates_file)
+            except ValueError:
+                data = {}
+            if not isinstance(data, dict):
+                data = {}
+            pairs = data.get("pairs")
+            self._snapshot = dict(pairs) if isinstance(pairs, dict) else {}
+            self._last_refresh = data.get("last_refresh")
+        return self._snapshot
+
+    def run_update(
+        self,
+        source: str | None = None,
+        clients: list[BaseApiClient] | None = None,
+        pairs: Iterable[str] | None = None,
+    ) -> dict[str, Any]:
+        # Обновляет кэш rates.json и пишет историю в exchange_rates.ndjson.
+        # source - имя источника или список через запятую; pairs - нужные
+        # пары (источники, которые их не дают, не опрашиваются);
+        # clients - явный набор источников (планировщик --watch опрашивает
+        # только те, чей срок подошёл); пары остальных берутся из снимка.
 
         started_at = _utc_now()
+        t0 = monotonic()
         logger.info("Старт обновления курсов...")
 
         combined_pairs: dict[str, dict[str, Any]] = {}
         history_records: list[dict[str, Any]] = []
         errors: list[str] = []
+        sources: dict[str, dict[str, Any]] = {}
+        succeeded = False
 
-        for client in self.clients:
-            if source:
-                s = source.strip().lower()
-                if s == "coingecko" and client.source_name != "CoinGecko":
-                    continue
-                if s == "exchangerate" and client.source_name != "ExchangeRate-API":
-                    continue
+        selected = [
+            client
+            for client in (self.clients if clients is None else clients)
+            if _wanted(client, source, pairs)
+        ]
 
-            try:
-                result: FetchResult = client.fetch_rates()
-                logger.info(
-                    "Источник '%s': получено курсов: %s",
-                    result.source,
-                    len(result.pairs_usd_per_unit),
+        # Группы источников опрашиваются параллельно: время обновления -
+        # максимум задержек, а не их сумма. Внутри группы - по очереди.
+        chains = [SourceChain(g, self.health) for g in group_by_pairs(selected)]
+        deadline = self.config.update_deadline
+        for chain, result, error in fetch_concurrently(chains, deadline):
+            for client in chain.clients:
+                sources[client.source_name] = chain.attempts.get(
+                    client.source_name, {"ok": False, "error": str(error)}
                 )
-            except ApiRequestError as e:
-                msg = f"Источник '{client.source_name}': ошибка запроса: {e}"
+            if result is None:
+                msg = f"Источник '{chain.source_name}': {error}"
                 logger.error(msg)
                 errors.append(msg)
                 continue
 
-            updated_at = now_utc_iso()
-            for pair, rate in result.pairs_usd_per_unit.items():
-                # В кэше храним последнее значение по паре
-                combined_pairs[pair] = {
-                    "rate": float(rate),
-                    "updated_at": updated_at,
-                    "source": result.source,
-                }
-
-                # В историю пишем все полученные значения
-                from_ccy, to_ccy = pair.split("_", 1)
-                history_records.append(
-                    make_history_record(
-                        from_currency=from_ccy,
-                        to_currency=to_ccy,
-                        rate=float(rate),
-                        source=result.source,
-                        meta=result.meta,
-                        timestamp=updated_at,
-                    )
+            succeeded = True
+            # ответ лучшего источника и недостающие пары от запасных
+            for part in chain.results:
+                cached = part.meta.get("cached")
+                logger.info(
+                    "Источник '%s': получено курсов: %s%s",
+                    part.source,
+                    len(part.pairs_usd_per_unit),
+                    f" (из кэша: {cached})" if cached else "",
                 )
 
-        last_refresh = now_utc_iso()
-        cache_obj = {"pairs": combined_pairs, "last_refresh": last_refresh}
+                # Ответ из кэша - это те же данные: время берём исходное,
+                # в историю повторно не пишем
+                updated_at = part.meta.get("fetched_at") if cached else None
+                updated_at = updated_at or now_utc_iso()
+                for pair, rate in part.pairs_usd_per_unit.items():
+                    # В кэше храним последнее значение по паре
+                    combined_pairs[pair] = {
+                        "rate": float(rate),
+                        "updated_at": updated_at,
+                        "source": part.source,
+                    }
 
-        # Даже если один источник упал — сохраним то, что собрали
-        save_rates_cache(self.config.rates_file, cache_obj)
-        append_history(self.config.history_file, history_records)
+                    # В историю пишем все полученные значения
+                    if cached:
+                        continue
+                    from_ccy, to_ccy = pair.split("_", 1)
+                    history_records.append(
+                        make_history_record(
+                            from_currency=from_ccy,
+                            to_currency=to_ccy,
+                            rate=float(rate),
+                            source=part.source,
+                            meta=part.meta,
+                            timestamp=updated_at,
+                        )
+                    )
 
-        logger.info(
-            "Кэш записан: %s пар(ы) -> %s", len(combined_pairs), self.config.rates_file
-        )
+        # Счётчики лимитов запросов по опрошенным источникам
+        limits: dict[str, Any] = {}
+        if selected:
+            all_limits = selected[0].rate_limiter.stats()
+            for client in selected:
+                counters = all_limits.get(client.source_name)
+                if counters:
+                    limits[client.source_name] = counters
+                    logger.info(
+                        "Лимиты '%s': served=%s throttled=%s deferred=%s",
+                        client.source_name,
+                        counters["served"],
+                        counters["throttled"],
+                        counters["deferred"],
+                    )
+
+        # Новые значения поверх снимка: пары упавших или не опрошенных
+        # источников остаются со своим прежним updated_at
+        snapshot = self.snapshot()
+        if succeeded:
+            snapshot.update(combined_pairs)
+            self._last_refresh = now_utc_iso()
+            cache_obj = {"pairs": snapshot, "last_refresh": self._last_refresh}
+
+            # Даже если один источник упал — сохраним то, что собрали
+            save_rates_cache(self.config.rates_file, cache_obj)
+            self.history.append(history_records)
+
+            logger.info(
+                "Кэш записан: %s пар(ы) -> %s", len(snapshot), self.config.rates_file
+            )
+        else:
+            # Ни один источник не ответил: last_refresh не сдвигаем, иначе
+            # устаревшие курсы выглядели бы свежими (ensure_rates_fresh и др.)
+            logger.warning("Ни один источник не ответил: кэш курсов не изменён")
+        last_refresh = self._last_refresh
+
+        hook_results: list[Any] = []
+        if combined_pairs and self.on_update:
+            rates = {pair: v["rate"] for pair, v in combined_pairs.items()}
+            for hook in self.on_update:
+                try:
+                    hook_results.append(hook(rates))
+                except Exception as e:
+                    msg = f"Обработчик курсов {hook.__name__}: ошибка: {e}"
+                    logger.exception(msg)
+                    errors.append(msg)
         if errors:
             logger.info("Обновление завершено с ошибками: %s", len(errors))
         else:
@@ -106,4 +407,8 @@ class RatesUpdater:
             "updated_pairs": len(combined_pairs),
             "history_records": len(history_records),
             "errors": errors,
+            "sources": sources,
+            "duration_ms": int((monotonic() - t0) * 1000),
+            "rate_limits": limits,
+            "on_update": hook_results,
         }
@@ -0,0 +1,76 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from valutatrade_hub.infra import logging_config
+from valutatrade_hub.infra.decorators import annotate_action, log_action
+from valutatrade_hub.infra.logging_config import (
+    setup_actions_logging,
+    shutdown_actions_logging,
+)
+
+
+@log_action("buy")
+def fake_buy(currency_code: str, amount: float) -> float:
+    annotate_action(user_id=7, currency=currency_code.upper())
+    if amount <= 0:
+        raise ValueError("amount")
+    return amount
+
+
+class TestActionLogging(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "actions.log"
+
+    def tearDown(self) -> None:
+        shutdown_actions_logging()
+        self.tmp.cleanup()
+
+    def records(self) -> list[dict]:
+        return [json.loads(x) for x in self.path.read_text("utf-8").splitlines()]
+
+    def test_json_records_with_fields(self) -> None:
+        setup_actions_logging(self.path, queue_size=100, policy="block")
+        fake_buy("btc", amount=0.5)
+        with self.assertRaises(ValueError):
+            fake_buy("eur", -1)
+        self.assertEqual(shutdown_actions_logging(), 0)
+
+        start, ok, _, error = self.records()
+        self.assertEqual(start["message"], "START buy")
+        self.assertEqual(start["currency"], "btc")
+        self.assertEqual(ok["status"], "ok")
+        self.assertEqual(ok["user_id"], 7)
+        self.assertEqual(ok["currency"], "BTC")
+        self.assertEqual(ok["amount"], 0.5)
+        self.assertGreaterEqual(ok["duration_ms"], 0)
+        self.assertEqual(error["level"], "ERROR")
+        self.assertEqual(error["amount"], -1)
+        self.assertIn("ValueError: amount", error["error"])
+
+    def test_drop_policy_when_queue_full(self) -> None:
+        setup_actions_logging(self.path, queue_size=1, policy="drop")
+        # файловый хендлер занят: слушатель не разбирает очередь
+        file_handler = logging_config._listener.handlers[0]
+        file_handler.acquire()
+        try:
+            for _ in range(50):
+                fake_buy("btc", 1)
+        finally:
+            file_handler.release()
+        dropped = shutdown_actions_logging()
+
+        self.assertGreater(dropped, 0)
+        records = self.records()
+        self.assertEqual(len(records), 100 - dropped + 1)
+        self.assertIn(str(dropped), records[-1]["message"])
+
+    def test_bad_policy(self) -> None:
+        with self.assertRaises(ValueError):
+            setup_actions_logging(self.path, policy="wait")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+# Тяжёлые зависимости, которые нужны только update-rates и табличному выводу
+HEAVY = (
+    "requests",
+    "prettytable",
+    "valutatrade_hub.parser_service",
+    "logging",
+    "logging.handlers",
+    "concurrent.futures.process",
+)
+
+
+def loaded_after(code: str) -> list[str]:
+    # Какие из HEAVY импортированы в чистом интерпретаторе после code
+    script = (
+        f"import json, sys\n{code}\n"
+        f"print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    )
+    env = {**os.environ, "PYTHONPATH": str(SRC)}
+    out = subprocess.run(
+        [sys.executable, "-c", script],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+class TestLazyCli(unittest.TestCase):
+    def test_light_commands_skip_heavy_imports(self) -> None:
+        code = (
+            "from valutatrade_hub.cli.interface import run_cli\n"
+            "import valutatrade_hub.core.usecases\n"
+            "run_cli(['get-rate', 'USD', 'USD'])"
+        )
+        self.assertEqual(loaded_after(code), [])
+
+    def test_update_rates_imports_parser_service(self) -> None:
+        code = "from valutatrade_hub import build_updater\nbuild_updater()"
+        loaded = loaded_after(code)
+        self.assertIn("requests", loaded)
+        self.assertIn("valutatrade_hub.parser_service", loaded)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import json
+import os
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from valutatrade_hub.parser_service.api_clients import (
+    CoinGeckoClient,
+    ExchangeRateApiClient,
+    chunk_ids,
+)
+from valutatrade_hub.parser_service.config import (
+    DEFAULT_CURRENCIES_FILE,
+    FULL_CURRENCIES_FILE,
+    ParserConfig,
+    load_currencies,
+)
+
+
+def _resp(payload, status: int = 200) -> MagicMock:
+    resp = MagicMock(status_code=status, headers={})
+    resp.json.return_value = payload
+    return resp
+
+
+def _markets(page: int, per_page: int = 250) -> list[dict]:
+    start = (page - 1) * per_page
+    return [
+        {"symbol": f"c{i}", "current_price": float(i + 1)}
+        for i in range(start, start + per_page)
+    ]
+
+
+class TestCurrencyUniverse(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cfg = replace(
+            ParserConfig.from_env(),
+            exchangerate_api_key="test",
+            fetch_cache_file=Path(self.tmp.name) / "fetch_cache.json",
+            rate_limit_file=Path(self.tmp.name) / "rate_limits.json",
+            conditional_fetch=False,
+        )
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_chunk_ids_fit_budget(self) -> None:
+        ids = [f"coin-{i:04d}" for i in range(1000)]
+        chunks = list(chunk_ids(ids, 200))
+        self.assertEqual([i for c in chunks for i in c], ids)
+        for chunk in chunks:
+            self.assertLessEqual(len("%2C".join(chunk)), 200)
+
+    def test_coingecko_pages_and_chunks(self) -> None:
+        cfg = replace(
+            self.cfg,
+            crypto_top=600,
+            crypto_currencies=("BTC", "C0"),
+            crypto_id_map={"BTC": "bitcoin", "C0": "c-zero"},
+            coingecko_max_url=len(self.cfg.coingecko_url) + 30,
+        )
+
+        def get(url, params=None, **kwargs):
+            if url == cfg.coingecko_markets_url:
+                return _resp(_markets(params["page"]))
+            return _resp({i: {"usd": 7.0} for i in params["ids"].split(",")})
+
+        session = MagicMock()
+        session.get.side_effect = get
+        result = CoinGeckoClient(cfg, session=session).fetch_rates()
+
+        # 3 страницы рейтинга + 2 части simple/price
+        self.assertEqual(session.get.call_count, 5)
+        self.assertEqual(result.meta["parts"], 5)
+        pairs = result.pairs_usd_per_unit
+        # рейтинг обрезан до 600 монет, явная монета перекрывает тикер C0
+        self.assertIn("C599_USD", pairs)
+        self.assertNotIn("C600_USD", pairs)
+        self.assertEqual(pairs["C0_USD"], 7.0)
+        self.assertEqual(pairs["BTC_USD"], 7.0)
+
+    def test_partial_failure_keeps_other_parts(self) -> None:
+        cfg = replace(self.cfg, crypto_top=500, crypto_id_map={}, crypto_currencies=())
+
+        def get(url, params=None, **kwargs):
+            if params["page"] == 2:
+                return _resp(None, status=500)
+            return _resp(_markets(params["page"]))
+
+        session = MagicMock()
+        session.get.side_effect = get
+        result = CoinGeckoClient(cfg, session=session).fetch_rates()
+        self.assertEqual(len(result.pairs_usd_per_unit), 250)
+        self.assertEqual(len(result.meta["errors"]), 1)
+
+    def test_markets_symbol_collision(self) -> None:
+        # два "btc": берётся монета с большей капитализацией
+        data = [
+            {"symbol": "btc", "current_price": 60000.0, "market_cap": 1e12},
+            {"symbol": "eth", "current_price": 3000.0, "market_cap": 4e11},
+            {"symbol": "btc", "current_price": 0.01, "market_cap": 5e5},
+            {"symbol": "eth", "current_price": 9.0, "market_cap": None},
+            {"symbol": "sol", "current_price": 0.5, "market_cap": 1e3},
+            {"symbol": "sol", "current_price": 150.0, "market_cap": 7e10},
+        ]
+        out = CoinGeckoClient._parse_markets(data)
+        self.assertEqual(out, {"BTC_USD": 60000.0, "ETH_USD": 3000.0, "SOL_USD": 150.0})
+
+    def test_default_universe_is_small(self) -> None:
+        # по умолчанию - несколько пар с известным составом (--pairs работает
+        # сразу); полный набор - отдельным файлом
+        small = load_currencies(DEFAULT_CURRENCIES_FILE)
+        self.assertEqual(small["crypto_top"], 0)
+        self.assertIsInstance(small["fiat"], tuple)
+        self.assertLessEqual(len(small["fiat"]) + len(small["crypto"]), 10)
+
+        full = load_currencies(FULL_CURRENCIES_FILE)
+        self.assertIsNone(full["fiat"])
+        self.assertGreater(full["crypto_top"], 0)
+
+    def test_exchangerate_full_map(self) -> None:
+        session = MagicMock()
+        session.get.return_value = _resp(
+            {
+                "result": "success",
+                "rates": {"USD": 1.0, "EUR": 0.5, "JPY": 100.0, "XYZ": 0},
+            }
+        )
+        cfg = replace(self.cfg, fiat_currencies=None)
+        result = ExchangeRateApiClient(cfg, session=session).fetch_rates()
+        self.assertEqual(result.pairs_usd_per_unit, {"EUR_USD": 2.0, "JPY_USD": 0.01})
+
+        cfg = replace(self.cfg, fiat_currencies=("JPY",))
+        result = ExchangeRateApiClient(cfg, session=session).fetch_rates()
+        self.assertEqual(list(result.pairs_usd_per_unit), ["JPY_USD"])
+
+    def test_currencies_file(self) -> None:
+        path = Path(self.tmp.name) / "currencies.json"
+        path.write_text(
+            json.dumps({"fiat": ["eur"], "crypto": {"btc": "bitcoin"}}),
+            encoding="utf-8",
+        )
+        with patch.dict(os.environ, {"CURRENCIES_FILE": str(path)}):
+            cfg = ParserConfig.from_env()
+        self.assertEqual(cfg.fiat_currencies, ("EUR",))
+        self.assertEqual(cfg.crypto_id_map, {"BTC": "bitcoin"})
+        self.assertEqual(cfg.crypto_top, 0)
+        self.assertEqual(cfg.crypto_pairs(), {"BTC_USD"})
+
+        path.write_text(json.dumps({"fiat": "EUR"}), encoding="utf-8")
+        with self.assertRaises(ValueError):
+            load_currencies(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from valutatrade_hub.core.utils import write_json
+from valutatrade_hub.daemon.client import DaemonClient, DaemonError
+from valutatrade_hub.daemon.protocol import parse_address
+from valutatrade_hub.daemon.server import Daemon
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self) -> None:
+        write_json(Path("data/users.json"), [])
+        write_json(Path("data/portfolios.json"), [])
+        write_json(Path("data/session.json"), {"user_id": None, "username": None})
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.socket = str(Path(self.tmp.name) / "vt.sock")
+        self.daemon = Daemon(self.socket, flush_interval=3600).start()
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+
+    def tearDown(self) -> None:
+        self.daemon.shutdown()
+        self.thread.join()
+        self.tmp.cleanup()
+
+    def test_operations_and_sessions(self) -> None:
+        with DaemonClient(self.socket) as alice, DaemonClient(self.socket) as bob:
+            self.assertEqual(alice.ping(), "pong")
+            alice.register("alice", "1234")
+            self.assertEqual(alice.login("alice", "1234")["username"], "alice")
+            self.assertEqual(alice.buy("EUR", 10)["balance"], 10.0)
+            self.assertEqual(alice.sell("EUR", 4)["balance"], 6.0)
+            portfolio = alice.show_portfolio()
+            self.assertEqual(portfolio["wallets"][0]["balance"], 6.0)
+
+            # сессия у соединения своя: bob не вошёл
+            with self.assertRaises(DaemonError) as ctx:
+                bob.buy("EUR", 1)
+            self.assertIn("login", str(ctx.exception))
+            self.assertEqual(ctx.exception.error_type, "ValueError")
+
+            # общий session.json не тронут
+            session = json.loads(Path("data/session.json").read_text("utf-8"))
+            self.assertIsNone(session["user_id"])
+
+        # после остановки изменения записаны на диск
+        self.daemon.shutdown()
+        self.thread.join()
+        portfolios = json.loads(Path("data/portfolios.json").read_text("utf-8"))
+        self.assertEqual(portfolios[0]["wallets"]["EUR"]["balance"], 6.0)
+        self.assertFalse(Path(self.socket).exists())
+
+    def test_pipelining_keeps_order(self) -> None:
+        calls = [("get_rate", {"from_currency": "USD", "to_currency": "USD"})] * 300
+        calls[150] = ("no_such_op", {})
+        with DaemonClient(self.socket) as client:
+            responses = client.pipeline(calls, window=16)
+        self.assertEqual([r["id"] for r in responses], list(range(1, 301)))
+        self.assertFalse(responses[150]["ok"])
+        self.assertEqual(sum(r["ok"] for r in responses), 299)
+
+    def test_bad_arguments(self) -> None:
+        with DaemonClient(self.socket) as client:
+            with self.assertRaises(DaemonError) as ctx:
+                client.call("get_rate", currency="BTC")
+            self.assertEqual(ctx.exception.error_type, "TypeError")
+            self.assertEqual(client.ping(), "pong")
+
+    def test_reads_not_blocked_by_writes(self) -> None:
+        # пока изменяющая операция держит блокировку, чтения выполняются
+        with DaemonClient(self.socket, timeout=5) as client:
+            with self.daemon._write_lock:
+                rate = client.get_rate("EUR", "USD")
+                self.assertEqual(rate["from"], "EUR")
+
+    def test_parallel_clients(self) -> None:
+        # покупки и чтения из нескольких соединений: ни одна покупка не потеряна
+        def trade(name: str, out: dict) -> None:
+            with DaemonClient(self.socket) as c:
+                c.register(name, "1234")
+                c.login(name, "1234")
+                for _ in range(20):
+                    c.buy("EUR", 1)
+                    c.get_rate("EUR", "USD")
+                out[name] = c.show_portfolio()["wallets"][0]["balance"]
+
+        balances: dict = {}
+        threads = [
+            threading.Thread(target=trade, args=(f"user{i}", balances))
+            for i in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(balances, {f"user{i}": 20.0 for i in range(4)})
+
+    def test_second_daemon_refused(self) -> None:
+        with self.assertRaises(ValueError):
+            Daemon(self.socket).start()
+
+
+class TestAddress(unittest.TestCase):
+    def test_parse(self) -> None:
+        self.assertEqual(parse_address("127.0.0.1:9000"), ("127.0.0.1", 9000))
+        self.assertEqual(parse_address(":9000"), ("127.0.0.1", 9000))
+        self.assertEqual(parse_address("/tmp/vt.sock"), "/tmp/vt.sock")
+        self.assertTrue(parse_address(None).endswith("valutatrade.sock"))
+        self.assertEqual(parse_address("localhost:9000"), ("localhost", 9000))
+
+    def test_tcp_only_on_loopback(self) -> None:
+        for address in ("0.0.0.0:9000", "192.168.1.5:9000", "example.com:9000"):
+            with self.assertRaises(ValueError):
+                parse_address(address)
+
+
+if __name__ == "__main__":
+    unittest.main()
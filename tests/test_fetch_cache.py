@@ -0,0 +1,71 @@
+import tempfile
+import time
+import unittest
+from dataclasses import replace
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from valutatrade_hub.parser_service.api_clients import (
+    CoinGeckoClient,
+    ExchangeRateApiClient,
+)
+from valutatrade_hub.parser_service.config import ParserConfig
+
+
+def _resp(status: int, payload=None, headers=None) -> MagicMock:
+    resp = MagicMock(status_code=status, headers=headers or {})
+    resp.json.return_value = payload
+    return resp
+
+
+class TestConditionalFetch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cfg = replace(
+            ParserConfig.from_env(),
+            exchangerate_api_key="test",
+            fetch_cache_file=Path(self.tmp.name) / "fetch_cache.json",
+            rate_limit_file=Path(self.tmp.name) / "rate_limits.json",
+            conditional_fetch=True,
+            crypto_top=0,
+        )
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_skip_network_until_next_update(self) -> None:
+        session = MagicMock()
+        session.get.return_value = _resp(
+            200,
+            {
+                "result": "success",
+                "rates": {"EUR": 0.5},
+                "time_next_update_unix": int(time.time()) + 3600,
+            },
+        )
+        client = ExchangeRateApiClient(self.cfg, session=session)
+
+        first = client.fetch_rates()
+        second = client.fetch_rates()
+        self.assertEqual(session.get.call_count, 1)
+        self.assertEqual(second.pairs_usd_per_unit, first.pairs_usd_per_unit)
+        self.assertEqual(second.meta["cached"], "fresh")
+
+    def test_etag_revalidation(self) -> None:
+        session = MagicMock()
+        session.get.side_effect = [
+            _resp(200, {"bitcoin": {"usd": 100.0}}, {"ETag": '"v1"'}),
+            _resp(304),
+        ]
+        client = CoinGeckoClient(self.cfg, session=session)
+
+        client.fetch_rates()
+        result = client.fetch_rates()
+        headers = session.get.call_args.kwargs["headers"]
+        self.assertEqual(headers["If-None-Match"], '"v1"')
+        self.assertEqual(result.meta["cached"], "not_modified")
+        self.assertEqual(result.pairs_usd_per_unit["BTC_USD"], 100.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+import requests
+
+from valutatrade_hub.parser_service.api_clients import (
+    ApiRequestError,
+    CoinGeckoClient,
+    ExchangeRateApiClient,
+)
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.fake_upstream import FakeUpstream, UpstreamBehavior
+from valutatrade_hub.parser_service.fixtures import FixtureSession
+
+
+class TestRecordReplay(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.upstream = FakeUpstream(UpstreamBehavior(fiat=20)).start()
+        data = Path(self.tmp.name)
+        self.cfg = replace(
+            ParserConfig.from_env(),
+            coingecko_url=f"{self.upstream.coingecko_api_url}/simple/price",
+            coingecko_markets_url=f"{self.upstream.coingecko_api_url}/coins/markets",
+            exchangerate_url=self.upstream.exchangerate_url,
+            exchangerate_api_key="secret-key",
+            fiat_currencies=None,
+            crypto_top=300,
+            fetch_cache_file=data / "fetch_cache.json",
+            rate_limit_file=data / "rate_limits.json",
+            conditional_fetch=False,
+        )
+        self.fixtures = data / "fixtures"
+
+    def tearDown(self) -> None:
+        self.upstream.stop()
+        self.tmp.cleanup()
+
+    def fetch_all(self, session: requests.Session) -> dict[str, float]:
+        pairs = {}
+        for cls in (CoinGeckoClient, ExchangeRateApiClient):
+            pairs.update(
+                cls(self.cfg, session=session).fetch_rates().pairs_usd_per_unit
+            )
+        return pairs
+
+    def test_replay_without_network(self) -> None:
+        recorder = FixtureSession(
+            "record", self.fixtures, inner=requests.Session(), secrets=["secret-key"]
+        )
+        recorded = self.fetch_all(recorder)
+        self.assertEqual(len(recorded), 300 + 3 + 20)
+        requests_seen = self.upstream.stats["requests"]
+
+        self.upstream.stop()
+        # как get_shared_session: ключ из конфигурации передаётся и при replay
+        player = FixtureSession("replay", self.fixtures, secrets=["secret-key"])
+        replayed = self.fetch_all(player)
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(self.upstream.stats["requests"], requests_seen)
+
+        # API-ключ в записи не сохраняется
+        for path in self.fixtures.iterdir():
+            self.assertNotIn("secret-key", path.read_text(encoding="utf-8"))
+
+    def test_replay_with_other_key(self) -> None:
+        # имя записи не зависит от API-ключа: записано с одним, воспроизводится
+        # с другим
+        recorder = FixtureSession(
+            "record", self.fixtures, inner=requests.Session(), secrets=["secret-key"]
+        )
+        recorded = self.fetch_all(recorder)
+        self.upstream.stop()
+
+        self.cfg = replace(self.cfg, exchangerate_api_key="other-key")
+        player = FixtureSession("replay", self.fixtures, secrets=["other-key"])
+        self.assertEqual(self.fetch_all(player), recorded)
+
+    def test_missing_record_is_network_error(self) -> None:
+        client = CoinGeckoClient(
+            self.cfg, session=FixtureSession("replay", self.fixtures)
+        )
+        with self.assertRaises(ApiRequestError):
+            client.fetch_rates()
+
+
+class TestFakeUpstream(unittest.TestCase):
+    def test_bursts_and_errors(self) -> None:
+        behavior = UpstreamBehavior(burst_every=4, burst_len=2, retry_after=7)
+        with FakeUpstream(behavior) as upstream:
+            url = f"{upstream.coingecko_api_url}/simple/price"
+            with requests.Session() as s:
+                codes = [s.get(url, params={"ids": "bitcoin"}) for _ in range(8)]
+        self.assertEqual([r.status_code for r in codes], [200, 200, 429, 429] * 2)
+        self.assertEqual(codes[2].headers["Retry-After"], "7")
+
+        with FakeUpstream(UpstreamBehavior(error_rate=1.0)) as upstream:
+            resp = requests.get(f"{upstream.exchangerate_url}/k/latest/USD")
+        self.assertEqual(resp.status_code, 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
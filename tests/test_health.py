@@ -0,0 +1,267 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.test_updater import FakeClient, make_config
+from valutatrade_hub.parser_service.api_clients import FetchResult
+from valutatrade_hub.parser_service.health import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    SourceHealth,
+    health_report,
+)
+from valutatrade_hub.parser_service.storage import load_rates_cache
+from valutatrade_hub.parser_service.updater import RatesUpdater, group_by_pairs
+
+
+class PairsClient(FakeClient):
+    def __init__(self, *args, provides=(), **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+        self._provides = frozenset(provides)
+
+    def provided_pairs(self) -> frozenset[str]:
+        return self._provides
+
+    def fetch_rates(self):
+        self.calls += 1
+        return super().fetch_rates()
+
+
+class CachedClient(FakeClient):
+    # Каждый второй ответ - из кэша условных запросов
+    def __init__(self, *args, how="fresh", **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+        self._how = how
+
+    def fetch_rates(self):
+        self.calls += 1
+        if self.calls % 2:
+            return super().fetch_rates()
+        return FetchResult(dict(self._pairs), self._name, {"cached": self._how})
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        path = Path(self.tmp.name) / "health.json"
+        self.health = SourceHealth(path, threshold=2, cooldown=10, cooldown_max=25)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def state(self, source: str) -> str:
+        return self.health.stats()[source]["state"]
+
+    def test_open_half_open_closed(self) -> None:
+        h = self.health
+        h.record_failure("A", now=100)
+        self.assertEqual(self.state("A"), CLOSED)
+        h.record_failure("A", now=100)
+        self.assertEqual(self.state("A"), OPEN)
+
+        self.assertFalse(h.allow("A", now=105))
+        self.assertTrue(h.allow("A", now=110))
+        self.assertEqual(self.state("A"), HALF_OPEN)
+        # пока идёт проба, остальные запросы не пропускаются
+        self.assertFalse(h.allow("A", now=111))
+
+        h.record_success("A", latency_ms=50)
+        self.assertEqual(self.state("A"), CLOSED)
+        self.assertTrue(h.allow("A", now=112))
+
+    def test_cached_probe_keeps_breaker(self) -> None:
+        # ответ из кэша без запроса в сеть не замыкает цепь, но и не
+        # занимает место пробного запроса; 304 - ответ источника, замыкает
+        h = self.health
+        h.record_failure("A", now=100)
+        h.record_failure("A", now=100)
+        self.assertTrue(h.allow("A", now=110))
+        h.record_cached("A", now=110)
+        self.assertEqual(self.state("A"), HALF_OPEN)
+        self.assertTrue(h.allow("A", now=111))
+        h.record_cached("A", revalidated=True, now=111)
+        self.assertEqual(self.state("A"), CLOSED)
+        self.assertEqual(h.stats()["A"]["outcomes"], [0, 0])
+
+    def test_failed_probe_doubles_cooldown(self) -> None:
+        h = self.health
+        h.record_failure("A", now=0)
+        h.record_failure("A", now=0)
+        self.assertTrue(h.allow("A", now=10))
+        h.record_failure("A", now=10)
+        self.assertEqual(h.stats()["A"]["open_until"], 30)
+        self.assertTrue(h.allow("A", now=30))
+        h.record_failure("A", now=30)
+        # не больше cooldown_max
+        self.assertEqual(h.stats()["A"]["open_until"], 55)
+
+    def test_state_persists(self) -> None:
+        self.health.record_failure("A", now=0)
+        self.health.record_failure("A", now=0)
+        other = SourceHealth(self.health.path, threshold=2, cooldown=10)
+        self.assertFalse(other.allow("A", now=5))
+
+    def test_rank_by_latency_and_success(self) -> None:
+        h = self.health
+        h.record_success("slow", latency_ms=500)
+        h.record_success("fast", latency_ms=50)
+        h.record_success("flaky", latency_ms=100)
+        h.record_failure("flaky", latency_ms=100)
+        self.assertEqual(
+            h.rank(["slow", "flaky", "fast", "new"]),
+            ["new", "fast", "flaky", "slow"],
+        )
+
+        # вторая ошибка подряд размыкает цепь flaky (threshold=2): разомкнутая
+        # цепь - последней, хотя задержка flaky меньше, чем у slow
+        h.record_failure("flaky", latency_ms=100)
+        self.assertEqual(
+            h.rank(["slow", "flaky", "fast", "new"]),
+            ["new", "fast", "slow", "flaky"],
+        )
+
+
+class TestSourceFallback(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cfg = make_config(self.tmp.name, breaker_threshold=1)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_group_by_pairs(self) -> None:
+        a = PairsClient(self.cfg, "A", {}, provides={"BTC_USD"})
+        b = PairsClient(self.cfg, "B", {}, provides={"EUR_USD"})
+        c = PairsClient(self.cfg, "C", {}, provides={"BTC_USD", "EUR_USD"})
+        d = PairsClient(self.cfg, "D", {})
+        groups = [[x.source_name for x in g] for g in group_by_pairs([a, b, c, d])]
+        self.assertEqual(sorted(map(sorted, groups)), [["A", "B", "C"], ["D"]])
+
+    def test_fallback_and_skip_open_source(self) -> None:
+        bad = PairsClient(self.cfg, "Bad", {}, fail=True, provides={"BTC_USD"})
+        good = PairsClient(self.cfg, "Good", {"BTC_USD": 2.0}, provides={"BTC_USD"})
+        updater = RatesUpdater(self.cfg, [bad, good])
+
+        res = updater.run_update()
+        self.assertEqual(res["errors"], [])
+        self.assertEqual(res["updated_pairs"], 1)
+        self.assertFalse(res["sources"]["Bad"]["ok"])
+
+        # цепь Bad разомкнута: второй запуск к нему не обращается,
+        # а Good (уже с замером задержки) идёт первым
+        res = updater.run_update()
+        self.assertEqual(bad.calls, 1)
+        self.assertEqual(good.calls, 2)
+        self.assertEqual(res["sources"]["Bad"]["covered_by"], "Good")
+
+    def test_partial_overlap_fetches_missing_pairs(self) -> None:
+        # A={BTC,ETH} и B={BTC,SOL} в одной группе: SOL берётся у B,
+        # BTC - у A (первый по рангу), C не нужен - ETH уже есть
+        a = PairsClient(
+            self.cfg,
+            "A",
+            {"BTC_USD": 1.0, "ETH_USD": 2.0},
+            provides={"BTC_USD", "ETH_USD"},
+        )
+        b = PairsClient(
+            self.cfg,
+            "B",
+            {"BTC_USD": 9.0, "SOL_USD": 3.0},
+            provides={"BTC_USD", "SOL_USD"},
+        )
+        c = PairsClient(self.cfg, "C", {"ETH_USD": 8.0}, provides={"ETH_USD"})
+        res = RatesUpdater(self.cfg, [a, b, c]).run_update()
+
+        self.assertEqual(res["errors"], [])
+        self.assertEqual(res["updated_pairs"], 3)
+        pairs = load_rates_cache(self.cfg.rates_file)["pairs"]
+        sources = {pair: v["source"] for pair, v in pairs.items()}
+        self.assertEqual(sources, {"BTC_USD": "A", "ETH_USD": "A", "SOL_USD": "B"})
+        self.assertEqual(pairs["BTC_USD"]["rate"], 1.0)
+        self.assertEqual((a.calls, b.calls, c.calls), (1, 1, 0))
+        self.assertEqual(res["sources"]["C"]["covered_by"], "A")
+
+    def test_fallbacks_stop_when_pairs_covered(self) -> None:
+        a = PairsClient(self.cfg, "A", {"BTC_USD": 1.0}, provides={"BTC_USD"})
+        b = PairsClient(self.cfg, "B", {"BTC_USD": 2.0}, provides={"BTC_USD"})
+        RatesUpdater(self.cfg, [a, b]).run_update()
+        self.assertEqual(a.calls + b.calls, 1)
+
+
+class TestHealthReport(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cfg = make_config(self.tmp.name, breaker_threshold=3)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def report(self, health: SourceHealth, **kwargs) -> dict[str, dict]:
+        kwargs.setdefault("intervals", {})
+        kwargs.setdefault("slow_ms", 1000)
+        rows = health_report(health.stats(), **kwargs)
+        return {r["source"]: r for r in rows}
+
+    def test_updater_records_source_stats(self) -> None:
+        ok = PairsClient(self.cfg, "Ok", {"BTC_USD": 1.0, "ETH_USD": 2.0})
+        bad = PairsClient(self.cfg, "Bad", {"EUR_USD": 1.0}, fail=True)
+        updater = RatesUpdater(self.cfg, [ok, bad])
+        updater.run_update()
+        updater.run_update()
+
+        rows = self.report(updater.health)
+        self.assertEqual(rows["Ok"]["status"], "ok")
+        self.assertEqual(rows["Ok"]["pairs"], 2)
+        self.assertEqual(rows["Ok"]["p50_ms"], 1)
+        self.assertEqual(rows["Ok"]["success_rate"], 1.0)
+        self.assertEqual(rows["Ok"]["requests"], 2)
+        self.assertIsNotNone(rows["Ok"]["last_success_at"])
+        self.assertEqual(rows["Bad"]["status"], "failing")
+        self.assertEqual(rows["Bad"]["last_error"], "boom")
+        self.assertIsNone(rows["Bad"]["last_success_at"])
+
+    def test_cached_not_in_success_rate(self) -> None:
+        client = CachedClient(self.cfg, "C", {"BTC_USD": 1.0}, how="not_modified")
+        updater = RatesUpdater(self.cfg, [client])
+        for _ in range(4):
+            updater.run_update()
+
+        rows = self.report(updater.health)
+        self.assertEqual(rows["C"]["requests"], 2)
+        self.assertEqual(rows["C"]["cached"], 2)
+        self.assertEqual(rows["C"]["success_rate"], 1.0)
+
+        # сбои источника не скрываются ответами из кэша
+        h = updater.health
+        h.record_failure("C", latency_ms=5)
+        h.record_failure("C", latency_ms=5)
+        for _ in range(10):
+            h.record_cached("C")
+        row = self.report(h)["C"]
+        self.assertEqual((row["requests"], row["cached"]), (4, 12))
+        self.assertEqual(row["success_rate"], 0.5)
+        self.assertEqual(row["status"], "failing")
+
+    def test_slow_stale_and_window(self) -> None:
+        h = SourceHealth(Path(self.tmp.name) / "h.json")
+        for i in range(150):
+            h.record_success("A", latency_ms=100 if i % 20 else 5000, now=1000)
+        h.record_success("B", latency_ms=10, now=1000)
+
+        rows = self.report(h, intervals={"A": 60, "B": 60}, now=1100)
+        self.assertEqual(rows["A"]["requests"], 100)
+        self.assertEqual(rows["A"]["p50_ms"], 100)
+        self.assertEqual(rows["A"]["p99_ms"], 5000)
+        self.assertEqual(rows["A"]["status"], "ok")
+        self.assertEqual(rows["A"]["last_success_age_s"], 100)
+
+        rows = self.report(h, intervals={"B": 30}, slow_ms=50, now=1100)
+        self.assertEqual(rows["A"]["status"], "slow")
+        self.assertEqual(rows["B"]["status"], "stale")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+from valutatrade_hub.parser_service import hedging
+from valutatrade_hub.parser_service.api_clients import CoinGeckoClient
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.fake_upstream import FakeUpstream, UpstreamBehavior
+from valutatrade_hub.parser_service.health import SourceHealth
+from valutatrade_hub.parser_service.hedging import (
+    HEDGE_MIN_SAMPLES,
+    HedgePolicy,
+    get_hedge_policy,
+    hedge_executor,
+    mirror_url,
+    request_executor,
+)
+
+
+class TestHedgePolicy(unittest.TestCase):
+    def test_no_delay_until_enough_samples(self) -> None:
+        policy = HedgePolicy(percentile=0.9, min_delay=0.01, budget=1.0)
+        for _ in range(HEDGE_MIN_SAMPLES - 1):
+            policy.record("src", 0.1)
+        self.assertIsNone(policy.delay("src"))
+
+        policy.record("src", 0.1)
+        self.assertEqual(policy.delay("src"), 0.1)
+
+        # нижняя граница задержки
+        policy.min_delay = 0.5
+        self.assertEqual(policy.delay("src"), 0.5)
+
+    def test_percentile_of_window(self) -> None:
+        policy = HedgePolicy(percentile=0.9, min_delay=0.0, budget=1.0)
+        for i in range(100):
+            policy.record("src", i / 1000)
+        self.assertAlmostEqual(policy.delay("src"), 0.09)
+
+    def test_budget_caps_extra_requests(self) -> None:
+        policy = HedgePolicy(percentile=0.9, min_delay=0.0, budget=0.1)
+        for _ in range(HEDGE_MIN_SAMPLES):
+            policy.record("src", 0.1)
+        spent = 0
+        for _ in range(50):
+            policy.delay("src")
+            spent += policy.try_spend("src")
+        self.assertEqual(spent, 5)
+        self.assertEqual(policy.stats()["src"]["hedges"], 5)
+
+    def test_seed_from_saved_latencies(self) -> None:
+        policy = HedgePolicy(percentile=0.99, min_delay=0.0, budget=1.0)
+        policy.record("src", 0.5)
+        calls = []
+
+        def load() -> list[float]:
+            calls.append(1)
+            return [0.1] * HEDGE_MIN_SAMPLES
+
+        policy.seed("src", load)
+        policy.seed("src", load)
+        self.assertEqual(len(calls), 1)
+        # сохранённые замеры - старше своих: свой последний остаётся в окне
+        self.assertEqual(policy.delay("src"), 0.5)
+        self.assertEqual(policy.stats()["src"]["samples"], HEDGE_MIN_SAMPLES + 1)
+
+    def test_hedges_have_own_pool(self) -> None:
+        self.assertIsNot(request_executor(2), hedge_executor(2))
+
+    def test_disabled_by_default(self) -> None:
+        self.assertIsNone(get_hedge_policy(0.0, 0.05, 0.1))
+
+    def test_mirror_url(self) -> None:
+        mirrors = {"https://api.example.com": "https://mirror.example.com"}
+        self.assertEqual(
+            mirror_url("https://api.example.com/v3/price", mirrors),
+            "https://mirror.example.com/v3/price",
+        )
+        self.assertEqual(
+            mirror_url("https://other.example.com/x", mirrors),
+            "https://other.example.com/x",
+        )
+
+
+class TestHedgedFetch(unittest.TestCase):
+    def setUp(self) -> None:
+        hedging._policy = None
+        self.tmp = tempfile.TemporaryDirectory()
+        data = Path(self.tmp.name)
+        self.upstream = FakeUpstream(UpstreamBehavior(latency=0.01)).start()
+        self.cfg = replace(
+            ParserConfig.from_env(),
+            coingecko_url=f"{self.upstream.coingecko_api_url}/simple/price",
+            crypto_top=0,
+            fetch_cache_file=data / "fetch_cache.json",
+            rate_limit_file=data / "rate_limits.json",
+            source_health_file=data / "source_health.json",
+            conditional_fetch=False,
+            rate_quotas={},
+            http_fixtures=None,
+            hedge_percentile=0.9,
+            hedge_min_delay=0.0,
+            hedge_budget=1.0,
+        )
+
+    def tearDown(self) -> None:
+        self.upstream.stop()
+        self.tmp.cleanup()
+        hedging._policy = None
+
+    def test_hedge_wins_over_stalled_request(self) -> None:
+        client = CoinGeckoClient(self.cfg)
+        for _ in range(HEDGE_MIN_SAMPLES):
+            self.assertNotIn("hedge", client.fetch_rates().meta)
+
+        # следующий запрос "зависает", второй отвечает как обычно
+        self.stall_next_request()
+        result = client.fetch_rates()
+        self.assertEqual(result.meta["hedge"], "hedge")
+        self.assertLess(result.meta["request_ms"], 1000)
+        self.assertEqual(len(result.pairs_usd_per_unit), 3)
+        self.assertEqual(client.hedge_policy.stats()["CoinGecko"]["hedges"], 1)
+
+    def stall_next_request(self) -> None:
+        original = self.upstream._decide
+
+        def stall_once() -> tuple[int | None, float]:
+            self.upstream._decide = original
+            status, delay = original()
+            return status, delay + 2.0
+
+        self.upstream._decide = stall_once
+
+    def test_hedge_from_first_request_with_saved_latencies(self) -> None:
+        # замеры прошлых запусков из source_health.json: хеджируется уже
+        # первый запрос процесса
+        health = SourceHealth(self.cfg.source_health_file)
+        for _ in range(HEDGE_MIN_SAMPLES):
+            health.record_success("CoinGecko", latency_ms=10)
+
+        self.stall_next_request()
+        result = CoinGeckoClient(self.cfg).fetch_rates()
+        self.assertEqual(result.meta["hedge"], "hedge")
+        self.assertLess(result.meta["request_ms"], 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from valutatrade_hub.parser_service.api_clients import (
+    CoinGeckoClient,
+    ExchangeRateApiClient,
+)
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.http import build_session
+
+
+class TestHttpSession(unittest.TestCase):
+    def test_session_pool_and_retries(self) -> None:
+        session = build_session(pool_size=4, retries=3, backoff=0.1)
+        adapter = session.get_adapter("https://api.coingecko.com")
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(adapter.max_retries.total, 3)
+        self.assertNotIn(429, adapter.max_retries.status_forcelist)
+        self.assertIn("gzip", session.headers["Accept-Encoding"])
+
+    def test_clients_share_session(self) -> None:
+        cfg = ParserConfig.from_env()
+        self.assertIs(CoinGeckoClient(cfg).session, ExchangeRateApiClient(cfg).session)
+
+    def test_timing_split_in_meta(self) -> None:
+        resp = MagicMock(status_code=200, headers={})
+        resp.json.return_value = {"bitcoin": {"usd": 100.0}}
+        session = MagicMock()
+        session.get.return_value = resp
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cfg = replace(
+                ParserConfig.from_env(),
+                fetch_cache_file=Path(tmp) / "fetch_cache.json",
+                rate_limit_file=Path(tmp) / "rate_limits.json",
+                crypto_top=0,
+            )
+            result = CoinGeckoClient(cfg, session=session).fetch_rates()
+        self.assertEqual(result.pairs_usd_per_unit["BTC_USD"], 100.0)
+        for key in ("request_ms", "connect_ms", "transfer_ms"):
+            self.assertIn(key, result.meta)
+        self.assertTrue(session.get.call_args.kwargs["stream"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from valutatrade_hub.core import ledger as ledger_mod
+from valutatrade_hub.core.datacache import DataCache
+from valutatrade_hub.core.exceptions import DataConflictError
+from valutatrade_hub.core.ledger import (
+    CHECKPOINT_FILE,
+    GENESIS_FILE,
+    LEDGER_FILE,
+    Ledger,
+)
+from valutatrade_hub.core.usecases import (
+    buy_currency,
+    login,
+    register,
+    replay_ledger,
+    sell_currency,
+)
+from valutatrade_hub.core.utils import (
+    PORTFOLIOS_JSON,
+    load_portfolios,
+    read_json_file,
+    write_json,
+    write_json_file,
+)
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+
+def _trade(user_id: int, action: str, code: str, amount: float) -> dict:
+    return {
+        "user_id": user_id,
+        "action": action,
+        "currency_code": code,
+        "amount": amount,
+    }
+
+
+class TestLedger(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.ledger = Ledger(root / "l.ndjson", root / "cp.json", checkpoint_every=3)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_append_and_project(self) -> None:
+        self.ledger.append([_trade(1, "buy", "EUR", 10), _trade(2, "buy", "BTC", 1)])
+        self.ledger.append([_trade(1, "sell", "EUR", 4)])
+        self.assertEqual(self.ledger.last_seq(), 3)
+
+        # после 3-й записи создан снимок, хвост пуст
+        cp = self.ledger.load_checkpoint()
+        self.assertEqual(cp["seq"], 3)
+        self.assertEqual(list(self.ledger.iter_entries(cp["offset"])), [])
+
+        self.ledger.append([_trade(2, "sell", "BTC", 0.25)])
+        self.assertEqual(self.ledger.project(), {1: {"EUR": 6.0}, 2: {"BTC": 0.75}})
+
+    def test_parallel_replay_matches_projection(self) -> None:
+        for i in range(20):
+            self.ledger.append([_trade(i % 4 + 1, "buy", "EUR", 1.5)])
+        with patch.object(ledger_mod, "PARALLEL_MIN_ENTRIES", 0):
+            full = self.ledger.replay(workers=2, full=True)
+        self.assertEqual(full, self.ledger.project())
+        self.assertEqual(full[1]["EUR"], 7.5)
+
+    def test_genesis_only_for_new_ledger(self) -> None:
+        self.assertTrue(self.ledger.ensure_genesis(lambda: {1: {"EUR": 100.0}}))
+        self.assertFalse(self.ledger.ensure_genesis(lambda: {1: {"EUR": 1.0}}))
+        self.ledger.append([_trade(1, "sell", "EUR", 30)])
+        self.assertEqual(self.ledger.replay(full=True), {1: {"EUR": 70.0}})
+
+        # журнал с записями без снимка: балансы до него не выдумываем
+        root = Path(self.tmp.name)
+        old = Ledger(root / "old.ndjson", root / "old_cp.json", checkpoint_every=3)
+        old.append([_trade(1, "buy", "EUR", 1)])
+        self.assertFalse(old.ensure_genesis(lambda: {1: {"EUR": 5.0}}))
+        self.assertFalse(old.has_genesis())
+
+    def test_concurrent_append_unique_seq(self) -> None:
+        # 4 процесса по 50 дозаписей: seq без повторов и пропусков
+        script = (
+            "import sys\n"
+            "from pathlib import Path\n"
+            "from valutatrade_hub.core.ledger import Ledger\n"
+            "ledger = Ledger(Path(sys.argv[1]), Path(sys.argv[2]), 1000)\n"
+            "for _ in range(50):\n"
+            "    ledger.append([{'user_id': 1, 'action': 'buy',"
+            " 'currency_code': 'EUR', 'amount': 1}])\n"
+        )
+        env = {**os.environ, "PYTHONPATH": str(SRC)}
+        args = [str(self.ledger.path), str(self.ledger.checkpoint_path)]
+        procs = [
+            subprocess.Popen([sys.executable, "-c", script, *args], env=env)
+            for _ in range(4)
+        ]
+        for p in procs:
+            self.assertEqual(p.wait(timeout=60), 0)
+        seqs = [e["seq"] for e, _ in self.ledger.iter_entries()]
+        self.assertEqual(sorted(seqs), list(range(1, 201)))
+
+
+class TestReplayPortfolios(unittest.TestCase):
+    def setUp(self) -> None:
+        for path in (LEDGER_FILE, CHECKPOINT_FILE, GENESIS_FILE):
+            path.unlink(missing_ok=True)
+        write_json(Path("data/users.json"), [])
+        write_json(Path("data/portfolios.json"), [])
+        write_json(Path("data/session.json"), {"user_id": None, "username": None})
+        register("alice", "1234")
+        login("alice", "1234")
+
+    def test_replay_repairs_portfolio(self) -> None:
+        buy_currency("EUR", 10)
+        sell_currency("EUR", 3)
+        self.assertEqual(replay_ledger(check=True)["mismatches"], [])
+
+        # портим баланс и восстанавливаем из журнала
+        portfolios = load_portfolios()
+        portfolios[0]["wallets"]["EUR"]["balance"] = 999.0
+        write_json(Path("data/portfolios.json"), portfolios)
+
+        res = replay_ledger()
+        self.assertEqual(len(res["mismatches"]), 1)
+        self.assertEqual(load_portfolios()[0]["wallets"]["EUR"]["balance"], 7.0)
+
+    def test_deferred_cache_keeps_ledger_with_portfolios(self) -> None:
+        # сделки в кэше с отложенной записью: журнал дописывается только
+        # вместе с portfolios.json, при конфликте не пишется ни то, ни другое
+        with DataCache(flush_interval=None) as cache:
+            with cache.transaction():
+                buy_currency("EUR", 10)
+            self.assertEqual(Ledger().last_seq(), 0)
+            cache.flush()
+            self.assertEqual(Ledger().last_seq(), 1)
+
+            with cache.transaction():
+                buy_currency("EUR", 5)
+            # другой процесс записал portfolios.json
+            write_json_file(PORTFOLIOS_JSON, read_json_file(PORTFOLIOS_JSON, []))
+            with self.assertRaises(DataConflictError):
+                cache.flush()
+            self.assertEqual(Ledger().last_seq(), 1)
+
+            with cache.transaction():
+                buy_currency("EUR", 5)
+            # replay сначала сбрасывает отложенные сделки
+            self.assertEqual(replay_ledger(check=True)["mismatches"], [])
+            self.assertEqual(Ledger().last_seq(), 2)
+        self.assertEqual(load_portfolios()[0]["wallets"]["EUR"]["balance"], 15.0)
+
+    def test_balances_before_ledger_survive_replay(self) -> None:
+        # баланс появился до журнала (существующая установка)
+        portfolios = load_portfolios()
+        portfolios[0]["wallets"] = {"USD": {"currency_code": "USD", "balance": 500.0}}
+        write_json(Path("data/portfolios.json"), portfolios)
+
+        buy_currency("EUR", 10)
+        self.assertEqual(replay_ledger(check=True)["mismatches"], [])
+        replay_ledger(full=True)
+        wallets = load_portfolios()[0]["wallets"]
+        self.assertEqual(wallets["USD"]["balance"], 500.0)
+        self.assertEqual(wallets["EUR"]["balance"], 10.0)
+
+    def test_replay_refuses_without_genesis(self) -> None:
+        buy_currency("EUR", 10)
+        GENESIS_FILE.unlink()
+        with self.assertRaises(ValueError):
+            replay_ledger()
+        self.assertEqual(replay_ledger(check=True)["written"], False)
+        self.assertEqual(load_portfolios()[0]["wallets"]["EUR"]["balance"], 10.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+
+from valutatrade_hub.core.lots import consume_lots, record_lot, resolve_policy
+from valutatrade_hub.core.usecases import (
+    _ledger,
+    _refresh_rates_stub,
+    buy_currency,
+    login,
+    register,
+    sell_currency,
+)
+from valutatrade_hub.core.utils import RATES_JSON, load_portfolios, write_json
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _last_entry() -> dict:
+    return list(_ledger().iter_entries())[-1][0]
+
+
+def _wallet() -> dict:
+    w = {"currency_code": "BTC", "balance": 0.0}
+    record_lot(w, 1.0, 100.0, "t1")
+    record_lot(w, 1.0, 200.0, "t2")
+    return w
+
+
+class TestLots(unittest.TestCase):
+    def test_fifo(self) -> None:
+        res = consume_lots(_wallet(), 1.5, 300.0, "fifo")
+        # себестоимость 1*100 + 0.5*200
+        self.assertAlmostEqual(res["cost_basis"], 200.0)
+        self.assertAlmostEqual(res["realized_pnl"], 250.0)
+
+    def test_lifo(self) -> None:
+        w = _wallet()
+        res = consume_lots(w, 1.5, 300.0, "lifo")
+        self.assertAlmostEqual(res["cost_basis"], 250.0)
+        self.assertEqual(list(w["lots"]), [[0.5, 100.0, "t1"]])
+
+    def test_average_collapses_lots(self) -> None:
+        w = _wallet()
+        res = consume_lots(w, 1.0, 300.0, "average")
+        self.assertAlmostEqual(res["cost_basis"], 150.0)
+        self.assertEqual(list(w["lots"]), [[1.0, 150.0, "t2"]])
+        self.assertEqual(w["policy"], "average")
+
+    def test_policy_fixed_per_wallet(self) -> None:
+        w = _wallet()
+        self.assertEqual(resolve_policy(w, None, "fifo"), "fifo")
+        consume_lots(w, 0.5, 300.0, "average")
+        # после average лоты свёрнуты: fifo/lifo для кошелька запрещены
+        with self.assertRaises(ValueError):
+            resolve_policy(w, "fifo", "fifo")
+        self.assertEqual(resolve_policy(w, None, "fifo"), "average")
+
+        consume_lots(w, 1.5, 300.0, "average")
+        self.assertNotIn("policy", w)
+        self.assertEqual(resolve_policy(w, "lifo", "fifo"), "lifo")
+
+    def test_unmatched_quantity_has_zero_pnl(self) -> None:
+        res = consume_lots(_wallet(), 3.0, 300.0, "fifo")
+        self.assertEqual(res["matched_qty"], 2.0)
+        self.assertAlmostEqual(res["realized_pnl"], 300.0)
+
+
+class TestSellPnl(unittest.TestCase):
+    def setUp(self) -> None:
+        write_json(Path("data/users.json"), [])
+        write_json(Path("data/portfolios.json"), [])
+        write_json(Path("data/session.json"), {"user_id": None, "username": None})
+        write_json(
+            Path("data/rates.json"),
+            {"pairs": {"BTC_USD": {"rate": 100.0}}, "last_refresh": _now()},
+        )
+        register("alice", "1234")
+        login("alice", "1234")
+
+    def test_sell_returns_realized_pnl(self) -> None:
+        buy_currency("BTC", 2)
+        lots = load_portfolios()[0]["wallets"]["BTC"]["lots"]
+        self.assertEqual(lots[0][:2], [2.0, 100.0])
+
+        write_json(
+            Path("data/rates.json"),
+            {"pairs": {"BTC_USD": {"rate": 150.0}}, "last_refresh": _now()},
+        )
+        res = sell_currency("BTC", 1)
+        self.assertAlmostEqual(res["realized_pnl"], 50.0)
+        self.assertEqual(res["balance"], 1.0)
+
+    def test_sell_policy_mismatch_leaves_wallet(self) -> None:
+        buy_currency("BTC", 2)
+        sell_currency("BTC", 1, policy="average")
+        with self.assertRaises(ValueError):
+            sell_currency("BTC", 1, policy="fifo")
+        wallet = load_portfolios()[0]["wallets"]["BTC"]
+        self.assertEqual((wallet["balance"], wallet["policy"]), (1.0, "average"))
+        self.assertEqual(sell_currency("BTC", 1)["policy"], "average")
+
+    def test_stale_rates_are_flagged_not_replaced(self) -> None:
+        # устаревший снимок не перезаписывается заглушкой: цена сделки -
+        # последний известный курс, а результат помечен как устаревший
+        write_json(
+            Path("data/rates.json"),
+            {"pairs": {"BTC_USD": {"rate": 100.0}}, "last_refresh": None},
+        )
+        raw = RATES_JSON.read_bytes()
+        res = buy_currency("BTC", 1)
+        self.assertEqual((res["price"], res["price_stale"]), (100.0, True))
+        self.assertEqual(RATES_JSON.read_bytes(), raw)
+        lot = load_portfolios()[0]["wallets"]["BTC"]["lots"][0]
+        self.assertEqual(lot[1], 100.0)
+        self.assertEqual(_last_entry()["rate"], 100.0)
+
+    def test_stub_rates_are_not_prices(self) -> None:
+        write_json(Path("data/rates.json"), _refresh_rates_stub())
+        res = buy_currency("BTC", 1)
+        self.assertEqual((res["price"], res["price_stale"]), (None, False))
+        self.assertIsNone(_last_entry()["rate"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from valutatrade_hub.core.usecases import get_rate
+from valutatrade_hub.core.utils import read_json, write_json
+from valutatrade_hub.infra.metrics import REGISTRY, Registry, timed
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self) -> None:
+        self.reg = Registry()
+
+    def test_prometheus_text(self) -> None:
+        hits = self.reg.counter("hits_total", "Попадания", ("result",))
+        hits.labels(result="hit").inc()
+        hits.labels(result="hit").inc(2)
+        hits.labels(result='a"b').inc()
+        self.reg.gauge("queue", "Очередь").set(5)
+        hist = self.reg.histogram("op_seconds", "Время", buckets=(0.01, 0.1))
+        for v in (0.005, 0.05, 0.05, 3.0):
+            hist.observe(v)
+
+        text = self.reg.to_prometheus()
+        self.assertIn("# TYPE valutatrade_hits_total counter", text)
+        self.assertIn('valutatrade_hits_total{result="hit"} 3', text)
+        self.assertIn('valutatrade_hits_total{result="a\\"b"} 1', text)
+        self.assertIn("valutatrade_queue 5", text)
+        self.assertIn('valutatrade_op_seconds_bucket{le="0.01"} 1', text)
+        self.assertIn('valutatrade_op_seconds_bucket{le="0.1"} 3', text)
+        self.assertIn('valutatrade_op_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn("valutatrade_op_seconds_count 4", text)
+        self.assertIn("valutatrade_op_seconds_sum 3.105", text)
+
+    def test_unlabeled_metric_exported_as_zero(self) -> None:
+        self.reg.counter("refresh_total", "Обновления")
+        self.assertIn("valutatrade_refresh_total 0", self.reg.to_prometheus())
+
+    def test_kind_conflict(self) -> None:
+        self.reg.counter("x_total", "x")
+        with self.assertRaises(ValueError):
+            self.reg.gauge("x_total", "x")
+
+    def test_timed_and_reset(self) -> None:
+        seconds = self.reg.histogram("call_seconds", "t", ("op",))
+        errors = self.reg.counter("call_errors_total", "e", ("op",))
+
+        @timed(seconds, errors, op="div")
+        def div(a: int, b: int) -> float:
+            return a / b
+
+        div(1, 2)
+        with self.assertRaises(ZeroDivisionError):
+            div(1, 0)
+        snap = self.reg.snapshot()
+        self.assertEqual(snap["valutatrade_call_seconds"]["values"][0]["count"], 2)
+        self.assertEqual(snap["valutatrade_call_errors_total"]["values"][0]["value"], 1)
+
+        self.reg.reset()
+        snap = self.reg.snapshot()
+        self.assertEqual(snap["valutatrade_call_seconds"]["values"][0]["count"], 0)
+
+    def test_write_files(self) -> None:
+        self.reg.counter("w_total", "w").inc()
+        with tempfile.TemporaryDirectory() as tmp:
+            prom, snap = self.reg.write(Path(tmp))
+            self.assertIn("valutatrade_w_total 1", prom.read_text("utf-8"))
+            data = json.loads(snap.read_text("utf-8"))
+            self.assertEqual(data["valutatrade_w_total"]["values"][0]["value"], 1)
+            self.assertEqual(
+                sorted(p.name for p in Path(tmp).iterdir()),
+                [
+                    "metrics.json",
+                    "metrics.prom",
+                ],
+            )
+
+
+class TestInstrumentation(unittest.TestCase):
+    def count(self, name: str, **labels: str) -> float:
+        child = REGISTRY.get(name).labels(**labels)
+        return sum(child.counts) if hasattr(child, "counts") else child.value
+
+    def test_usecase_and_storage(self) -> None:
+        before_rate = self.count("usecase_seconds", op="get_rate")
+        before_err = self.count("usecase_errors_total", op="get_rate")
+        get_rate("USD", "USD")
+        with self.assertRaises(ValueError):
+            get_rate("USD", "XXX")
+        self.assertEqual(self.count("usecase_seconds", op="get_rate"), before_rate + 2)
+        self.assertEqual(
+            self.count("usecase_errors_total", op="get_rate"), before_err + 1
+        )
+
+        written = self.count("storage_bytes_total", op="write")
+        read = self.count("storage_bytes_total", op="read")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "x.json"
+            write_json(path, {"a": 1})
+            read_json(path, default={})
+            size = path.stat().st_size
+        self.assertEqual(self.count("storage_bytes_total", op="write"), written + size)
+        self.assertEqual(self.count("storage_bytes_total", op="read"), read + size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -48,6 +48,20 @@ class TestModels(unittest.TestCase):
         with self.assertRaises(ValueError):
             w.balance = -5
 
+    def test_models_use_slots(self) -> None:
+        with self.assertRaises(AttributeError):
+            Wallet("USD", 1.0).extra = 1
+
+    def test_portfolio_wallets_read_only(self) -> None:
+        user = User.create_new(user_id=1, username="alice", password="1234")
+        p = Portfolio(user=user)
+        p.add_currency("USD")
+        # wallets - представление без копирования, изменять его нельзя
+        with self.assertRaises(TypeError):
+            p.wallets["EUR"] = Wallet("EUR")
+        p.add_currency("EUR")
+        self.assertEqual(sorted(p.wallets), ["EUR", "USD"])
+
     def test_portfolio_total_value(self) -> None:
         user = User.create_new(user_id=1, username="alice", password="1234")
         p = Portfolio(user=user)
@@ -0,0 +1,221 @@
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.core.datacache import DataCache
+from valutatrade_hub.core.orders import OrderStore, TriggerBook
+from valutatrade_hub.core.usecases import (
+    buy_currency,
+    cancel_order,
+    list_orders,
+    login,
+    place_order,
+    process_rate_update,
+    register,
+)
+from valutatrade_hub.core.utils import (
+    ORDERS_JSON,
+    ORDERS_LOG,
+    PORTFOLIOS_JSON,
+    load_portfolios,
+    read_json_file,
+    write_json,
+)
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+
+class TestTriggerBook(unittest.TestCase):
+    def test_pop_crossed(self) -> None:
+        book = TriggerBook.from_orders(
+            [
+                (1, "BTC_USD", "le", 50000.0),
+                (2, "BTC_USD", "le", 40000.0),
+                (3, "BTC_USD", "ge", 70000.0),
+            ]
+        )
+        book.add(4, "BTC_USD", "le", 55000.0)
+        self.assertEqual(len(book), 4)
+
+        self.assertEqual(book.pop_crossed("BTC_USD", 60000.0), [])
+        self.assertEqual(sorted(book.pop_crossed("BTC_USD", 50000.0)), [1, 4])
+        self.assertEqual(book.pop_crossed("BTC_USD", 75000.0), [3])
+        self.assertEqual(book.pop_crossed("ETH_USD", 1.0), [])
+        self.assertEqual(len(book), 1)
+
+    def test_discard(self) -> None:
+        book = TriggerBook()
+        book.add(1, "BTC_USD", "ge", 10.0)
+        book.add(2, "BTC_USD", "ge", 20.0)
+        book.discard(1)
+        self.assertEqual(book.pop_crossed("BTC_USD", 30.0), [2])
+        self.assertEqual(len(book), 0)
+
+
+class TestConditionalOrders(unittest.TestCase):
+    def setUp(self) -> None:
+        write_json(Path("data/users.json"), [])
+        write_json(Path("data/portfolios.json"), [])
+        write_json(Path("data/session.json"), {"user_id": None, "username": None})
+        write_json(Path("data/orders.json"), {"next_id": 1, "orders": []})
+        ORDERS_LOG.unlink(missing_ok=True)
+        register("alice", "1234")
+        login("alice", "1234")
+
+    def test_orders_fill_on_rate_update(self) -> None:
+        buy_currency("BTC", 1)
+        place_order("buy", "BTC", 0.5, 50000)
+        place_order("sell", "BTC", 5, 45000, kind="stop")
+        place_order("sell", "BTC", 0.25, 70000)
+
+        self.assertEqual(process_rate_update({"BTC_USD": 60000.0}), [])
+
+        fills = process_rate_update({"BTC_USD": 44000.0})
+        self.assertEqual([f["order_id"] for f in fills], [1, 2])
+        self.assertTrue(fills[0]["ok"])
+        self.assertEqual(fills[1]["error_type"], "InsufficientFundsError")
+
+        # неисполненный ордер остаётся со статусом failed и больше не срабатывает
+        orders = {o["id"]: o for o in list_orders()}
+        self.assertEqual(sorted(orders), [2, 3])
+        self.assertEqual(orders[2]["status"], "failed")
+        self.assertEqual(orders[2]["error_type"], "InsufficientFundsError")
+        self.assertEqual(orders[3]["status"], "open")
+        self.assertEqual(process_rate_update({"BTC_USD": 40000.0}), [])
+        btc = load_portfolios()[0]["wallets"]["BTC"]["balance"]
+        self.assertEqual(btc, 1.5)
+
+        cancel_order(2)
+        self.assertEqual([o["id"] for o in list_orders()], [3])
+
+    def test_book_kept_between_updates(self) -> None:
+        place_order("buy", "BTC", 0.1, 50000)
+        process_rate_update({"BTC_USD": 60000.0})
+        # книга построена; place/cancel/обновления её не перестраивают
+        with patch.object(
+            usecases, "book_from_orders", wraps=usecases.book_from_orders
+        ) as build:
+            place_order("buy", "BTC", 0.1, 40000)
+            cancel_order(1)
+            self.assertEqual(process_rate_update({"BTC_USD": 55000.0}), [])
+            fills = process_rate_update({"BTC_USD": 39000.0})
+        self.assertEqual(build.call_count, 0)
+        self.assertEqual([f["order_id"] for f in fills], [2])
+
+    def test_fill_appends_to_log(self) -> None:
+        # срабатывание дописывает строки в журнал, orders.json не переписывается
+        place_order("buy", "BTC", 0.1, 50000)
+        place_order("buy", "BTC", 0.1, 40000)
+        snapshot = ORDERS_JSON.read_bytes()
+        fills = process_rate_update({"BTC_USD": 45000.0})
+        self.assertEqual([f["order_id"] for f in fills], [1])
+        self.assertEqual(ORDERS_JSON.read_bytes(), snapshot)
+        ops = [e["op"] for e in OrderStore(ORDERS_JSON, ORDERS_LOG).read_log()[0]]
+        self.assertEqual(ops, ["place", "place", "fill"])
+
+    def test_fill_written_before_log_in_deferred_cache(self) -> None:
+        # в кэше с отложенной записью сделка сработавшего ордера пишется на
+        # диск до записи fill в журнал ордеров
+        buy_currency("BTC", 1)
+        place_order("sell", "BTC", 0.5, 70000)
+        with DataCache(flush_interval=None) as cache:
+            with cache.transaction():
+                fills = process_rate_update({"BTC_USD": 71000.0})
+                self.assertTrue(fills[0]["ok"])
+                on_disk = read_json_file(PORTFOLIOS_JSON, [])
+                self.assertEqual(on_disk[0]["wallets"]["BTC"]["balance"], 0.5)
+            self.assertEqual(cache.dirty(), [])
+
+    def test_log_compaction(self) -> None:
+        buy_currency("BTC", 1)
+        with patch.object(usecases, "ORDER_LOG_COMPACT_MIN", 4):
+            for price in (50000, 40000, 30000):
+                place_order("buy", "BTC", 0.1, price)
+            place_order("sell", "BTC", 5, 70000)  # 4 записи - свёртка
+            self.assertEqual(ORDERS_LOG.stat().st_size, 0)
+            fills = process_rate_update({"BTC_USD": 75000.0})
+            self.assertEqual(fills[0]["error_type"], "InsufficientFundsError")
+            cancel_order(3)
+
+        store = OrderStore(ORDERS_JSON, ORDERS_LOG)
+        state = store.state()
+        self.assertEqual(state["next_id"], 5)
+        orders = {o["id"]: o["status"] for o in state["orders"]}
+        self.assertEqual(orders, {1: "open", 2: "open", 4: "failed"})
+        # повторное применение журнала к свёрнутому снимку (сбой между
+        # записью снимка и очисткой журнала) ничего не меняет
+        events = store.read_log()[0]
+        store.compact()
+        store.append(events)
+        self.assertEqual(store.state(), state)
+
+    def test_order_written_by_other_process(self) -> None:
+        process_rate_update({"BTC_USD": 60000.0})
+        # другой процесс дописал ордер в журнал: индекс дочитывает его
+        OrderStore(ORDERS_JSON, ORDERS_LOG).append(
+            [
+                {
+                    "op": "place",
+                    "order": {
+                        "id": 5,
+                        "user_id": 1,
+                        "side": "buy",
+                        "kind": "limit",
+                        "currency_code": "BTC",
+                        "amount": 0.1,
+                        "pair": "BTC_USD",
+                        "price": 59000.0,
+                        "direction": "le",
+                        "status": "open",
+                    },
+                }
+            ]
+        )
+        self.assertEqual(process_rate_update({"BTC_USD": 59500.0}), [])
+        # и переписал снимок: индекс строится заново
+        data = OrderStore(ORDERS_JSON, ORDERS_LOG).compact()
+        data["orders"].append(
+            {
+                "id": 7,
+                "user_id": 1,
+                "side": "buy",
+                "kind": "limit",
+                "currency_code": "BTC",
+                "amount": 0.1,
+                "pair": "BTC_USD",
+                "price": 59000.0,
+                "direction": "le",
+                "status": "open",
+            }
+        )
+        write_json(Path("data/orders.json"), data)
+        fills = process_rate_update({"BTC_USD": 58000.0})
+        self.assertEqual([f["order_id"] for f in fills], [5, 7])
+        self.assertEqual(place_order("buy", "BTC", 0.1, 1)["id"], 8)
+
+    def test_concurrent_place_order(self) -> None:
+        # 4 процесса по 20 ордеров: ни один не потерян, id не повторяются
+        script = (
+            "from valutatrade_hub.core.sessions import token_scope\n"
+            "from valutatrade_hub.core.usecases import login, place_order\n"
+            "token = login('alice', '1234', set_default=False)['token']\n"
+            "with token_scope(token):\n"
+            "    for _ in range(20):\n"
+            "        place_order('buy', 'BTC', 0.1, 1000)\n"
+        )
+        env = {**os.environ, "PYTHONPATH": str(SRC)}
+        procs = [
+            subprocess.Popen([sys.executable, "-c", script], env=env) for _ in range(4)
+        ]
+        for p in procs:
+            self.assertEqual(p.wait(timeout=60), 0)
+        ids = [o["id"] for o in OrderStore(ORDERS_JSON, ORDERS_LOG).state()["orders"]]
+        self.assertEqual(sorted(ids), list(range(1, 81)))
+
+
+if __name__ == "__main__":
+    unittest.main()
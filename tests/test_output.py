@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import unittest
+
+from valutatrade_hub.cli.output import (
+    RATE_FIELDS,
+    iter_rate_rows,
+    top_rows,
+    write_rows,
+)
+
+DATA = {
+    "source": "ExchangeRate-API",
+    "last_refresh": "2025-10-10T12:00:00Z",
+    "pairs": {
+        "EUR_USD": {"rate": 1.07, "updated_at": "2025-10-10T11:00:00Z"},
+        "BTC_USD": {"rate": 59337.21, "source": "CoinGecko"},
+        "ETH_USD": 3720.0,
+        "RUB_USD": {"rate": None},
+        "BTC_EUR": 55000.0,
+    },
+}
+
+
+def render(rows, fmt: str) -> str:
+    out = io.StringIO()
+    write_rows(rows, fmt, RATE_FIELDS, out)
+    return out.getvalue()
+
+
+class TestRateRows(unittest.TestCase):
+    def test_rows_and_filter(self) -> None:
+        rows = list(iter_rate_rows(DATA, currency="btc"))
+        pairs = [(r["from"], r["to"]) for r in rows]
+        self.assertEqual(pairs, [("BTC", "USD"), ("BTC", "EUR")])
+        self.assertEqual(rows[0]["source"], "CoinGecko")
+        self.assertEqual(rows[0]["updated_at"], "2025-10-10T12:00:00Z")
+        self.assertEqual(rows[1]["source"], "ExchangeRate-API")
+
+    def test_top_puts_missing_rates_last(self) -> None:
+        rows = top_rows(iter_rate_rows(DATA), 5)
+        self.assertEqual(
+            [r["from"] + r["to"] for r in rows],
+            ["BTCUSD", "BTCEUR", "ETHUSD", "EURUSD", "RUBUSD"],
+        )
+        self.assertEqual(len(top_rows(iter_rate_rows(DATA), 2)), 2)
+
+    def test_formats(self) -> None:
+        rows = list(iter_rate_rows(DATA))
+
+        self.assertEqual(json.loads(render(rows, "json")), rows)
+        self.assertEqual(json.loads(render([], "json")), [])
+
+        lines = render(rows, "ndjson").splitlines()
+        self.assertEqual([json.loads(x) for x in lines], rows)
+
+        parsed = list(csv.DictReader(io.StringIO(render(rows, "csv"))))
+        self.assertEqual(parsed[0]["from"], "EUR")
+        self.assertEqual(parsed[2]["rate"], "3720.0")
+
+        self.assertIn("| from |", render(rows, "table"))
+        with self.assertRaises(ValueError):
+            render(rows, "xml")
+
+    def test_streaming_consumes_lazily(self) -> None:
+        # строка пишется до того, как сгенерирована следующая
+        out = io.StringIO()
+        seen = []
+
+        def rows():
+            for i in range(3):
+                seen.append(out.getvalue().count("\n"))
+                yield {"from": f"C{i}", "to": "USD", "rate": i}
+
+        write_rows(rows(), "ndjson", RATE_FIELDS, out)
+        self.assertEqual(seen, [0, 1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
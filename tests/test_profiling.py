@@ -0,0 +1,83 @@
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from valutatrade_hub.core.utils import read_json, write_json
+from valutatrade_hub.infra import profiling
+from valutatrade_hub.infra.profiling import (
+    disable_spans,
+    enable_spans,
+    parse_modes,
+    profile_call,
+    span,
+)
+
+
+class TestSpans(unittest.TestCase):
+    def test_disabled_spans_record_nothing(self) -> None:
+        with span("read_json"):
+            pass
+        self.assertIsNone(profiling._spans)
+        self.assertEqual(disable_spans(), [])
+
+    def test_enabled_spans_aggregate(self) -> None:
+        enable_spans()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "x.json"
+            write_json(path, {"a": 1})
+            for _ in range(3):
+                read_json(path, default={})
+        rows = {name: n for name, n, _ in disable_spans()}
+        self.assertEqual(rows, {"write_json": 1, "read_json": 3})
+        self.assertIsNone(profiling._spans)
+
+    def test_parse_modes(self) -> None:
+        self.assertEqual(parse_modes("cpu, MEM"), {"cpu", "mem"})
+        self.assertEqual(parse_modes("all"), {"spans", "cpu", "mem"})
+        with self.assertRaises(ValueError):
+            parse_modes("gpu")
+
+
+class TestProfileCall(unittest.TestCase):
+    def run_profiled(self, func, modes: str) -> tuple[Path, str]:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        out_dir = Path(self.tmp.name)
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            try:
+                self.result = profile_call(func, "test-cmd", modes, out_dir=out_dir)
+            except RuntimeError:
+                self.result = None
+        return out_dir, err.getvalue()
+
+    def test_cpu_and_mem_report(self) -> None:
+        def work() -> int:
+            with span("valuation"):
+                data = [str(i) * 10 for i in range(20000)]
+            return len(data)
+
+        out_dir, err = self.run_profiled(work, "cpu,mem")
+        self.assertEqual(self.result, 20000)
+        self.assertEqual(len(list(out_dir.glob("test-cmd-*.pstats"))), 1)
+        report = next(out_dir.glob("test-cmd-*.txt")).read_text("utf-8")
+        self.assertIn("valuation", report)
+        self.assertIn("cProfile", report)
+        self.assertIn("tracemalloc", report)
+        self.assertIn("valuation", err)
+
+    def test_report_written_on_error(self) -> None:
+        def fail() -> None:
+            with span("ensure_rates_fresh"):
+                raise RuntimeError("boom")
+
+        out_dir, _ = self.run_profiled(fail, "spans")
+        self.assertEqual(list(out_dir.glob("*.pstats")), [])
+        report = next(out_dir.glob("test-cmd-*.txt")).read_text("utf-8")
+        self.assertIn("ensure_rates_fresh", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
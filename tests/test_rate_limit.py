@@ -0,0 +1,102 @@
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from valutatrade_hub.parser_service.api_clients import (
+    ApiRequestError,
+    CoinGeckoClient,
+    RateLimitDeferred,
+)
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.rate_limit import (
+    Quota,
+    RateLimiter,
+    parse_retry_after,
+)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "limits.json"
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_token_bucket_persists_between_instances(self) -> None:
+        quotas = {"S": Quota.parse("2/10")}
+        a = RateLimiter(self.path, quotas)
+        self.assertEqual(a.acquire("S", now=100.0), 0.0)
+        self.assertEqual(a.acquire("S", now=100.0), 0.0)
+
+        # другой "процесс" видит то же ведро: токенов нет, ждать 5 с
+        b = RateLimiter(self.path, quotas)
+        self.assertAlmostEqual(b.acquire("S", now=100.0), 5.0)
+        self.assertEqual(b.acquire("S", now=105.0), 0.0)
+
+        # ожидание токена - ещё не отказ; отложенный запрос отмечает defer()
+        stats = b.stats()["S"]
+        self.assertEqual((stats["served"], stats["deferred"]), (3, 0))
+        b.defer("S", now=105.0)
+        self.assertEqual(b.stats()["S"]["deferred"], 1)
+
+    def test_throttled_backoff(self) -> None:
+        limiter = RateLimiter(self.path, {"S": Quota.parse("100/1")})
+        limiter.on_throttled("S", retry_after=30.0, now=0.0)
+        self.assertAlmostEqual(limiter.acquire("S", now=10.0), 20.0)
+
+        # без Retry-After пауза растёт экспоненциально
+        self.assertEqual(limiter.on_throttled("S", None, now=100.0), 10.0)
+        self.assertEqual(limiter.on_throttled("S", None, now=100.0), 20.0)
+        self.assertEqual(limiter.stats()["S"]["throttled"], 3)
+
+    def test_parse_retry_after(self) -> None:
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertIsNone(parse_retry_after(None))
+        when = "Thu, 01 Jan 1970 00:01:40 GMT"
+        self.assertEqual(parse_retry_after(when, now=40.0), 60.0)
+
+    def test_client_defers_after_429(self) -> None:
+        cfg = replace(
+            ParserConfig.from_env(),
+            fetch_cache_file=Path(self.tmp.name) / "cache.json",
+            rate_limit_file=self.path,
+            rate_limit_max_wait=0.0,
+            crypto_top=0,
+        )
+        session = MagicMock()
+        session.get.return_value = MagicMock(
+            status_code=429, headers={"Retry-After": "60"}
+        )
+        client = CoinGeckoClient(cfg, session=session)
+
+        with self.assertRaises(ApiRequestError):
+            client.fetch_rates()
+        with self.assertRaises(RateLimitDeferred):
+            client.fetch_rates()
+        self.assertEqual(session.get.call_count, 1)
+        stats = client.rate_limiter.stats()["CoinGecko"]
+        self.assertEqual((stats["served"], stats["deferred"]), (1, 1))
+
+    def test_short_wait_is_not_deferred(self) -> None:
+        # ожидание в пределах rate_limit_max_wait укладывается в запрос
+        cfg = replace(
+            ParserConfig.from_env(),
+            fetch_cache_file=Path(self.tmp.name) / "cache.json",
+            rate_limit_file=self.path,
+            rate_limit_max_wait=1.0,
+            rate_quotas={"CoinGecko": Quota.parse("1/0.05")},
+            crypto_top=0,
+            conditional_fetch=False,
+        )
+        client = CoinGeckoClient(cfg, session=MagicMock())
+        client._take_token()
+        client._take_token()
+        stats = client.rate_limiter.stats()["CoinGecko"]
+        self.assertEqual((stats["served"], stats["deferred"]), (2, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
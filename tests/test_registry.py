@@ -0,0 +1,111 @@
+import sys
+import tempfile
+import textwrap
+import unittest
+from dataclasses import replace
+from importlib.metadata import EntryPoint
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.test_updater import FakeClient, make_config
+from valutatrade_hub.parser_service.registry import (
+    ENTRY_POINT_GROUP,
+    SourceRegistry,
+    SourceSpec,
+)
+from valutatrade_hub.parser_service.updater import RatesUpdater
+
+PLUGIN_SOURCE = textwrap.dedent(
+    """
+    from valutatrade_hub.parser_service.api_clients import BaseApiClient, FetchResult
+
+    class PluginClient(BaseApiClient):
+        @property
+        def source_name(self):
+            return "Plugin"
+
+        def provided_pairs(self):
+            return frozenset({"XAU_USD"})
+
+        def fetch_rates(self):
+            return FetchResult({"XAU_USD": 2000.0}, "Plugin", {})
+    """
+)
+
+
+class TestSourceRegistry(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cfg = make_config(self.tmp.name)
+        # модуль плагина, который ещё никто не импортировал
+        self.module = f"vt_plugin_{id(self)}"
+        Path(self.tmp.name, f"{self.module}.py").write_text(PLUGIN_SOURCE)
+        sys.path.insert(0, self.tmp.name)
+
+    def tearDown(self) -> None:
+        sys.path.remove(self.tmp.name)
+        sys.modules.pop(self.module, None)
+        self.tmp.cleanup()
+
+    def registry(self, rate_sources=("coingecko", "exchangerate")) -> SourceRegistry:
+        cfg = replace(self.cfg, rate_sources=rate_sources)
+        eps = [EntryPoint("plugin", f"{self.module}:PluginClient", ENTRY_POINT_GROUP)]
+        with patch(
+            "valutatrade_hub.parser_service.registry.entry_points", return_value=eps
+        ):
+            return SourceRegistry.from_config(cfg)
+
+    def test_entry_point_loaded_only_when_selected(self) -> None:
+        reg = self.registry()
+        self.assertIn("plugin", reg.names())
+        self.assertEqual(reg.enabled, ("coingecko", "exchangerate"))
+
+        reg.build(self.cfg, "coingecko")
+        self.assertNotIn(self.module, sys.modules)
+
+        clients = reg.build(self.cfg, "plugin,coingecko")
+        self.assertIn(self.module, sys.modules)
+        self.assertEqual([c.source_key for c in clients], ["plugin", "coingecko"])
+
+    def test_config_list_adds_and_enables_sources(self) -> None:
+        reg = self.registry(("extra=" + f"{self.module}:PluginClient",))
+        self.assertEqual(reg.enabled, ("extra",))
+        [client] = reg.build(self.cfg)
+        self.assertEqual(client.source_name, "Plugin")
+
+    def test_unknown_source(self) -> None:
+        reg = self.registry()
+        with self.assertRaises(ValueError):
+            reg.resolve("coingecko,nope")
+        with self.assertRaises(ValueError):
+            self.registry(("nope",))
+        with self.assertRaises(ValueError):
+            SourceSpec("bad", "no_such_module:X").load()
+
+    def test_pairs_skip_unneeded_sources(self) -> None:
+        reg = self.registry()
+        cfg = replace(self.cfg, crypto_top=0, fiat_currencies=("EUR",))
+        clients = reg.build(cfg, "all", pairs=["BTC_USD"])
+        self.assertEqual([c.source_key for c in clients], ["coingecko"])
+        # при полном наборе фиата пары ExchangeRate-API заранее неизвестны
+        cfg = replace(self.cfg, fiat_currencies=None)
+        clients = reg.build(cfg, "all", pairs=["BTC_USD"])
+        self.assertEqual(len(clients), 2)
+
+    def test_updater_filters_by_source_and_pairs(self) -> None:
+        a = FakeClient(self.cfg, "A", {"BTC_USD": 1.0})
+        a.source_key = "a"
+        b = FakeClient(self.cfg, "B", {"EUR_USD": 2.0})
+        b.source_key = "b"
+        b.provided_pairs = lambda: frozenset({"EUR_USD"})
+        updater = RatesUpdater(self.cfg, [a, b])
+
+        self.assertEqual(set(updater.run_update(source="a")["sources"]), {"A"})
+        self.assertEqual(set(updater.run_update(source="a,b")["sources"]), {"A", "B"})
+        # A пары не объявил - его нельзя исключить по парам
+        res = updater.run_update(pairs=["BTC_USD"])
+        self.assertEqual(set(res["sources"]), {"A"})
+
+
+if __name__ == "__main__":
+    unittest.main()
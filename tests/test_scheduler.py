@@ -0,0 +1,101 @@
+import random
+import tempfile
+import threading
+import unittest
+
+from tests.test_updater import FakeClient, make_config
+from valutatrade_hub.parser_service.scheduler import WatchLoop
+from valutatrade_hub.parser_service.storage import load_history, load_rates_cache
+from valutatrade_hub.parser_service.updater import RatesUpdater
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestWatchLoop(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cfg = make_config(
+            self.tmp.name,
+            poll_intervals={"Fast": 10.0, "Slow": 100.0},
+            watch_jitter=0.0,
+            watch_backoff_base=2.0,
+            watch_backoff_max=5.0,
+            breaker_threshold=100,
+        )
+        self.clock = FakeClock()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def make_loop(self, *clients) -> WatchLoop:
+        updater = RatesUpdater(self.cfg, list(clients))
+        return WatchLoop(updater, clock=self.clock, rng=random.Random(1))
+
+    def test_per_source_intervals(self) -> None:
+        fast = FakeClient(self.cfg, "Fast", {"BTC_USD": 1.0})
+        slow = FakeClient(self.cfg, "Slow", {"EUR_USD": 2.0})
+        loop = self.make_loop(fast, slow)
+
+        res = loop.tick()
+        self.assertEqual(set(res["sources"]), {"Fast", "Slow"})
+
+        self.clock.now += 10
+        res = loop.tick()
+        self.assertEqual(set(res["sources"]), {"Fast"})
+
+        # пары не опрошенного источника остаются в кэше
+        pairs = load_rates_cache(self.cfg.rates_file)["pairs"]
+        self.assertEqual(set(pairs), {"BTC_USD", "EUR_USD"})
+        self.assertEqual(len(load_history(self.cfg.history_file)), 3)
+
+        self.clock.now += 5
+        self.assertIsNone(loop.tick())
+
+    def test_backoff_on_failure(self) -> None:
+        bad = FakeClient(self.cfg, "Fast", {}, fail=True)
+        loop = self.make_loop(bad)
+
+        delays = []
+        for _ in range(4):
+            self.clock.now = loop.next_due()
+            loop.tick()
+            delays.append(loop.next_due() - self.clock.now)
+        self.assertEqual(delays, [2.0, 4.0, 5.0, 5.0])
+
+        bad._fail = False
+        self.clock.now = loop.next_due()
+        loop.tick()
+        self.assertEqual(loop.schedules[0].failures, 0)
+        self.assertEqual(loop.next_due() - self.clock.now, 10.0)
+
+    def test_jitter_bounds(self) -> None:
+        self.cfg = make_config(
+            self.tmp.name, poll_intervals={"Fast": 10.0}, watch_jitter=0.2
+        )
+        loop = self.make_loop(FakeClient(self.cfg, "Fast", {"BTC_USD": 1.0}))
+        for _ in range(20):
+            self.clock.now = loop.next_due()
+            loop.tick()
+            self.assertTrue(8.0 <= loop.next_due() - self.clock.now <= 12.0)
+
+    def test_stop_interrupts_wait(self) -> None:
+        cfg = make_config(self.tmp.name, poll_intervals={"Fast": 3600.0})
+        updater = RatesUpdater(cfg, [FakeClient(cfg, "Fast", {"BTC_USD": 1.0})])
+        loop = WatchLoop(updater)
+        t = threading.Thread(target=loop.run)
+        t.start()
+        threading.Timer(0.2, loop.stop).start()
+        t.join(timeout=5)
+
+        self.assertFalse(t.is_alive())
+        self.assertEqual(loop.ticks, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import io
+import json
+import unittest
+from pathlib import Path
+
+from valutatrade_hub.cli.script import run_script
+from valutatrade_hub.core.usecases import login, register
+from valutatrade_hub.core.utils import write_json
+
+
+class TestRunScript(unittest.TestCase):
+    def setUp(self) -> None:
+        write_json(Path("data/users.json"), [])
+        write_json(Path("data/portfolios.json"), [])
+        write_json(Path("data/session.json"), {"user_id": None, "username": None})
+
+    def run_lines(self, lines: list[str], **kwargs) -> tuple[dict, list[dict]]:
+        out = io.StringIO()
+        counts = run_script(lines, out=out, **kwargs)
+        return counts, [json.loads(x) for x in out.getvalue().splitlines()]
+
+    def test_ndjson_results_and_single_flush(self) -> None:
+        lines = [
+            "# подготовка",
+            "register erin 1234",
+            "login erin 1234",
+            "",
+            *["buy EUR 1"] * 50,
+            "sell EUR 100",
+            "get-rate EUR USD",
+            "buy",
+        ]
+        counts, records = self.run_lines(lines)
+
+        self.assertEqual(counts["ok"], 53)
+        self.assertEqual(counts["failed"], 2)
+        # users.json, portfolios.json, session.json, rates.json - по одному разу
+        self.assertLessEqual(counts["flushed"], 4)
+
+        self.assertEqual(records[0]["line"], 2)
+        self.assertEqual(records[0]["command"], "register erin 1234")
+        self.assertIn("баланс=50.0", records[51]["output"])
+        self.assertFalse(records[52]["ok"])
+        self.assertIn("Недостаточно", records[52]["error"])
+        self.assertIn("Курс EUR -> USD", records[53]["output"])
+        # ошибка разбора аргументов тоже попадает в результат
+        self.assertIn("required", records[54]["error"])
+
+        portfolios = json.loads(Path("data/portfolios.json").read_text("utf-8"))
+        self.assertEqual(portfolios[0]["wallets"]["EUR"]["balance"], 50.0)
+
+    def test_token_per_line(self) -> None:
+        register("gina", "1234")
+        register("hank", "1234")
+        hank = login("hank", "1234", set_default=False)["token"]
+        lines = ["login gina 1234", "buy EUR 2", f"--token {hank} buy EUR 7"]
+        counts, records = self.run_lines(lines)
+        self.assertEqual(counts["failed"], 0)
+
+        portfolios = json.loads(Path("data/portfolios.json").read_text("utf-8"))
+        balances = {p["user_id"]: p["wallets"]["EUR"]["balance"] for p in portfolios}
+        self.assertEqual(balances, {1: 2.0, 2: 7.0})
+
+    def test_stop_on_error(self) -> None:
+        lines = ["buy EUR 1", "register frank 1234"]
+        counts, records = self.run_lines(lines, stop_on_error=True)
+        self.assertEqual(len(records), 1)
+        self.assertIn("login", records[0]["error"])
+
+        counts, records = self.run_lines(lines)
+        self.assertEqual((counts["ok"], counts["failed"]), (1, 1))
+
+    def test_nested_modes_rejected(self) -> None:
+        counts, records = self.run_lines(["shell", "run -"])
+        self.assertEqual(counts["failed"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from valutatrade_hub.core.sessions import SessionStore, get_store, token_scope
+from valutatrade_hub.core.usecases import (
+    buy_currency,
+    get_current_user,
+    login,
+    logout,
+    register,
+)
+from valutatrade_hub.core.utils import read_json, write_json
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+DATA_FILES = [
+    Path("data/users.json"),
+    Path("data/portfolios.json"),
+    Path("data/session.json"),
+]
+
+
+class TestSessionStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "sessions.db"
+        self.store = SessionStore(self.path, ttl=60, cache_ttl=30)
+
+    def tearDown(self) -> None:
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_create_get_revoke(self) -> None:
+        token = self.store.create(1, "alice")
+        session = self.store.get(token)
+        self.assertEqual((session["user_id"], session["username"]), (1, "alice"))
+        self.assertIsNone(self.store.get("чужой-токен"))
+
+        self.assertTrue(self.store.revoke(token))
+        self.assertIsNone(self.store.get(token))
+        self.assertFalse(self.store.revoke(token))
+
+    def test_expiry(self) -> None:
+        token = self.store.create(1, "alice", now=1000.0)
+        self.assertIsNotNone(self.store.get(token, now=1059.0))
+        self.assertIsNone(self.store.get(token, now=1060.0))
+
+        self.store.create(2, "bob", now=1000.0)
+        self.assertEqual(self.store.purge(now=2000.0), 2)
+
+    def test_token_not_stored(self) -> None:
+        token = self.store.create(1, "alice")
+        self.store.close()
+        self.assertNotIn(token.encode(), self.path.read_bytes())
+
+    def test_cache_and_revoke_in_other_process(self) -> None:
+        token = self.store.create(1, "alice", now=1000.0)
+        other = SessionStore(self.path, ttl=60, cache_ttl=30)
+        try:
+            self.assertIsNotNone(other.get(token, now=1001.0))
+            self.store.revoke(token)
+            # до конца cache_ttl другой процесс видит сессию из памяти
+            self.assertIsNotNone(other.get(token, now=1010.0))
+            self.assertIsNone(other.get(token, now=1032.0))
+        finally:
+            other.close()
+
+    def test_concurrent_processes(self) -> None:
+        # 4 процесса по 50 сессий в одну базу: ни одна запись не потеряна
+        script = (
+            "import sys\n"
+            "from pathlib import Path\n"
+            "from valutatrade_hub.core.sessions import SessionStore\n"
+            "store = SessionStore(Path(sys.argv[1]), ttl=60)\n"
+            "for i in range(50):\n"
+            "    print(store.create(int(sys.argv[2]), 'u'))\n"
+        )
+        env = {**os.environ, "PYTHONPATH": str(SRC)}
+        procs = [
+            subprocess.Popen(
+                [sys.executable, "-c", script, str(self.path), str(uid)],
+                env=env,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            for uid in range(1, 5)
+        ]
+        tokens = []
+        for uid, p in enumerate(procs, 1):
+            out, _ = p.communicate(timeout=60)
+            self.assertEqual(p.returncode, 0)
+            tokens.append((uid, out.split()))
+
+        for uid, issued in tokens:
+            self.assertEqual(len(issued), 50)
+            for token in issued:
+                self.assertEqual(self.store.get(token)["user_id"], uid)
+
+
+class TestTokenSessions(unittest.TestCase):
+    def setUp(self) -> None:
+        self.backup = {str(p): p.read_bytes() for p in DATA_FILES if p.exists()}
+        write_json(Path("data/users.json"), [])
+        write_json(Path("data/portfolios.json"), [])
+        write_json(Path("data/session.json"), {"token": None})
+        register("alice", "1234")
+        register("bob", "1234")
+
+    def tearDown(self) -> None:
+        for p in DATA_FILES:
+            if str(p) in self.backup:
+                p.write_bytes(self.backup[str(p)])
+
+    def test_two_users_in_parallel(self) -> None:
+        # alice - сессия по умолчанию, bob - по своему токену
+        alice = login("alice", "1234")["token"]
+        bob = login("bob", "1234", set_default=False)["token"]
+        self.assertEqual(read_json(Path("data/session.json"), {})["token"], alice)
+
+        self.assertEqual(get_current_user()["username"], "alice")
+        with token_scope(bob):
+            self.assertEqual(get_current_user()["username"], "bob")
+            self.assertEqual(buy_currency("EUR", 5)["balance"], 5.0)
+        # покупка alice попадает в её портфель, а не в портфель bob
+        self.assertEqual(buy_currency("EUR", 1)["balance"], 1.0)
+        with token_scope(bob):
+            self.assertEqual(buy_currency("EUR", 1)["balance"], 6.0)
+
+        # выход bob не трогает сессию alice
+        with token_scope(bob):
+            logout()
+            self.assertIsNone(get_current_user())
+        self.assertEqual(get_current_user()["username"], "alice")
+        self.assertIsNone(get_store().get(bob))
+
+        logout()
+        self.assertIsNone(get_current_user())
+        self.assertIsNone(get_store().get(alice))
+
+    def test_unknown_token(self) -> None:
+        login("alice", "1234")
+        with token_scope("нет-такого"):
+            self.assertIsNone(get_current_user())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,245 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from valutatrade_hub.cli.shell import run_shell
+from valutatrade_hub.core.datacache import DataCache
+from valutatrade_hub.core.exceptions import DataConflictError
+from valutatrade_hub.core.sessions import token_scope
+from valutatrade_hub.core.usecases import login, register
+from valutatrade_hub.core.utils import append_data, read_json, write_json
+
+
+class TestDataCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "data.json"
+        self.path.write_text(json.dumps({"n": 1}), encoding="utf-8")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_file_parsed_once(self) -> None:
+        with DataCache() as cache:
+            first = read_json(self.path, default={})
+            for _ in range(10):
+                self.assertIs(read_json(self.path, default={}), first)
+        self.assertEqual(cache.stats["loads"], 1)
+        self.assertEqual(cache.stats["hits"], 10)
+
+    def test_external_change_is_reloaded(self) -> None:
+        with DataCache():
+            self.assertEqual(read_json(self.path, default={}), {"n": 1})
+            self.path.write_text(json.dumps({"n": 22}), encoding="utf-8")
+            self.assertEqual(read_json(self.path, default={}), {"n": 22})
+
+    def test_writes_deferred_until_flush(self) -> None:
+        cache = DataCache(flush_interval=3600).start()
+        try:
+            write_json(self.path, {"n": 2})
+            self.assertEqual(read_json(self.path, default={}), {"n": 2})
+            on_disk = json.loads(self.path.read_text(encoding="utf-8"))
+            self.assertEqual(on_disk, {"n": 1})
+            self.assertEqual(cache.dirty(), [os.path.abspath(self.path)])
+        finally:
+            cache.close()
+        # close() сбрасывает изменения и снимает кэш
+        self.assertEqual(json.loads(self.path.read_text(encoding="utf-8")), {"n": 2})
+        self.assertEqual(read_json(self.path, default={}), {"n": 2})
+
+    def test_write_through(self) -> None:
+        with DataCache(flush_interval=0):
+            write_json(self.path, {"n": 3})
+            on_disk = json.loads(self.path.read_text(encoding="utf-8"))
+            self.assertEqual(on_disk, {"n": 3})
+
+    def test_conflict_at_flush(self) -> None:
+        # файл изменил другой процесс после чтения: изменения кэша не
+        # записываются поверх, следующее чтение берёт файл с диска
+        cache = DataCache(flush_interval=None).start()
+        try:
+            data = read_json(self.path, default={})
+            self.path.write_text(json.dumps({"n": 22}), encoding="utf-8")
+            data["n"] = 2
+            write_json(self.path, data)
+            with self.assertRaises(DataConflictError):
+                cache.flush()
+            self.assertEqual(read_json(self.path, default={}), {"n": 22})
+        finally:
+            cache.close()
+        self.assertEqual(cache.stats["conflicts"], 1)
+        self.assertEqual(json.loads(self.path.read_text(encoding="utf-8")), {"n": 22})
+
+    def test_conflict_on_write_through(self) -> None:
+        with DataCache(flush_interval=0) as cache:
+            with self.assertRaises(DataConflictError):
+                with cache.transaction():
+                    data = read_json(self.path, default={})
+                    self.path.write_text(json.dumps({"n": 22}), encoding="utf-8")
+                    write_json(self.path, {"n": data["n"] + 1})
+            on_disk = json.loads(self.path.read_text(encoding="utf-8"))
+            self.assertEqual(on_disk, {"n": 22})
+
+    def test_failed_transaction_discarded(self) -> None:
+        with DataCache(flush_interval=None) as cache:
+            with self.assertRaises(RuntimeError):
+                with cache.transaction():
+                    data = read_json(self.path, default={})
+                    data["n"] = 5
+                    write_json(self.path, data)
+                    raise RuntimeError("команда упала на середине")
+            self.assertEqual(read_json(self.path, default={}), {"n": 1})
+            self.assertEqual(cache.dirty(), [])
+
+            with cache.transaction():
+                data = read_json(self.path, default={})
+                data["n"] = 6
+                # до конца транзакции изменения видны только ей
+                self.assertIs(read_json(self.path, default={}), data)
+                write_json(self.path, data)
+            self.assertEqual(read_json(self.path, default={}), {"n": 6})
+
+    def test_append_flushed_with_files(self) -> None:
+        # дозапись транзакции пишется вместе с её файлами; если файл изменил
+        # другой процесс, не пишется ни дозапись, ни файлы
+        log = Path(self.tmp.name) / "log.ndjson"
+        other = Path(self.tmp.name) / "other.json"
+
+        def command(n: int) -> None:
+            data = read_json(self.path, default={})
+            write_json(self.path, {"n": data["n"] + n})
+            write_json(other, {"n": n})
+            append_data(log, lambda: append_line(f"{n}\n"))
+
+        def append_line(line: str) -> None:
+            with log.open("a") as f:
+                f.write(line)
+
+        with DataCache(flush_interval=None) as cache:
+            with cache.transaction():
+                command(1)
+            self.assertFalse(log.exists())
+            self.path.write_text(json.dumps({"n": 22}), encoding="utf-8")
+            with self.assertRaises(DataConflictError):
+                cache.flush()
+            self.assertFalse(log.exists() or other.exists())
+            self.assertEqual(cache.dirty(), [])
+
+            with cache.transaction():
+                command(2)
+            self.assertEqual(cache.flush(), 2)
+            self.assertEqual(log.read_text(), "2\n")
+            on_disk = json.loads(self.path.read_text(encoding="utf-8"))
+            self.assertEqual(on_disk, {"n": 24})
+
+        # при flush_interval=0 - сразу при фиксации
+        with DataCache(flush_interval=0) as cache:
+            with cache.transaction():
+                command(3)
+            self.assertEqual(log.read_text(), "2\n3\n")
+
+
+class TestShell(unittest.TestCase):
+    def setUp(self) -> None:
+        write_json(Path("data/users.json"), [])
+        write_json(Path("data/portfolios.json"), [])
+        write_json(Path("data/session.json"), {"user_id": None, "username": None})
+
+    def test_session_in_one_process(self) -> None:
+        script = [
+            "register carol 1234",
+            "login carol 1234",
+            "buy EUR 5",
+            "buy EUR 2.5",
+            "sell EUR 1 --policy lifo",
+            "show-portfolio",
+            "get-rate EUR USD",
+            "buy XXX 1",
+            "not-a-command",
+            "exit",
+            "buy EUR 100",
+        ]
+        out, err = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            cache = run_shell(script, flush_interval=3600)
+
+        self.assertIn("Успешный вход: carol", out.getvalue())
+        self.assertIn("EUR баланс=6.5", out.getvalue())
+        self.assertIn("Курс EUR -> USD", out.getvalue())
+        # ошибки команд не завершают shell
+        self.assertIn("Ошибка", err.getvalue())
+        self.assertIn("invalid choice", err.getvalue())
+
+        # users.json и portfolios.json разобраны с диска по одному разу
+        self.assertLessEqual(cache.stats["loads"], 5)
+        self.assertGreater(cache.stats["hits"], cache.stats["loads"])
+
+        # после выхода изменения на диске, команды после exit не выполнялись
+        portfolios = json.loads(Path("data/portfolios.json").read_text("utf-8"))
+        self.assertEqual(portfolios[0]["wallets"]["EUR"]["balance"], 6.5)
+
+    def test_external_write_not_overwritten(self) -> None:
+        # пока изменения shell ждут сброса, users.json переписал другой
+        # процесс: при выходе shell сообщает о конфликте и не затирает файл
+        users = Path("data/users.json")
+
+        def lines():
+            yield "register dave 1234"
+            users.write_text("[]", encoding="utf-8")
+            yield "exit"
+
+        err = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(err):
+            cache = run_shell(lines(), flush_interval=3600)
+        self.assertIn("изменён другим процессом", err.getvalue())
+        self.assertEqual(cache.stats["conflicts"], 1)
+        self.assertEqual(json.loads(users.read_text("utf-8")), [])
+
+
+class TestShellTokens(unittest.TestCase):
+    def setUp(self) -> None:
+        write_json(Path("data/users.json"), [])
+        write_json(Path("data/portfolios.json"), [])
+        write_json(Path("data/session.json"), {"token": None})
+        register("alice", "1234")
+        register("bob", "1234")
+
+    def shell(self, lines: list[str]) -> str:
+        err = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(err):
+            run_shell(lines, flush_interval=0)
+        return err.getvalue()
+
+    def balances(self) -> dict[int, float]:
+        portfolios = json.loads(Path("data/portfolios.json").read_text("utf-8"))
+        return {
+            p["user_id"]: p["wallets"].get("EUR", {}).get("balance", 0.0)
+            for p in portfolios
+        }
+
+    def test_token_per_command(self) -> None:
+        bob = login("bob", "1234", set_default=False)["token"]
+        err = self.shell(
+            ["login alice 1234", "buy EUR 2", f"--token {bob} buy EUR 1", "buy EUR 3"]
+        )
+        self.assertEqual(err, "")
+        self.assertEqual(self.balances(), {1: 5.0, 2: 1.0})
+
+    def test_login_switches_shell_token(self) -> None:
+        # shell с --token: login выдаёт новый токен, и дальше shell работает
+        # с ним; сессия по умолчанию не меняется
+        alice = login("alice", "1234", set_default=False)["token"]
+        with token_scope(alice):
+            err = self.shell(["buy EUR 1", "login bob 1234", "buy EUR 4"])
+        self.assertEqual(err, "")
+        self.assertEqual(self.balances(), {1: 1.0, 2: 4.0})
+        session = json.loads(Path("data/session.json").read_text("utf-8"))
+        self.assertIsNone(session["token"])
+
+
+if __name__ == "__main__":
+    unittest.main()
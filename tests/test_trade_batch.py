@@ -0,0 +1,66 @@
+import unittest
+from pathlib import Path
+
+from valutatrade_hub.core.usecases import execute_trades, login, logout, register
+from valutatrade_hub.core.utils import load_portfolios, read_trade_orders, write_json
+
+
+class TestTradeBatch(unittest.TestCase):
+    def setUp(self) -> None:
+        write_json(Path("data/users.json"), [])
+        write_json(Path("data/portfolios.json"), [])
+        write_json(Path("data/session.json"), {"user_id": None, "username": None})
+        register("alice", "1234")
+        register("bob", "1234")
+        login("alice", "1234")
+
+    def test_batch_preserves_order_and_reports_errors(self) -> None:
+        results = execute_trades(
+            [
+                {"action": "buy", "currency": "EUR", "amount": 10},
+                {"action": "sell", "currency": "EUR", "amount": 4},
+                {"action": "sell", "currency": "EUR", "amount": 100},
+                {"action": "buy", "currency": "BTC", "amount": 1, "username": "bob"},
+                {"action": "buy", "currency": "ZZZ", "amount": 1},
+                {"action": "buy", "currency": "EUR", "amount": -1},
+            ]
+        )
+        self.assertEqual([r["ok"] for r in results], [1, 1, 0, 0, 0, 0])
+        self.assertEqual(results[1]["balance"], 6.0)
+        self.assertEqual(results[2]["error_type"], "InsufficientFundsError")
+        self.assertIn("другого пользователя", results[3]["error"])
+        self.assertEqual(results[4]["error_type"], "CurrencyNotFoundError")
+
+        by_user = {p["user_id"]: p["wallets"] for p in load_portfolios()}
+        self.assertEqual(by_user[1]["EUR"]["balance"], 6.0)
+        # ордер alice с username=bob не тронул портфель bob
+        self.assertEqual(by_user[2], {})
+
+    def test_orders_bound_to_logged_in_user(self) -> None:
+        results = execute_trades(
+            [
+                {"action": "buy", "currency": "EUR", "amount": 1, "username": "alice"},
+                {"action": "buy", "currency": "EUR", "amount": 1, "user_id": 1},
+                {"action": "buy", "currency": "EUR", "amount": 1, "user_id": 2},
+                {"action": "buy", "currency": "EUR", "amount": 1, "user_id": "x"},
+            ]
+        )
+        self.assertEqual([r["ok"] for r in results], [1, 1, 0, 0])
+        self.assertTrue(all(r["user_id"] == 1 for r in results[:2]))
+
+        logout()
+        with self.assertRaises(ValueError):
+            execute_trades([{"action": "buy", "currency": "EUR", "amount": 1}])
+
+    def test_read_orders_csv(self) -> None:
+        tmp = Path("data/_tmp_orders.csv")
+        tmp.write_text("action,currency,amount\nbuy,EUR,2.5\n", encoding="utf-8")
+        try:
+            orders = read_trade_orders(tmp)
+        finally:
+            tmp.unlink(missing_ok=True)
+        self.assertEqual(orders, [{"action": "buy", "currency": "EUR", "amount": 2.5}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import tempfile
+import time
+import unittest
+from dataclasses import replace
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from valutatrade_hub.parser_service.api_clients import (
+    ApiRequestError,
+    BaseApiClient,
+    CoinGeckoClient,
+    ExchangeRateApiClient,
+    FetchResult,
+)
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.storage import (
+    HistoryWriter,
+    load_history,
+    load_rates_cache,
+    make_history_record,
+    save_rates_cache,
+)
+from valutatrade_hub.parser_service.updater import RatesUpdater
+
+
+class FakeClient(BaseApiClient):
+    def __init__(self, config, name, pairs, delay=0.0, fail=False) -> None:
+        super().__init__(config)
+        self._name = name
+        self._pairs = pairs
+        self._delay = delay
+        self._fail = fail
+
+    @property
+    def source_name(self) -> str:
+        return self._name
+
+    def fetch_rates(self) -> FetchResult:
+        time.sleep(self._delay)
+        if self._fail:
+            raise ApiRequestError("boom")
+        return FetchResult(dict(self._pairs), self._name, {"request_ms": 1})
+
+
+def make_config(tmp: str, **overrides) -> ParserConfig:
+    cfg = ParserConfig.from_env()
+    return replace(
+        cfg,
+        rates_file=Path(tmp) / "rates.json",
+        history_file=Path(tmp) / "history.ndjson",
+        rate_limit_file=Path(tmp) / "rate_limits.json",
+        source_health_file=Path(tmp) / "source_health.json",
+        **overrides,
+    )
+
+
+class TestRatesUpdater(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_sources_fetched_concurrently(self) -> None:
+        cfg = make_config(self.tmp.name, update_deadline=5)
+        clients = [
+            FakeClient(cfg, "A", {"BTC_USD": 1.0}, delay=0.3),
+            FakeClient(cfg, "B", {"EUR_USD": 2.0}, delay=0.3),
+            FakeClient(cfg, "C", {}, fail=True),
+        ]
+        t0 = time.monotonic()
+        res = RatesUpdater(cfg, clients).run_update()
+        elapsed = time.monotonic() - t0
+
+        self.assertLess(elapsed, 0.55)
+        self.assertEqual(res["updated_pairs"], 2)
+        self.assertEqual(len(res["errors"]), 1)
+
+    def test_deadline_records_error(self) -> None:
+        cfg = make_config(self.tmp.name, update_deadline=0.2)
+        clients = [
+            FakeClient(cfg, "Fast", {"BTC_USD": 1.0}),
+            FakeClient(cfg, "Slow", {"EUR_USD": 2.0}, delay=2.0),
+        ]
+        t0 = time.monotonic()
+        res = RatesUpdater(cfg, clients).run_update()
+
+        self.assertLess(time.monotonic() - t0, 1.0)
+        self.assertIn("Slow", res["errors"][0])
+        pairs = load_rates_cache(cfg.rates_file)["pairs"]
+        self.assertEqual(list(pairs), ["BTC_USD"])
+
+    def test_last_refresh_kept_when_all_sources_fail(self) -> None:
+        cfg = make_config(self.tmp.name)
+        old = {"BTC_USD": {"rate": 1.0, "updated_at": "2020-01-01T00:00:00+00:00"}}
+        save_rates_cache(
+            cfg.rates_file, {"pairs": old, "last_refresh": "2020-01-01T00:00:00+00:00"}
+        )
+        res = RatesUpdater(cfg, [FakeClient(cfg, "A", {}, fail=True)]).run_update()
+
+        self.assertEqual(res["last_refresh"], "2020-01-01T00:00:00+00:00")
+        cache = load_rates_cache(cfg.rates_file)
+        self.assertEqual(cache["last_refresh"], "2020-01-01T00:00:00+00:00")
+
+        updater = RatesUpdater(cfg, [FakeClient(cfg, "A", {"EUR_USD": 2.0})])
+        res = updater.run_update()
+        self.assertNotEqual(res["last_refresh"], "2020-01-01T00:00:00+00:00")
+        self.assertEqual(
+            sorted(load_rates_cache(cfg.rates_file)["pairs"]), ["BTC_USD", "EUR_USD"]
+        )
+
+    def test_history_appended_by_several_writers(self) -> None:
+        # два процесса (updater) пишут историю: записи друг друга не теряются
+        path = Path(self.tmp.name) / "history.ndjson"
+        a, b = HistoryWriter(path), HistoryWriter(path)
+        a.append([make_history_record("BTC", "USD", 1.0, "A")])
+        b.append([make_history_record("EUR", "USD", 2.0, "B")])
+        a.append([make_history_record("BTC", "USD", 3.0, "A")])
+        self.assertEqual([r["rate"] for r in load_history(path)], [1.0, 2.0, 3.0])
+
+    def test_load_history_legacy_array(self) -> None:
+        path = Path(self.tmp.name) / "exchange_rates.json"
+        path.write_text('[{"id": "x", "rate": 1.0}]', encoding="utf-8")
+        self.assertEqual(load_history(path), [{"id": "x", "rate": 1.0}])
+
+    def test_pairs_filter_uses_cached_universe(self) -> None:
+        # как в поставляемом currencies.json: fiat "all", топ монет по рейтингу -
+        # пары известны только из прошлого обновления (rates.json)
+        cfg = make_config(self.tmp.name, fiat_currencies=None, crypto_top=100)
+        session = MagicMock()
+        cg = CoinGeckoClient(cfg, session=session)
+        fx = ExchangeRateApiClient(cfg, session=session)
+        self.assertEqual(cg.provided_pairs(), frozenset())
+
+        save_rates_cache(
+            cfg.rates_file,
+            {
+                "pairs": {
+                    "BTC_USD": {"rate": 1.0, "source": "CoinGecko"},
+                    "EUR_USD": {"rate": 1.1, "source": "ExchangeRate-API"},
+                },
+                "last_refresh": None,
+            },
+        )
+        self.assertEqual(cg.provided_pairs(), {"BTC_USD"})
+        self.assertEqual(fx.provided_pairs(), {"EUR_USD"})
+
+        # --pairs BTC_USD: ExchangeRate-API не опрашивается
+        fx.fetch_rates = MagicMock(side_effect=AssertionError("не нужен"))
+        cg.fetch_rates = MagicMock(
+            return_value=FetchResult({"BTC_USD": 2.0}, "CoinGecko", {})
+        )
+        res = RatesUpdater(cfg, [cg, fx]).run_update(pairs=["BTC_USD"])
+        self.assertEqual(list(res["sources"]), ["CoinGecko"])
+        fx.fetch_rates.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
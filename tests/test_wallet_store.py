@@ -0,0 +1,60 @@
+import unittest
+
+from valutatrade_hub.core.currencies import currency_code, currency_index
+from valutatrade_hub.core.exceptions import InsufficientFundsError
+from valutatrade_hub.core.models import Portfolio, User
+from valutatrade_hub.core.wallet_store import WalletStore
+
+
+class TestWalletStore(unittest.TestCase):
+    def test_currency_interning(self) -> None:
+        idx = currency_index("usd")
+        self.assertEqual(currency_index("USD"), idx)
+        self.assertEqual(currency_code(idx), "USD")
+
+    def test_roundtrip_and_views(self) -> None:
+        portfolios = [
+            {"user_id": 2, "wallets": {"BTC": {"currency_code": "BTC", "balance": 1}}},
+            {"user_id": 1, "wallets": {"EUR": {"currency_code": "EUR", "balance": 5}}},
+            {"user_id": 3, "wallets": {}},
+        ]
+        store = WalletStore.from_portfolios(portfolios)
+        self.assertEqual(len(store), 2)
+
+        view = store.portfolio(1)
+        view.deposit("USD", 10)
+        view.withdraw("EUR", 2)
+        self.assertEqual(view.wallets, {"USD": 10.0, "EUR": 3.0})
+        with self.assertRaises(InsufficientFundsError):
+            view.withdraw("BTC", 1)
+
+        # оценка совпадает с объектной моделью
+        p = Portfolio(User.create_new(1, "alice", "1234"))
+        p.add_currency("USD").deposit(10)
+        p.add_currency("EUR").deposit(3)
+        self.assertAlmostEqual(view.get_total_value(), p.get_total_value())
+
+        out = {p["user_id"]: p for p in store.to_portfolios(user_ids=[3])}
+        self.assertEqual(out[2]["wallets"]["BTC"]["balance"], 1.0)
+        self.assertEqual(out[3]["wallets"], {})
+        self.assertEqual(list(store.user_ids()), [1, 2])
+
+    def test_diff_against_replayed_balances(self) -> None:
+        actual = WalletStore.from_portfolios(
+            [
+                {
+                    "user_id": 1,
+                    "wallets": {"EUR": {"balance": 5}, "USD": {"balance": 0}},
+                },
+                {"user_id": 2, "wallets": {"BTC": {"balance": 1}}},
+            ]
+        )
+        expected = WalletStore.from_balances({1: {"EUR": 7.0}, 3: {"USD": 2.0}})
+        self.assertEqual(
+            sorted(actual.diff(expected)),
+            [(1, "EUR", 5.0, 7.0), (2, "BTC", 1.0, 0.0), (3, "USD", 0.0, 2.0)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()